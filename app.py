@@ -6,38 +6,29 @@ Version Finale : Consulting Edition
 
 from __future__ import annotations
 
-import time
-from typing import Any, Dict, Literal
+from typing import List, Optional
 
 import streamlit as st
 from loguru import logger
 
 # Import des configurations et modules locaux
-from config import PROJECT_NAME
-from src.ui import inject_global_css, render_header, render_message
-from src.agents import (
-    run_rag_agent,
-    run_summary_agent,
-    run_compliance_agent,
-    run_governance_agent,
-    run_generator_agent,
-)
-
-# --- DÉFINITION DES TYPES ---
-AgentName = Literal[
-    "auto",
-    "rag",
-    "summary",
-    "compliance",
-    "governance",
-    "generator",
-]
+from config import PROJECT_NAME, HISTORY_WINDOW, init_config
+from src.ui import inject_global_css, render_header, render_message, render_streaming_message
+# `run_agent_engine` / `arun_agent_engine` restent importables depuis app (API historique)
+from src.engine import AgentName, arun_agent_engine, run_agent_engine, stream_agent_engine  # noqa: F401
+from src.pipeline import TurnPipeline
+from src.profiling import profiled
+from src.router import route_agent
+from src.telemetry import set_attribute, span, start_metrics_server, trace
+from src.transcript import Transcript, purge_stale_spills
 
 # --- GESTION DE L'ÉTAT (SESSION STATE) ---
 def _init_session_state() -> None:
     """Initialise les variables de session si elles n'existent pas."""
-    if "messages" not in st.session_state:
-        st.session_state.messages = [
+    if "transcript" not in st.session_state:
+        purge_stale_spills()
+        # Historique borné : fenêtre récente en mémoire, messages anciens déversés sur disque
+        st.session_state.transcript = Transcript([
             {
                 "role": "assistant",
                 # Texte brut nettoyé pour éviter les bugs d'affichage HTML
@@ -46,53 +37,247 @@ def _init_session_state() -> None:
                            "ou générer des plans d'action stratégiques. Comment puis-je vous aider ?",
                 "agent": "System"
             }
-        ]
+        ])
+    if "history_window" not in st.session_state:
+        st.session_state.history_window = HISTORY_WINDOW
     if "last_agent" not in st.session_state:
         st.session_state.last_agent = None
 
+def _show_older_messages() -> None:
+    """Élargit la fenêtre d'historique affichée d'une page (HISTORY_WINDOW messages)."""
+    st.session_state.history_window += HISTORY_WINDOW
+
 # --- LOGIQUE DE ROUTAGE (CERVEAU) ---
-def detect_agent(user_input: str, manual_choice: str) -> AgentName:
+def detect_agent(user_input: str, manual_choice: str, vector: Optional[List[float]] = None) -> AgentName:
     """
-    Détermine quel agent activer en fonction du choix utilisateur ou des mots-clés.
+    Détermine quel agent activer : choix utilisateur, sinon routeur sémantique (repli sur les mots-clés).
+    `vector` : embedding de la question s'il est déjà calculé (partagé avec le retrieval).
     """
     if manual_choice != "auto":
         return manual_choice
 
-    text = user_input.lower()
-    
-    # Heuristiques simples pour le mode Auto
-    if any(k in text for k in ["résume", "synthèse", "summary", "tl;dr"]):
-        return "summary"
-    if any(k in text for k in ["conformité", "compliance", "risque", "rgpd", "ai act", "security", "règlement"]):
-        return "compliance"
-    if any(k in text for k in ["gouvernance", "data owner", "steward", "qualité", "lineage", "mesh", "architecture"]):
-        return "governance"
-    if any(k in text for k in ["plan", "action", "slide", "présentation", "email", "stratégie", "migration"]):
-        return "generator"
-    
-    return "rag"  # Par défaut : Recherche documentaire classique
+    return route_agent(user_input, vector)
+
+# --- SIDEBAR (PARAMÈTRES) ---
+AGENT_LABELS = {
+    "⚡ Auto-Detection (Smart)": "auto",
+    "📄 RAG (Document Knowledge)": "rag",
+    "📝 Synthétiseur (Executive Summary)": "summary",
+    "⚖️ Compliance Officer (Risk)": "compliance",
+    "🏛️ Governance Architect (Strategy)": "governance",
+    "💼 Consulting Generator (Deliverables)": "generator"
+}
+FRAMEWORKS = ["EU AI Act", "GDPR", "NIST AI RMF", "ISO 42001"]
+RISK_LEVELS = ["Low (Agile)", "Medium (Standard)", "High (Critical)"]
+
+def _reset_session() -> None:
+    """Vide l'historique ; seul le fragment du chat est ré-exécuté."""
+    st.session_state.transcript.clear()
+    st.session_state.history_window = HISTORY_WINDOW
+    st.rerun("chat")
 
-def run_agent_engine(user_input: str, agent: AgentName, framework: str, risk: str) -> Dict[str, Any]:
+@st.fragment(key="sidebar")
+def _sidebar() -> None:
     """
-    Orchestrateur : Exécute l'agent choisi en injectant le contexte métier (Framework, Risque).
+    Panneau de contrôle. Fragment : changer d'agent, de référentiel ou de niveau de risque
+    ne ré-exécute que la sidebar ; le chat lit les valeurs dans st.session_state au tour suivant.
     """
-    logger.info(f"🚀 Execution Agent: {agent} | Context: {framework}, {risk}")
-    
-    if agent == "rag":
-        return run_rag_agent(user_input)
-    elif agent == "summary":
-        return run_summary_agent(user_input)
-    elif agent == "compliance":
-        return run_compliance_agent(user_input, framework=framework, risk_level=risk)
-    elif agent == "governance":
-        return run_governance_agent(user_input, risk_level=risk)
-    elif agent == "generator":
-        return run_generator_agent(user_input)
-    
-    return run_rag_agent(user_input)
+    st.markdown("### 🎛️ Panneau de Contrôle")
+
+    st.markdown("**Mode Opératoire**")
+    st.selectbox("Sélectionnez un agent spécialisé :", list(AGENT_LABELS), index=0, key="agent_choice_label")
+
+    st.divider()
+
+    st.markdown("**Paramètres de Simulation**")
+    # Ces valeurs seront passées aux agents
+    st.selectbox("Référentiel de Conformité", FRAMEWORKS, index=0, key="selected_framework")
+    st.selectbox("Niveau de risque", RISK_LEVELS, index=1, key="selected_risk")
+
+    st.divider()
+
+    # Bouton Reset
+    st.button("🗑️ Nouvelle Session", use_container_width=True, on_click=_reset_session)
+
+    st.divider()
+
+    # Rapport assemblé seulement au clic (un join sur tout l'historique, messages déversés compris),
+    # sans rerun de l'application
+    st.download_button(
+        label="📥 Télécharger le Rapport Complet",
+        data=st.session_state.transcript.report,
+        file_name="rapport_audit_accenture.txt",
+        mime="text/plain",
+        on_click="ignore",
+        use_container_width=True
+    )
+
+    st.markdown(
+        """
+        <div style='margin-top: 2rem; font-size: 0.75rem; color: #64748b; text-align: center;'>
+            Enterprise Data Governance Tool v1.0<br>
+            Powered by LangChain & OpenAI
+        </div>
+        """, 
+        unsafe_allow_html=True
+    )
+
+# --- SCÉNARIOS CONSULTING (BOUTONS RAPIDES) ---
+SCENARIOS = [
+    # Scénario 1 : Migration Cloud
+    (
+        "☁️ Migration Cloud Complex",
+        "Je dois piloter une migration Cloud à grande échelle pour une institution financière "
+        "avec des données sensibles (PII). Propose une stratégie de migration (ex: approche 7Rs) "
+        "en détaillant les étapes de sécurisation des données et la gestion du risque hybride."
+    ),
+    # Scénario 2 : Conformité Internationale
+    (
+        "🌍 Transfert Data EU/US",
+        "Quelles sont les exigences techniques et juridiques pour transférer des données clients "
+        "de l'Europe vers les États-Unis ? Liste les contrôles de sécurité obligatoires (chiffrement, BYOK) "
+        "et les implications pour la souveraineté des données."
+    ),
+    # Scénario 3 : Architecture Data Mesh
+    (
+        "🕸️ Gouvernance Data Mesh",
+        "Nous passons d'un Data Lake monolithique à une architecture Data Mesh distribuée. "
+        "Comment doit évoluer notre modèle de gouvernance ? Définis les nouvelles responsabilités "
+        "des Domaines vs l'équipe Plateforme centrale."
+    ),
+]
+
+def _submit_prompt(prompt: Optional[str] = None) -> None:
+    """Met la question en attente (bouton de scénario ou barre de saisie) et ne relance que le chat."""
+    st.session_state.pending_prompt = prompt if prompt is not None else st.session_state.get("chat_prompt")
+    st.rerun("chat")
+
+@st.fragment(key="scenarios")
+def _scenario_buttons() -> None:
+    st.write("") # Spacer pour aérer
+    cols = st.columns(3)
+    for col, (label, prompt) in zip(cols, SCENARIOS):
+        col.button(label, use_container_width=True, on_click=_submit_prompt, args=(prompt,))
+
+# --- ZONE DE CHAT ---
+@st.fragment(key="chat")
+def _chat() -> None:
+    """
+    Historique + tour en cours. Fragment : un envoi (saisie ou scénario) ne ré-exécute que
+    cette zone, pas la sidebar ni l'en-tête.
+    """
+    manual_agent = AGENT_LABELS[st.session_state.agent_choice_label]
+    selected_framework = st.session_state.selected_framework
+    selected_risk = st.session_state.selected_risk
+
+    # Affichage de l'historique de chat : seuls les derniers messages sont re-rendus à chaque rerun
+    transcript: Transcript = st.session_state.transcript
+    hidden = len(transcript) - st.session_state.history_window
+    if hidden > 0:
+        st.button(f"⬆️ Afficher les messages précédents ({hidden} masqués)", on_click=_show_older_messages)
+    for msg in transcript.tail(st.session_state.history_window):
+        render_message(
+            role=msg["role"],
+            content=msg["content"],
+            agent_name=msg.get("agent"),
+            sources=msg.get("sources")
+        )
+
+    # Logique de déclenchement (Soit bouton, soit texte)
+    final_input = st.session_state.pop("pending_prompt", None)
+
+    if final_input:
+        # Trace de télémétrie du tour : spans par étape + tokens (telemetry.jsonl, /metrics),
+        # et profil du tour si PROFILING_ENABLED (profiles/)
+        with trace("turn", agent=manual_agent), profiled("turn", query=final_input) as profile:
+            # 0. Retrieval et préchauffage du client LLM lancés en fond, pendant le routage et l'UI
+            #    (pas de retrieval pour la gouvernance choisie à la main : elle n'utilise pas le corpus)
+            pipeline = TurnPipeline(
+                final_input,
+                embed_query=(manual_agent == "auto"),
+                retrieve=(manual_agent != "governance"),
+            )
+
+            # 1. Afficher le message utilisateur tout de suite
+            with pipeline.stage("ui"):
+                transcript.append({"role": "user", "content": final_input})
+                render_message(role="user", content=final_input)
+
+            # 2. Détection et Exécution de l'IA
+            vector = pipeline.query_vector() if manual_agent == "auto" else None
+            with pipeline.stage("routing"):
+                target_agent = detect_agent(final_input, manual_agent, vector=vector)
+            set_attribute("agent", target_agent)
+            if profile is not None:
+                profile.tag(agent=target_agent)
+        
+            # Feedback visuel avec st.status
+            result = None
+            with st.status(f"🤖 L'agent **{target_agent.upper()}** analyse votre demande...", expanded=True) as status:
+                try:
+                    with pipeline.stage("ui"):
+                        if target_agent == "compliance":
+                            st.write(f"⚖️ Vérification selon le référentiel : **{selected_framework}**...")
+                        elif target_agent == "governance":
+                            st.write(f"🏛️ Application du niveau de risque : **{selected_risk}**...")
+                        else:
+                            st.write("🔍 Analyse sémantique de la requête...")
+                
+                    # APPEL RÉEL À L'AGENT (Wiring final) : prompt sur les documents déjà récupérés,
+                    # la réponse arrive en streaming (la gouvernance ne s'appuie pas sur le corpus)
+                    docs = pipeline.docs() if target_agent != "governance" else None
+                    with pipeline.stage("prepare"):
+                        result = stream_agent_engine(
+                            user_input=final_input, 
+                            agent=target_agent, 
+                            framework=selected_framework, 
+                            risk=selected_risk,
+                            docs=docs,
+                        )
+                    pipeline.report()
+
+                    st.write("✍️ Rédaction de la réponse...")
+                    status.update(label="Réponse en cours de génération", state="complete", expanded=False)
+
+                except Exception as e:
+                    logger.exception("Erreur critique")
+                    set_attribute("error", f"{type(e).__name__}: {e}")
+                    status.update(label="Erreur système", state="error")
+                    st.error(f"Une erreur est survenue : {str(e)}")
+
+            if result is not None:
+                try:
+                    agent_used = result.get("agent", target_agent).capitalize()
+                    sources = result.get("sources_text", None)
+
+                    # 3. Affichage progressif de la réponse IA
+                    with span("render"):
+                        answer = render_streaming_message(result["stream"], agent_name=f"{agent_used}", sources=sources)
+                    if not answer:
+                        answer = "Désolé, je n'ai pas pu générer de réponse."
+
+                    # 4. Sauvegarde dans l'historique
+                    msg_data = {
+                        "role": "assistant",
+                        "content": answer,
+                        "agent": f"{agent_used}",
+                        "sources": sources
+                    }
+                    transcript.append(msg_data)
+
+                except Exception as e:
+                    logger.exception("Erreur critique")
+                    set_attribute("error", f"{type(e).__name__}: {e}")
+                    st.error(f"Une erreur est survenue : {str(e)}")
 
 # --- FONCTION PRINCIPALE (UI) ---
 def main() -> None:
+    """
+    Rerun complet : au chargement de la page seulement. Les interactions ne ré-exécutent que
+    leur fragment (sidebar, chat, scénarios), et les envois de question que le fragment du chat.
+    """
+    init_config()
+
     # 1. Configuration de la page
     st.set_page_config(
         page_title=f"{PROJECT_NAME} | Consulting",
@@ -101,67 +286,13 @@ def main() -> None:
         initial_sidebar_state="expanded"
     )
     
-    # 2. Injection du style et initialisation
+    # 2. Injection du style (CSS et en-tête mis en cache) et initialisation
     inject_global_css()
     _init_session_state()
+    start_metrics_server()  # une fois par process, si METRICS_PORT > 0
 
-    # --- SIDEBAR (PARAMÈTRES) ---
     with st.sidebar:
-        st.markdown("### 🎛️ Panneau de Contrôle")
-        
-        st.markdown("**Mode Opératoire**")
-        agent_choice_label = st.selectbox(
-            "Sélectionnez un agent spécialisé :",
-            [
-                "⚡ Auto-Detection (Smart)",
-                "📄 RAG (Document Knowledge)",
-                "📝 Synthétiseur (Executive Summary)",
-                "⚖️ Compliance Officer (Risk)",
-                "🏛️ Governance Architect (Strategy)",
-                "💼 Consulting Generator (Deliverables)"
-            ],
-            index=0
-        )
-        
-        # Mapping du label vers le nom technique
-        mapping = {
-            "⚡ Auto-Detection (Smart)": "auto",
-            "📄 RAG (Document Knowledge)": "rag",
-            "📝 Synthétiseur (Executive Summary)": "summary",
-            "⚖️ Compliance Officer (Risk)": "compliance",
-            "🏛️ Governance Architect (Strategy)": "governance",
-            "💼 Consulting Generator (Deliverables)": "generator"
-        }
-        manual_agent = mapping[agent_choice_label]
-
-        st.divider()
-        
-        st.markdown("**Paramètres de Simulation**")
-        # Ces variables seront passées aux agents
-        selected_framework = st.selectbox("Référentiel de Conformité", ["EU AI Act", "GDPR", "NIST AI RMF", "ISO 42001"], index=0)
-        selected_risk = st.selectbox("Niveau de risque", ["Low (Agile)", "Medium (Standard)", "High (Critical)"], index=1)
-        
-        st.divider()
-        
-        # Bouton Reset
-        if st.button("🗑️ Nouvelle Session", use_container_width=True):
-            st.session_state.messages = []
-            st.rerun()
-
-        st.divider()
-
-        # 🔥 Placeholder pour le téléchargement (rempli à la fin du script)
-        download_placeholder = st.empty()
-
-        st.markdown(
-            """
-            <div style='margin-top: 2rem; font-size: 0.75rem; color: #64748b; text-align: center;'>
-                Enterprise Data Governance Tool v1.0<br>
-                Powered by LangChain & OpenAI
-            </div>
-            """, 
-            unsafe_allow_html=True
-        )
+        _sidebar()
 
     # --- ZONE PRINCIPALE ---
     render_header(
@@ -169,121 +300,15 @@ def main() -> None:
         subtitle="Assistant IA Multi-Agents pour la conformité et la stratégie de données"
     )
 
-    # Affichage de l'historique de chat
-    chat_container = st.container()
-    with chat_container:
-        for msg in st.session_state.messages:
-            render_message(
-                role=msg["role"],
-                content=msg["content"],
-                agent_name=msg.get("agent"),
-                sources=msg.get("sources")
-            )
+    _chat()
+    _scenario_buttons()
 
-    # --- SCÉNARIOS CONSULTING (BOUTONS RAPIDES) ---
-    st.write("") # Spacer pour aérer
-    cols = st.columns(3)
-    prompt_trigger = None
-    
-    # Scénario 1 : Migration Cloud
-    if cols[0].button("☁️ Migration Cloud Complex", use_container_width=True):
-        prompt_trigger = (
-            "Je dois piloter une migration Cloud à grande échelle pour une institution financière "
-            "avec des données sensibles (PII). Propose une stratégie de migration (ex: approche 7Rs) "
-            "en détaillant les étapes de sécurisation des données et la gestion du risque hybride."
-        )
-
-    # Scénario 2 : Conformité Internationale
-    if cols[1].button("🌍 Transfert Data EU/US", use_container_width=True):
-        prompt_trigger = (
-            "Quelles sont les exigences techniques et juridiques pour transférer des données clients "
-            "de l'Europe vers les États-Unis ? Liste les contrôles de sécurité obligatoires (chiffrement, BYOK) "
-            "et les implications pour la souveraineté des données."
-        )
-
-    # Scénario 3 : Architecture Data Mesh
-    if cols[2].button("🕸️ Gouvernance Data Mesh", use_container_width=True):
-        prompt_trigger = (
-            "Nous passons d'un Data Lake monolithique à une architecture Data Mesh distribuée. "
-            "Comment doit évoluer notre modèle de gouvernance ? Définis les nouvelles responsabilités "
-            "des Domaines vs l'équipe Plateforme centrale."
-        )
-
-    # Barre de saisie utilisateur
-    user_input = st.chat_input("Ex: Quels sont les pré-requis sécurité pour une architecture Serverless ?")
-    
-    # Logique de déclenchement (Soit bouton, soit texte)
-    final_input = prompt_trigger if prompt_trigger else user_input
-
-    if final_input:
-        # 1. Afficher le message utilisateur tout de suite
-        st.session_state.messages.append({"role": "user", "content": final_input})
-        render_message(role="user", content=final_input)
-
-        # 2. Détection et Exécution de l'IA
-        target_agent = detect_agent(final_input, manual_agent)
-        
-        # Feedback visuel avec st.status
-        with st.status(f"🤖 L'agent **{target_agent.upper()}** analyse votre demande...", expanded=True) as status:
-            try:
-                # Petite latence simulée pour l'effet UX
-                time.sleep(0.3)
-                
-                if target_agent == "compliance":
-                    st.write(f"⚖️ Vérification selon le référentiel : **{selected_framework}**...")
-                elif target_agent == "governance":
-                    st.write(f"🏛️ Application du niveau de risque : **{selected_risk}**...")
-                else:
-                    st.write("🔍 Analyse sémantique de la requête...")
-                
-                # APPEL RÉEL À L'AGENT (Wiring final)
-                result = run_agent_engine(
-                    user_input=final_input, 
-                    agent=target_agent, 
-                    framework=selected_framework, 
-                    risk=selected_risk
-                )
-                
-                answer = result.get("answer", "Désolé, je n'ai pas pu générer de réponse.")
-                agent_used = result.get("agent", target_agent).capitalize()
-                sources = result.get("sources_text", None)
-
-                st.write("✅ Génération terminée.")
-                status.update(label="Réponse générée avec succès", state="complete", expanded=False)
-
-                # 3. Sauvegarde dans l'historique
-                msg_data = {
-                    "role": "assistant",
-                    "content": answer,
-                    "agent": f"{agent_used}",
-                    "sources": sources
-                }
-                st.session_state.messages.append(msg_data)
-                
-                # 4. Affichage de la réponse IA
-                render_message(role="assistant", content=answer, agent_name=f"{agent_used}", sources=sources)
-
-            except Exception as e:
-                logger.exception("Erreur critique")
-                status.update(label="Erreur système", state="error")
-                st.error(f"Une erreur est survenue : {str(e)}")
-
-    # --- GÉNÉRATION DU RAPPORT (Update dynamique) ---
-    # On reconstruit le log complet ici pour inclure le tout dernier message échangé
-    full_log = ""
-    for msg in st.session_state.messages:
-        role_label = "CLIENT" if msg["role"] == "user" else f"EXPERT ACCENTURE ({msg.get('agent', 'System')})"
-        full_log += f"\n\n{'='*30}\n{role_label}\n{'='*30}\n{msg['content']}\n"
-    
-    # On remplit le placeholder vide créé au début dans la sidebar
-    with download_placeholder:
-        st.download_button(
-            label="📥 Télécharger le Rapport Complet",
-            data=full_log,
-            file_name="rapport_audit_accenture.txt",
-            mime="text/plain",
-            use_container_width=True
-        )
+    # Barre de saisie utilisateur (épinglée en bas de page) : l'envoi ne relance que le chat
+    st.chat_input(
+        "Ex: Quels sont les pré-requis sécurité pour une architecture Serverless ?",
+        key="chat_prompt",
+        on_submit=_submit_prompt,
+    )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""
+bench_chunking.py
+Débit et taille des chunks des découpeurs de l'ingestion, sur le corpus fourni (`data/documents`) :
+- "recursive"          : RecursiveCharacterTextSplitter, CHUNK_SIZE / CHUNK_OVERLAP en caractères (défaut) ;
+- "recursive+tiktoken" : le même splitter LangChain mesuré en tokens (`from_tiktoken_encoder`,
+                         chaque morceau ré-encodé), même budget que le découpeur "tokens" ;
+- "tokens"             : `src/chunking.TokenChunker` (CHUNKER="tokens"), CHUNK_TOKENS / CHUNK_OVERLAP_TOKENS.
+
+    python -m benchmarks.bench_chunking
+    python -m benchmarks.bench_chunking --scale 50 --runs 5
+
+Les pages sont extraites une fois (cache de pages dans un dossier temporaire), puis répétées
+`--scale` fois. Par découpeur : pages/s, Mo/s, chunks, et taille des chunks en tokens
+(p50 / p95 / max, part au-dessus de CHUNK_TOKENS). Aucun appel réseau.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from loguru import logger
+
+import src.ingest as ingest
+from config import CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, EMBEDDING_MODEL
+from src.tokens import count_tokens_batch, get_encoding
+
+CHUNKERS = ["recursive", "recursive+tiktoken", "tokens"]
+
+
+def _chunk(name: str, pages: list) -> list:
+    if name == "recursive+tiktoken":
+        splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name=get_encoding(EMBEDDING_MODEL).name,
+            chunk_size=CHUNK_TOKENS,
+            chunk_overlap=CHUNK_OVERLAP_TOKENS,
+            add_start_index=True,
+            separators=ingest.SEPARATORS,
+        )
+        return [chunk for page in pages for chunk in splitter.split_documents([page])]
+    return list(ingest.iter_chunks(pages, chunker=name))
+
+
+def measure(name: str, pages: list, runs: int) -> dict:
+    _chunk(name, pages[:4])  # encodage tiktoken et tables chargés hors mesure
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        chunks = _chunk(name, pages)
+        times.append(time.perf_counter() - start)
+    seconds = statistics.median(times)
+    corpus_mb = sum(len(p.page_content.encode("utf-8")) for p in pages) / 2**20
+    tokens = np.array(count_tokens_batch([c.page_content for c in chunks], EMBEDDING_MODEL))
+    return {
+        "chunker": name,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(len(pages) / seconds, 1),
+        "mb_per_second": round(corpus_mb / seconds, 2),
+        "chunks": len(chunks),
+        "tokens_p50": int(np.percentile(tokens, 50)),
+        "tokens_p95": int(np.percentile(tokens, 95)),
+        "tokens_max": int(tokens.max()),
+        "over_budget": round(float((tokens > CHUNK_TOKENS).mean()), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=10, help="Répétitions des pages du corpus.")
+    parser.add_argument("--runs", type=int, default=3, help="Découpages mesurés par découpeur (médiane).")
+    parser.add_argument("--chunkers", nargs="+", choices=CHUNKERS, default=CHUNKERS)
+    parser.add_argument("--json", help="Écrit les résultats dans ce fichier JSON.")
+    args = parser.parse_args()
+
+    logger.remove()  # barres de progression et logs de l'ingestion hors de la table
+    with tempfile.TemporaryDirectory(prefix="bench-chunking-") as workdir:
+        ingest.PAGE_STORE_DIR = workdir
+        pages = ingest.load_pdfs(workers=1) * args.scale
+    results = [measure(name, pages, args.runs) for name in args.chunkers]
+
+    print(f"\n{len(pages)} pages (corpus x{args.scale}), budget tokens : {CHUNK_TOKENS} / overlap {CHUNK_OVERLAP_TOKENS}")
+    print(
+        f"{'découpeur':<20} {'pages/s':>9} {'Mo/s':>7} {'chunks':>7} "
+        f"{'tok p50':>8} {'tok p95':>8} {'tok max':>8} {'> budget':>9}"
+    )
+    for r in results:
+        print(
+            f"{r['chunker']:<20} {r['pages_per_second']:>9} {r['mb_per_second']:>7} {r['chunks']:>7} "
+            f"{r['tokens_p50']:>8} {r['tokens_p95']:>8} {r['tokens_max']:>8} {r['over_budget']:>9.1%}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+bench_embedding_scheduler.py
+Débit et comportement de backoff de l'EmbeddingScheduler contre le faux endpoint local.
+
+    python -m benchmarks.bench_embedding_scheduler --chunks 2000 --max-concurrent 3
+
+Chaque niveau de concurrence est mesuré avec le même serveur simulé (latence fixe,
+429 au-delà de `--max-concurrent` requêtes simultanées) : on doit voir le débit
+monter avec la concurrence, puis plafonner avec des 429 absorbés par le backoff.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.documents import Document
+from langchain_openai import OpenAIEmbeddings
+
+from benchmarks.mock_openai_server import MockOpenAIServer
+from src.embedding_scheduler import EmbeddingScheduler
+
+
+def synthetic_chunks(n: int, words: int = 180) -> list[Document]:
+    vocabulary = (
+        "data governance compliance gdpr ai act byok encryption lineage steward owner "
+        "quality catalog mesh platform cloud migration risk control audit policy"
+    ).split()
+    return [
+        Document(page_content=" ".join(vocabulary[(i * 7 + j) % len(vocabulary)] for j in range(words)) + f" #{i}")
+        for i in range(n)
+    ]
+
+
+def run(chunks: int, concurrency_levels: list[int], max_concurrent: int, latency: float, batch_tokens: int) -> list[dict]:
+    docs = synthetic_chunks(chunks)
+    results = []
+
+    with MockOpenAIServer(latency=latency, max_concurrent=max_concurrent) as server:
+        for concurrency in concurrency_levels:
+            embeddings = OpenAIEmbeddings(
+                model="text-embedding-3-large",
+                base_url=server.base_url,
+                api_key="sk-local-mock",
+                max_retries=0,  # les 429 remontent au scheduler, qui gère seul le backoff
+                check_embedding_ctx_length=False,
+            )
+            scheduler = EmbeddingScheduler(
+                embeddings,
+                max_tokens_per_batch=batch_tokens,
+                max_concurrency=concurrency,
+                base_delay=0.05,
+                max_delay=1.0,
+            )
+            before = dict(server.counters)
+            for _ in scheduler.embed_stream((i, d) for i, d in enumerate(docs)):
+                pass
+
+            report = scheduler.report()
+            report["requested_concurrency"] = concurrency
+            report["server_requests"] = server.counters["requests"] - before["requests"]
+            report["server_429"] = server.counters["throttled"] - before["throttled"]
+            results.append(report)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--max-concurrent", type=int, default=3, help="Limite simulée côté serveur (429 au-delà).")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--batch-tokens", type=int, default=8_000)
+    parser.add_argument("--json", help="Écrit les résultats dans ce fichier JSON.")
+    args = parser.parse_args()
+
+    results = run(args.chunks, args.concurrency, args.max_concurrent, args.latency, args.batch_tokens)
+
+    print(f"{'concurrence':>11} {'chunks/s':>10} {'lots':>6} {'429':>5} {'conc. finale':>13}")
+    for r in results:
+        print(
+            f"{r['requested_concurrency']:>11} {r['chunks_per_second']:>10} {r['batches']:>6} "
+            f"{r['server_429']:>5} {r['concurrency']:>13}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
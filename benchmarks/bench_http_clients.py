@@ -0,0 +1,129 @@
+"""
+bench_http_clients.py
+Réutilisation des connexions HTTP : clients du registre (`src.clients`, pool keep-alive partagé)
+vs un client neuf par appel, contre le faux serveur OpenAI local.
+
+    python -m benchmarks.bench_http_clients --calls 50
+
+Pour chaque mode : appels chat (invoke), chat en streaming, embeddings, puis une rafale
+d'appels asynchrones simultanés sur la boucle partagée. Le serveur compte les connexions
+TCP acceptées : avec le registre, elles doivent rester à ~1 en séquentiel et plafonner à
+la taille de la rafale (bornée par HTTP_MAX_CONNECTIONS) en concurrent. En local et sans
+TLS, l'écart de latence sous-estime ce que coûte une poignée de main vers l'API réelle.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from benchmarks.mock_openai_server import MockOpenAIServer
+from src.aio import run_sync
+from src.clients import close_clients, get_chat_model, get_openai_embeddings
+
+API_KEY = "sk-local-mock"
+MESSAGES = [("system", "Tu es un assistant."), ("user", "Qu'est-ce que la gouvernance des données ?")]
+
+
+def _fresh_chat(base_url: str) -> ChatOpenAI:
+    """Ancien comportement : un client (et donc un pool de connexions) par appel."""
+    return ChatOpenAI(
+        model="gpt-mock",
+        base_url=base_url,
+        api_key=API_KEY,
+        temperature=0,
+        http_client=httpx.Client(),
+        http_async_client=httpx.AsyncClient(),
+    )
+
+
+def _fresh_embeddings(base_url: str) -> OpenAIEmbeddings:
+    return OpenAIEmbeddings(
+        model="text-embedding-3-large",
+        base_url=base_url,
+        api_key=API_KEY,
+        check_embedding_ctx_length=False,
+        http_client=httpx.Client(),
+        http_async_client=httpx.AsyncClient(),
+    )
+
+
+def run_mode(mode: str, server: MockOpenAIServer, calls: int, burst: int) -> dict:
+    base_url = server.base_url
+    if mode == "registry":
+        def chat():
+            return get_chat_model("gpt-mock", base_url=base_url, api_key=API_KEY, temperature=0)
+
+        def embeddings():
+            return get_openai_embeddings(
+                "text-embedding-3-large", None, base_url=base_url, api_key=API_KEY, check_embedding_ctx_length=False
+            )
+    else:
+        def chat():
+            return _fresh_chat(base_url)
+
+        def embeddings():
+            return _fresh_embeddings(base_url)
+
+    result = {"mode": mode}
+    phases = {
+        "invoke": lambda i: chat().invoke(MESSAGES),
+        "stream": lambda i: "".join(c.content for c in chat().stream(MESSAGES)),
+        "embed": lambda i: embeddings().embed_query(f"question {i}"),
+    }
+    for name, call in phases.items():
+        before = server.counters["connections"]
+        start = time.perf_counter()
+        for i in range(calls):
+            call(i)
+        result[f"{name}_ms_per_call"] = round((time.perf_counter() - start) / calls * 1000, 2)
+        result[f"{name}_connections"] = server.counters["connections"] - before
+
+    async def burst_calls():
+        return await asyncio.gather(*(chat().ainvoke(MESSAGES) for _ in range(burst)))
+
+    before = server.counters["connections"]
+    start = time.perf_counter()
+    for _ in range(3):
+        run_sync(burst_calls())
+    result["async_burst_ms"] = round((time.perf_counter() - start) / 3 * 1000, 2)
+    result["async_burst_connections"] = server.counters["connections"] - before
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50, help="Appels séquentiels par phase.")
+    parser.add_argument("--burst", type=int, default=8, help="Appels asynchrones simultanés (x3 rafales).")
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--json", help="Écrit les résultats dans ce fichier JSON.")
+    args = parser.parse_args()
+
+    results = []
+    with MockOpenAIServer(latency=args.latency) as server:
+        for mode in ("fresh", "registry"):
+            results.append(run_mode(mode, server, args.calls, args.burst))
+    close_clients()
+
+    print(f"\n{'mode':<9} {'phase':<12} {'ms/appel':>9} {'connexions':>11}")
+    for r in results:
+        for phase in ("invoke", "stream", "embed"):
+            print(f"{r['mode']:<9} {phase:<12} {r[f'{phase}_ms_per_call']:>9} {r[f'{phase}_connections']:>11}")
+        print(f"{r['mode']:<9} {'rafale x' + str(args.burst):<12} {r['async_burst_ms']:>9} {r['async_burst_connections']:>11}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
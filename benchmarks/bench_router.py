@@ -0,0 +1,229 @@
+"""
+bench_router.py
+Précision et latence du routage du mode Auto : règles par mots-clés vs routeur sémantique
+(centroïdes d'embeddings), sur un jeu de questions étiquetées distinct des exemples du routeur.
+
+    python -m benchmarks.bench_router                        # embeddings OpenAI (clé requise)
+    python -m benchmarks.bench_router --embeddings hashing   # hors ligne, sac de mots haché
+
+Mesures : précision par méthode et par agent, taux de repli sur les mots-clés, latence du
+classement (une question, puis par lot), chargement des centroïdes depuis le cache disque,
+latence de l'embedding de la question, et balayage du seuil ROUTER_MIN_SIMILARITY.
+L'embedding "hashing" ne capte que le vocabulaire partagé : il sert à mesurer les latences
+sans réseau, la précision n'a de sens qu'avec le vrai modèle.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import ROUTER_MIN_SIMILARITY
+from src.lexical_index import tokenize
+from src.router import SemanticRouter, keyword_route
+
+# (question, agent attendu)
+LABELED_PROMPTS = [
+    ("Que recommande Accenture pour valoriser les données comme un actif ?", "rag"),
+    ("Quelles sont les garanties prévues pour les données des clients ?", "rag"),
+    ("Combien d'entreprises ont été interrogées dans l'étude ?", "rag"),
+    ("Quels cas d'usage de l'IA dans la supply chain sont décrits ?", "rag"),
+    ("What is SAP's role in the data success story?", "rag"),
+    ("Which barriers to AI adoption does the paper identify?", "rag"),
+    ("Que signifie data capital management ?", "rag"),
+    ("Quels pré-requis sécurité pour une architecture Serverless ?", "rag"),
+    ("Résume-moi la partie sur l'IA responsable.", "summary"),
+    ("Je n'ai pas le temps de tout lire : l'essentiel du rapport en 5 puces ?", "summary"),
+    ("Fais une synthèse de la feuille de route IA.", "summary"),
+    ("Can you give me a short overview of the whitepaper?", "summary"),
+    ("Summary of the client data safeguards document please.", "summary"),
+    ("Quels sont les points clés à retenir du document SAP ?", "summary"),
+    ("En deux phrases, de quoi parle ce document ?", "summary"),
+    ("Notre scoring de crédit automatisé est-il un système à haut risque au sens de l'AI Act ?", "compliance"),
+    ("Avons-nous besoin d'une AIPD pour ce projet de vidéosurveillance ?", "compliance"),
+    ("Quelles exigences juridiques pour transférer des données clients hors de l'UE ?", "compliance"),
+    ("Le chiffrement BYOK suffit-il pour respecter le RGPD ?", "compliance"),
+    ("Does storing biometric data in the US violate GDPR?", "compliance"),
+    ("Quelles sont nos obligations de transparence pour un chatbot ?", "compliance"),
+    ("Est-ce légal d'entraîner un modèle sur les emails des salariés ?", "compliance"),
+    ("Comment définir les responsabilités des domaines dans un Data Mesh ?", "governance"),
+    ("Qui doit valider les définitions métier dans le glossaire ?", "governance"),
+    ("Comment structurer un comité de gouvernance data ?", "governance"),
+    ("Quels indicateurs suivre pour piloter la qualité des données ?", "governance"),
+    ("How do we assign data stewards across business units?", "governance"),
+    ("Faut-il centraliser ou fédérer la gestion des données de référence ?", "governance"),
+    ("Comment documenter la traçabilité des données de bout en bout ?", "governance"),
+    ("Rédige un email pour convaincre le COMEX d'investir dans la data.", "generator"),
+    ("Propose un plan de migration Cloud en 7 étapes pour une banque.", "generator"),
+    ("Prépare le plan d'une présentation sur notre stratégie IA.", "generator"),
+    ("Write a 90-day action plan for the new Chief Data Officer.", "generator"),
+    ("Draft slides explaining our AI roadmap to the board.", "generator"),
+    ("Génère une checklist de lancement pour un projet d'IA générative.", "generator"),
+    ("Écris une note de cadrage pour un programme de qualité des données.", "generator"),
+]
+
+
+class HashingEmbeddings(Embeddings):
+    """Embedding local et déterministe : sac de mots haché (sans réseau)."""
+
+    model = "hashing"
+
+    def __init__(self, dimensions: int = 512) -> None:
+        self.dimensions = dimensions
+
+    def _vector(self, text: str) -> list[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in tokenize(text):
+            bucket = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=4).digest(), "little")
+            vector[bucket % self.dimensions] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vector(text)
+
+
+def _percentiles(seconds: list[float]) -> tuple[float, float]:
+    return (
+        round(float(np.percentile(seconds, 50)) * 1000, 3),
+        round(float(np.percentile(seconds, 95)) * 1000, 3),
+    )
+
+
+def run(embedding: Embeddings, thresholds: list[float], verbose: bool) -> dict:
+    prompts = [p for p, _ in LABELED_PROMPTS]
+    expected = [a for _, a in LABELED_PROMPTS]
+
+    # Mots-clés
+    latencies = []
+    keyword_predictions = []
+    for prompt in prompts:
+        t = time.perf_counter()
+        keyword_predictions.append(keyword_route(prompt))
+        latencies.append(time.perf_counter() - t)
+    keyword_p50, _ = _percentiles(latencies)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = os.path.join(tmp, "router_centroids.npz")
+        t = time.perf_counter()
+        SemanticRouter(embedding, cache_file=cache_file).centroids()
+        build_ms = (time.perf_counter() - t) * 1000
+
+        router = SemanticRouter(embedding, cache_file=cache_file, min_similarity=ROUTER_MIN_SIMILARITY)
+        t = time.perf_counter()
+        router.centroids()
+        cache_load_ms = (time.perf_counter() - t) * 1000
+
+    # Embedding des questions (une par une : c'est le coût réel d'un tour)
+    vectors, embed_latencies = [], []
+    for prompt in prompts:
+        t = time.perf_counter()
+        vectors.append(embedding.embed_query(prompt))
+        embed_latencies.append(time.perf_counter() - t)
+
+    # Classement d'une question à partir de son vecteur (ce qui s'ajoute au tour)
+    route_latencies = []
+    decisions = []
+    for prompt, vector in zip(prompts, vectors):
+        t = time.perf_counter()
+        decisions.append(router.route(prompt, vector))
+        route_latencies.append(time.perf_counter() - t)
+
+    t = time.perf_counter()
+    nearest, scores = router.classify(vectors)
+    batch_ms = (time.perf_counter() - t) * 1000 / len(prompts)
+
+    semantic_predictions = [d.agent for d in decisions]
+    fallbacks = sum(d.method == "keywords" for d in decisions)
+    per_agent = Counter(expected)
+    correct_by_agent = Counter(e for e, p in zip(expected, semantic_predictions) if e == p)
+
+    sweep = []
+    for threshold in thresholds:
+        routed = [n if s >= threshold else keyword_route(p) for p, n, s in zip(prompts, nearest, scores)]
+        sweep.append({
+            "threshold": threshold,
+            "accuracy": round(sum(e == r for e, r in zip(expected, routed)) / len(prompts), 3),
+            "fallback_rate": round(float((scores < threshold).mean()), 3),
+        })
+
+    if verbose:
+        for prompt, e, d in zip(prompts, expected, decisions):
+            if d.agent != e:
+                print(f"  ✗ attendu {e:<10} obtenu {d.agent:<10} ({d.method}, {d.score:.2f}) {prompt}")
+
+    route_p50, route_p95 = _percentiles(route_latencies)
+    embed_p50, embed_p95 = _percentiles(embed_latencies)
+    return {
+        "embedding": getattr(embedding, "model", type(embedding).__name__),
+        "prompts": len(prompts),
+        "keyword_accuracy": round(sum(e == p for e, p in zip(expected, keyword_predictions)) / len(prompts), 3),
+        "keyword_p50_ms": keyword_p50,
+        "semantic_accuracy": round(sum(e == p for e, p in zip(expected, semantic_predictions)) / len(prompts), 3),
+        "semantic_fallback_rate": round(fallbacks / len(prompts), 3),
+        "semantic_accuracy_by_agent": {a: round(correct_by_agent[a] / n, 3) for a, n in per_agent.items()},
+        "min_similarity": ROUTER_MIN_SIMILARITY,
+        "route_p50_ms": route_p50,
+        "route_p95_ms": route_p95,
+        "batch_ms_per_query": round(batch_ms, 4),
+        "embed_query_p50_ms": embed_p50,
+        "embed_query_p95_ms": embed_p95,
+        "centroid_build_ms": round(build_ms, 1),
+        "centroid_cache_load_ms": round(cache_load_ms, 2),
+        "threshold_sweep": sweep,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", choices=["openai", "hashing"], default="openai")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.0, 0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5])
+    parser.add_argument("--verbose", action="store_true", help="Affiche les questions mal routées.")
+    parser.add_argument("--json", help="Écrit les résultats dans ce fichier JSON.")
+    args = parser.parse_args()
+
+    if args.embeddings == "hashing":
+        embedding: Embeddings = HashingEmbeddings()
+    else:
+        from src.embeddings import get_embeddings
+
+        embedding = get_embeddings()
+
+    r = run(embedding, args.thresholds, args.verbose)
+
+    print(f"\nRoutage de {r['prompts']} questions étiquetées (embedding : {r['embedding']})")
+    print(f"{'méthode':<28} {'précision':>9} {'latence p50 (ms)':>17}")
+    print(f"{'mots-clés':<28} {r['keyword_accuracy']:>9} {r['keyword_p50_ms']:>17}")
+    print(
+        f"{'sémantique (seuil ' + str(r['min_similarity']) + ')':<28} {r['semantic_accuracy']:>9} "
+        f"{r['route_p50_ms']:>17}   (p95 {r['route_p95_ms']} ms, repli {r['semantic_fallback_rate']:.0%})"
+    )
+    print(f"\nPar agent (sémantique) : {r['semantic_accuracy_by_agent']}")
+    print(f"Classement par lot : {r['batch_ms_per_query']} ms/question")
+    print(f"Embedding de la question : p50 {r['embed_query_p50_ms']} ms, p95 {r['embed_query_p95_ms']} ms")
+    print(f"Centroïdes : calcul {r['centroid_build_ms']} ms, lecture du cache {r['centroid_cache_load_ms']} ms")
+    print(f"\n{'seuil':>6} {'précision':>10} {'repli':>7}")
+    for s in r["threshold_sweep"]:
+        print(f"{s['threshold']:>6} {s['accuracy']:>10} {s['fallback_rate']:>7.0%}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(r, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
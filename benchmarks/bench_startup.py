@@ -0,0 +1,105 @@
+"""
+bench_startup.py
+Temps d'import à froid des points d'entrée (app Streamlit, orchestrateur, retrieval, ingestion) :
+chaque mesure est faite dans un interpréteur neuf, répétée `--runs` fois (médiane).
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --baseline HEAD~1    # avant / après sur le même poste
+
+Pour chaque module, la table donne aussi les dépendances lourdes déjà chargées après l'import
+(langchain_openai, chromadb...) : elles ne doivent apparaître qu'au premier usage.
+`--baseline REV` mesure en plus la révision git REV, extraite dans un worktree temporaire.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+MODULES = ["config", "src.retrieval", "src.engine", "src.ingest", "app"]
+HEAVY = ["streamlit", "langchain_openai", "openai", "chromadb", "langchain_chroma", "langchain_community"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, cwd: str, runs: int) -> dict:
+    """Import de `module` dans `runs` interpréteurs neufs lancés depuis `cwd`."""
+    times, heavy = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY)],
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result["seconds"])
+        heavy = result["heavy"]
+    return {"module": module, "median_ms": round(statistics.median(times) * 1000, 1), "heavy": heavy}
+
+
+def measure_tree(cwd: str, runs: int) -> list:
+    # Premier passage à blanc : bytecode compilé et cache disque de l'OS chauds pour toutes les mesures
+    for module in MODULES:
+        measure(module, cwd, 1)
+    return [measure(module, cwd, runs) for module in MODULES]
+
+
+def measure_revision(rev: str, runs: int) -> list:
+    """Mesure la révision `rev` dans un worktree git détaché, supprimé ensuite."""
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    tree = os.path.join(workdir, "tree")
+    subprocess.run(["git", "worktree", "add", "--detach", tree, rev], cwd=ROOT, check=True, capture_output=True)
+    try:
+        return measure_tree(tree, runs)
+    finally:
+        subprocess.run(["git", "worktree", "remove", "--force", tree], cwd=ROOT, check=False, capture_output=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Interpréteurs neufs par module (médiane).")
+    parser.add_argument("--baseline", help="Révision git de référence (ex : HEAD~1).")
+    parser.add_argument("--json", help="Écrit les résultats dans ce fichier JSON.")
+    args = parser.parse_args()
+
+    results = {"current": measure_tree(ROOT, args.runs)}
+    if args.baseline:
+        results[args.baseline] = measure_revision(args.baseline, args.runs)
+
+    base = {r["module"]: r for r in results.get(args.baseline, [])} if args.baseline else {}
+    header = f"{'module':<15} {'import (ms)':>12}"
+    if base:
+        header += f" {args.baseline + ' (ms)':>16} {'gain':>7}"
+    print("\n" + header + "  dépendances lourdes chargées")
+    for r in results["current"]:
+        line = f"{r['module']:<15} {r['median_ms']:>12}"
+        if base:
+            before = base[r["module"]]["median_ms"]
+            line += f" {before:>16} {before / r['median_ms']:>6.1f}x"
+        print(line + "  " + (", ".join(r["heavy"]) or "-"))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+bench_suite.py
+Suite de micro-benchmarks hors ligne des chemins chauds de l'ingestion et du retrieval,
+sur le corpus fourni (`data/documents`) et sur des corpus agrandis synthétiquement.
+
+    python -m benchmarks.bench_suite                          # échelles 1 et 4, résultats JSON
+    python -m benchmarks.bench_suite --scales 1 10 --workers 4
+    python -m benchmarks.bench_suite --compare avant.json apres.json
+
+Aucun appel réseau : embeddings factices déterministes (vecteur dérivé du hash du texte)
+et modèle de chat factice. Tout est écrit dans un dossier temporaire (la base du projet
+n'est pas touchée). Par échelle :
+- `load_pdfs`        : pages/s et Mo/s (le corpus est répété N fois, via des liens symboliques),
+                       parsing pypdf puis relecture depuis le cache de pages
+- `chunk_documents`  : pages/s et chunks/s
+- `embed_and_store`  : chunks/s (embeddings factices + upsert Chroma), puis index BM25
+- `load_vectorstore` : chargement à froid, dans un process neuf, par backend (chroma, numpy)
+- `get_relevant_docs`: latences p50 / p95 / p99 (même process, après la première requête)
+- agent RAG complet (retrieval + contexte + LLM factice) : p50 / p95
+
+Les résultats (JSON) portent le commit, la machine et les paramètres : `--compare` affiche
+l'écart de chaque métrique entre deux fichiers et sort en erreur au-delà de `--tolerance`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+BACKENDS = ["chroma", "numpy"]
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# --compare : suffixes des métriques de débit (plus grand = mieux) ; les autres sont des durées
+HIGHER_IS_BETTER = ("_per_second",)
+
+
+class HashEmbeddings(Embeddings):
+    """Embeddings factices : vecteur unitaire déterministe dérivé du hash du texte."""
+
+    model = "hash-fake"
+
+    def __init__(self, dimensions: int) -> None:
+        self.dimensions = dimensions
+
+    def _vector(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vector(text)
+
+
+def _paths(workdir: str) -> dict:
+    return {
+        "documents": os.path.join(workdir, "documents"),
+        "chroma": os.path.join(workdir, "chroma"),
+        "lexical": os.path.join(workdir, "chroma", "lexical_index.json.gz"),
+        "version": os.path.join(workdir, "chroma", "index_version"),
+        "numpy": os.path.join(workdir, "chroma", "numpy_store"),
+        "pages": os.path.join(workdir, "pages"),
+        "queries": os.path.join(workdir, "queries.json"),
+    }
+
+
+def _offline_ingest(workdir: str, dims: int):
+    """Redirige l'ingestion vers `workdir`, avec les embeddings factices."""
+    import src.ingest as ingest
+
+    paths = _paths(workdir)
+    ingest.DOCUMENTS_DIR = paths["documents"]
+    ingest.CHROMA_DB_DIR = paths["chroma"]
+    ingest.PAGE_STORE_DIR = paths["pages"]
+    ingest.get_embeddings = lambda: HashEmbeddings(dims)
+    return ingest
+
+
+def _offline_service(workdir: str, dims: int, backend: str):
+    """Service de retrieval du process pointé sur `workdir`, agent RAG sur un LLM factice."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    import src.retrieval as retrieval
+    import src.agents.rag_agent as rag_agent
+
+    paths = _paths(workdir)
+    retrieval.get_embeddings = lambda: HashEmbeddings(dims)
+    retrieval._service = retrieval.VectorStoreService(
+        persist_directory=paths["chroma"],
+        version_file=paths["version"],
+        lexical_index_file=paths["lexical"],
+        backend=backend,
+        numpy_store_dir=paths["numpy"],
+    )
+    fake_llm = FakeListChatModel(responses=["Réponse factice du benchmark."])
+    rag_agent._llm = lambda: fake_llm
+    return retrieval, rag_agent
+
+
+def _corpus(source_dir: str, target_dir: str, scale: int) -> list[str]:
+    """Corpus agrandi : chaque PDF fourni est répété `scale` fois (liens symboliques)."""
+    os.makedirs(target_dir, exist_ok=True)
+    files = sorted(f for f in os.listdir(source_dir) if f.lower().endswith(".pdf"))
+    for copy in range(scale):
+        for name in files:
+            os.symlink(os.path.join(source_dir, name), os.path.join(target_dir, f"x{copy:03d}_{name}"))
+    return sorted(os.listdir(target_dir))
+
+
+def _latencies(seconds: list[float], prefix: str, percentiles=(50, 95, 99)) -> dict:
+    return {f"{prefix}_p{p}_ms": round(float(np.percentile(seconds, p)) * 1000, 3) for p in percentiles}
+
+
+def ingest_phase(workdir: str, source_dir: str, scale: int, dims: int, workers: int, n_queries: int, backends: list[str]) -> dict:
+    from src.lexical_index import LexicalIndex
+    from src.numpy_store import export_from_chroma
+
+    ingest = _offline_ingest(workdir, dims)
+    paths = _paths(workdir)
+    files = _corpus(source_dir, paths["documents"], scale)
+    corpus_mb = sum(os.path.getsize(os.path.join(paths["documents"], f)) for f in files) / 2**20
+
+    result: dict = {"scale": scale, "files": len(files), "corpus_mb": round(corpus_mb, 1)}
+
+    start = time.perf_counter()
+    pages = ingest.load_pdfs(files, workers=workers)
+    seconds = time.perf_counter() - start
+    result.update(
+        pages=len(pages),
+        load_pdfs_s=round(seconds, 3),
+        load_pdfs_pages_per_second=round(len(pages) / seconds, 1),
+        load_pdfs_mb_per_second=round(corpus_mb / seconds, 2),
+    )
+
+    # Deuxième passage : pages relues depuis le cache (PAGE_STORE_DIR), sans pypdf
+    start = time.perf_counter()
+    cached_pages = ingest.load_pdfs(files, workers=workers)
+    seconds = time.perf_counter() - start
+    result.update(
+        load_pdfs_cached_s=round(seconds, 3),
+        load_pdfs_cached_pages_per_second=round(len(cached_pages) / seconds, 1),
+    )
+
+    start = time.perf_counter()
+    chunks = ingest.chunk_documents(pages)
+    seconds = time.perf_counter() - start
+    result.update(
+        chunks=len(chunks),
+        chunk_documents_s=round(seconds, 3),
+        chunk_documents_pages_per_second=round(len(pages) / seconds, 1),
+        chunk_documents_chunks_per_second=round(len(chunks) / seconds, 1),
+    )
+
+    ids = [f"bench-{i}" for i in range(len(chunks))]
+    start = time.perf_counter()
+    written = ingest.embed_and_store(chunks, ids)
+    seconds = time.perf_counter() - start
+    result.update(embed_and_store_s=round(seconds, 3), embed_and_store_chunks_per_second=round(written / seconds, 1))
+
+    start = time.perf_counter()
+    lexical = LexicalIndex()
+    lexical.add(ids, [c.page_content for c in chunks], [c.metadata for c in chunks])
+    lexical.save(paths["lexical"])
+    result["lexical_index_s"] = round(time.perf_counter() - start, 3)
+
+    if "numpy" in backends:
+        from langchain_community.vectorstores import Chroma
+
+        start = time.perf_counter()
+        collection = Chroma(collection_name=ingest.CHROMA_COLLECTION_NAME, persist_directory=paths["chroma"])._collection
+        export_from_chroma(
+            collection,
+            paths["numpy"],
+            dtype=ingest.NUMPY_STORE_DTYPE,
+            keep_full=ingest.NUMPY_STORE_RESCORE,
+            coarse_dims=ingest.MATRYOSHKA_DIM,
+        )
+        result["numpy_export_s"] = round(time.perf_counter() - start, 3)
+
+    # Requêtes : débuts de chunks (vocabulaire du corpus, assez longues pour éviter le chemin "mots-clés")
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(chunks), size=min(n_queries, len(chunks)), replace=False)
+    queries = [" ".join(chunks[i].page_content.split()[:12]) for i in picks]
+    with open(paths["queries"], "w", encoding="utf-8") as f:
+        json.dump([q for q in queries if q], f, ensure_ascii=False)
+    return result
+
+
+def measure_retrieval(workdir: str, dims: int, backend: str, k: int, agent_runs: int) -> dict:
+    """Exécuté dans un process neuf : chargement à froid, puis latences de requête."""
+    with open(_paths(workdir)["queries"], encoding="utf-8") as f:
+        queries = json.load(f)
+
+    retrieval, rag_agent = _offline_service(workdir, dims, backend)
+
+    start = time.perf_counter()
+    retrieval.load_vectorstore()
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    retrieval.get_relevant_docs(queries[0], k=k)
+    first = time.perf_counter() - start
+
+    seconds = []
+    for query in queries:
+        t = time.perf_counter()
+        retrieval.get_relevant_docs(query, k=k)
+        seconds.append(time.perf_counter() - t)
+
+    agent_seconds = []
+    for query in queries[:agent_runs]:
+        t = time.perf_counter()
+        rag_agent.run_rag_agent(query)
+        agent_seconds.append(time.perf_counter() - t)
+
+    result = {
+        "backend": backend,
+        "load_vectorstore_cold_ms": round(cold * 1000, 1),
+        "first_query_ms": round(first * 1000, 2),
+        "queries": len(seconds),
+    }
+    result.update(_latencies(seconds, "get_relevant_docs"))
+    result.update(_latencies(agent_seconds, "rag_agent", percentiles=(50, 95)))
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _metrics(run: dict) -> dict:
+    """Aplatit un fichier de résultats : {"scale=4/chroma/get_relevant_docs_p95_ms": valeur}."""
+    flat = {}
+    for scale in run["results"]:
+        prefix = f"scale={scale['scale']}"
+        for key, value in scale.items():
+            if isinstance(value, (int, float)) and key.endswith(("_s", "_ms", "_per_second")):
+                flat[f"{prefix}/{key}"] = value
+        for backend in scale.get("retrieval", []):
+            for key, value in backend.items():
+                if isinstance(value, (int, float)) and key.endswith("_ms"):
+                    flat[f"{prefix}/{backend['backend']}/{key}"] = value
+    return flat
+
+
+def compare(base_file: str, new_file: str, tolerance: float) -> int:
+    """Écart relatif par métrique ; code de sortie 1 si une métrique régresse au-delà de `tolerance`."""
+    with open(base_file, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_file, encoding="utf-8") as f:
+        new = json.load(f)
+
+    before, after = _metrics(base), _metrics(new)
+    print(f"\n{base['commit']} -> {new['commit']} (tolérance {tolerance:.0%})")
+    print(f"{'métrique':<58} {'avant':>10} {'après':>10} {'écart':>8}")
+    regressions = 0
+    for key in sorted(before.keys() & after.keys()):
+        old, cur = before[key], after[key]
+        if not old:
+            continue
+        change = (cur - old) / old
+        worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+        flag = ""
+        if worse > tolerance:
+            flag, regressions = " ❌", regressions + 1
+        elif worse < -tolerance:
+            flag = " ✅"
+        print(f"{key:<58} {old:>10.4g} {cur:>10.4g} {change:>+8.1%}{flag}")
+    print(f"\n{regressions} régression(s) au-delà de {tolerance:.0%}.")
+    return 1 if regressions else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4], help="Facteurs de réplication du corpus.")
+    parser.add_argument("--documents", default=os.path.join(ROOT, "data", "documents"))
+    parser.add_argument("--dims", type=int, default=3072, help="Dimension des embeddings factices.")
+    parser.add_argument("--workers", type=int, default=None, help="Workers du parsing PDF (INGEST_WORKERS par défaut).")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--agent-runs", type=int, default=30)
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--output", help="Fichier JSON des résultats (défaut : benchmarks/results/suite-<commit>.json).")
+    parser.add_argument("--compare", nargs=2, metavar=("AVANT", "APRES"), help="Compare deux fichiers de résultats.")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.tolerance))
+
+    if args.child:
+        print(json.dumps(measure_retrieval(args.workdir, args.dims, args.child, args.k, args.agent_runs)))
+        return
+
+    from config import INGEST_WORKERS
+
+    workers = INGEST_WORKERS if args.workers is None else args.workers
+    commit = _git_commit()
+    results = []
+    for scale in args.scales:
+        workdir = tempfile.mkdtemp(prefix=f"bench_suite_x{scale}_")
+        try:
+            result = ingest_phase(workdir, args.documents, scale, args.dims, workers, args.queries, args.backends)
+            result["retrieval"] = []
+            for backend in args.backends:
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_suite", "--child", backend, "--workdir", workdir,
+                     "--dims", str(args.dims), "--k", str(args.k), "--agent-runs", str(args.agent_runs)],
+                    cwd=ROOT,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+                result["retrieval"].append(json.loads(out.stdout.strip().splitlines()[-1]))
+            results.append(result)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    run = {
+        "commit": commit,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "params": {"dims": args.dims, "workers": workers, "queries": args.queries, "k": args.k},
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"suite-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2, ensure_ascii=False)
+
+    print(f"\n{'échelle':>7} {'pages':>6} {'chunks':>7} {'PDF p/s':>8} {'cache p/s':>10} {'chunk p/s':>10} {'index c/s':>10}")
+    for r in results:
+        print(
+            f"{r['scale']:>7} {r['pages']:>6} {r['chunks']:>7} {r['load_pdfs_pages_per_second']:>8} "
+            f"{r.get('load_pdfs_cached_pages_per_second', '-'):>10} "
+            f"{r['chunk_documents_pages_per_second']:>10} {r['embed_and_store_chunks_per_second']:>10}"
+        )
+    print(f"\n{'échelle':>7} {'backend':<8} {'froid (ms)':>10} {'p50':>8} {'p95':>8} {'p99':>8} {'agent p50':>10}")
+    for r in results:
+        for b in r["retrieval"]:
+            print(
+                f"{r['scale']:>7} {b['backend']:<8} {b['load_vectorstore_cold_ms']:>10} {b['get_relevant_docs_p50_ms']:>8} "
+                f"{b['get_relevant_docs_p95_ms']:>8} {b['get_relevant_docs_p99_ms']:>8} {b['rag_agent_p50_ms']:>10}"
+            )
+    print(f"\nRésultats : {output}")
+
+
+if __name__ == "__main__":
+    main()
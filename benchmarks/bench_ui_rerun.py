@@ -0,0 +1,115 @@
+"""
+bench_ui_rerun.py
+Coût d'un changement dans la sidebar (référentiel de conformité) avec une longue conversation
+à l'écran : rerun complet de `app.main` (comportement sans fragments, et chargement de page)
+vs rerun du seul fragment de la sidebar.
+
+    python -m benchmarks.bench_ui_rerun
+    python -m benchmarks.bench_ui_rerun --messages 20 100 400 --runs 20
+
+L'application tourne dans `streamlit.testing` (AppTest), sans navigateur ni appel OpenAI.
+AppTest ré-exécute tout le script à chaque interaction : pour mesurer le rerun de fragment, le
+benchmark rejoue la requête que le front envoie (RerunData avec l'id du fragment "sidebar").
+Par défaut toute la conversation est affichée (`--window 0`), pire cas du rerun complet.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import streamlit.testing.v1.local_script_runner as local_script_runner
+from loguru import logger
+from streamlit.testing.v1 import AppTest
+
+FRAMEWORKS = ["GDPR", "EU AI Act"]
+
+
+def _script() -> None:
+    """Script AppTest : conversation de `bench_messages` messages, puis l'application."""
+    import streamlit as st
+
+    import app
+    from src.transcript import Transcript
+
+    if "transcript" not in st.session_state:
+        count = st.session_state.bench_messages
+        st.session_state.transcript = Transcript([
+            {
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"Message {i} : " + "exigences de gouvernance et contrôles de sécurité. " * 15,
+                "agent": None if i % 2 == 0 else "Compliance",
+                "sources": None if i % 2 == 0 else "📄 document.pdf (page 3)",
+            }
+            for i in range(count)
+        ])
+        st.session_state.history_window = st.session_state.bench_window or count
+    app.main()
+
+
+def _timed_change(at: AppTest, value: str, fragment_id: str | None) -> float:
+    """Change le référentiel et relance : script complet, ou seulement `fragment_id`."""
+    rerun_data = local_script_runner.RerunData
+    if fragment_id is not None:
+        local_script_runner.RerunData = functools.partial(rerun_data, fragment_id_queue=[fragment_id])
+    try:
+        at.sidebar.selectbox(key="selected_framework").select(value)
+        start = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - start
+    finally:
+        local_script_runner.RerunData = rerun_data
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return elapsed
+
+
+def measure(messages: int, window: int, runs: int) -> dict:
+    at = AppTest.from_function(_script, default_timeout=60)
+    at.session_state.bench_messages = messages
+    at.session_state.bench_window = window
+    at.run()
+    sidebar_id = next(fid for fid, key in at._fragment_storage._target_key_by_id.items() if key == "sidebar")
+    rendered = sum('class="chat-row' in m.value for m in at.markdown)
+
+    result = {"messages": messages, "rendered": rendered}
+    for mode, fragment_id in (("full", None), ("sidebar", sidebar_id)):
+        at.run()  # arbre complet (un rerun de fragment ne contient que ses éléments)
+        times = [_timed_change(at, FRAMEWORKS[i % 2], fragment_id) for i in range(runs)]
+        result[f"{mode}_p50_ms"] = round(statistics.median(times) * 1000, 1)
+        result[f"{mode}_max_ms"] = round(max(times) * 1000, 1)
+    result["speedup"] = round(result["full_p50_ms"] / result["sidebar_p50_ms"], 1)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, nargs="+", default=[20, 100, 200], help="Tailles de conversation.")
+    parser.add_argument("--window", type=int, default=0, help="Messages affichés (0 : toute la conversation).")
+    parser.add_argument("--runs", type=int, default=10, help="Changements mesurés par mode (médiane).")
+    parser.add_argument("--json", help="Écrit les résultats dans ce fichier JSON.")
+    args = parser.parse_args()
+
+    logger.remove()  # logs de l'application (config, routeur) hors de la table
+    results = [measure(n, args.window, args.runs) for n in args.messages]
+
+    print(f"\n{'messages':>8} {'affichés':>9} {'rerun complet p50 (ms)':>23} {'fragment sidebar p50 (ms)':>26} {'gain':>7}")
+    for r in results:
+        print(
+            f"{r['messages']:>8} {r['rendered']:>9} {r['full_p50_ms']:>23} {r['sidebar_p50_ms']:>26} {r['speedup']:>6}x"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
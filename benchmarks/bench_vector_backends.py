@@ -0,0 +1,223 @@
+"""
+bench_vector_backends.py
+Compare Chroma (HNSW) et le store NumPy memory-mappé (float16 / int8, avec ou sans re-score,
+avec ou sans passe grossière Matryoshka) sur la mémoire, le temps de chargement à froid
+et la latence de requête.
+
+    python -m benchmarks.bench_vector_backends --vectors 10000 --dims 3072 --queries 200
+
+Les vecteurs sont synthétiques (normés, regroupés autour de centres pour imiter un corpus),
+avec une énergie décroissante le long des dimensions comme les embeddings Matryoshka
+(text-embedding-3) : les premières dimensions portent l'essentiel de l'information.
+Chaque backend est mesuré dans un process neuf : "chargement à froid" = ouverture du store
++ première requête (Chroma charge l'index HNSW à ce moment-là). Les fichiers sortent d'être
+écrits : le cache disque de l'OS est chaud, on mesure le coût côté process.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+COLLECTION = "bench_vectors"
+BACKENDS = ["chroma", "numpy-float16", "numpy-int8", "numpy-int8-rescore", "numpy-int8-matryoshka"]
+
+
+def _rss_mb() -> float:
+    """Mémoire résidente du process (Linux : /proc ; ailleurs : pic via resource)."""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic_vectors(n: int, dims: int, seed: int = 0, clusters: int = 64) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dims)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.8 * rng.standard_normal((n, dims)).astype(np.float32)
+    vectors *= (1.0 / np.sqrt(1.0 + np.arange(dims) / 32.0)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def build(workdir: str, n: int, dims: int, n_queries: int, k: int, coarse_dims: int) -> None:
+    """Crée la collection Chroma, les stores NumPy et les requêtes (+ vérité terrain exacte)."""
+    import chromadb
+
+    from src.numpy_store import export_from_chroma
+
+    vectors = synthetic_vectors(n, dims)
+    rng = np.random.default_rng(1)
+    noise = synthetic_vectors(n_queries, dims, seed=2, clusters=n_queries)
+    queries = vectors[rng.integers(0, n, n_queries)] + 0.5 * noise
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    np.save(os.path.join(workdir, "queries.npy"), queries)
+    np.save(os.path.join(workdir, "truth.npy"), exact_top_k(vectors, queries, k))
+
+    start = time.perf_counter()
+    client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+    collection = client.create_collection(COLLECTION)
+    for i in range(0, n, 2000):
+        stop = min(i + 2000, n)
+        collection.add(
+            ids=[str(j) for j in range(i, stop)],
+            embeddings=vectors[i:stop],
+            documents=[f"chunk {j}" for j in range(i, stop)],
+            metadatas=[{"source": "bench.pdf", "page": j // 10} for j in range(i, stop)],
+        )
+    print(f"Chroma : {n} vecteurs indexés en {time.perf_counter() - start:.1f} s")
+
+    stores = (("float16", "float16", 0), ("int8", "int8", 0), ("matryoshka", "int8", coarse_dims))
+    for name, dtype, coarse in stores:
+        start = time.perf_counter()
+        # full.npy écrit pour toutes les variantes : les backends "-rescore" le relisent
+        export_from_chroma(
+            collection, os.path.join(workdir, f"numpy-{name}"), dtype=dtype, keep_full=True, coarse_dims=coarse
+        )
+        print(f"Store NumPy {name} : exporté en {time.perf_counter() - start:.1f} s")
+
+
+def _disk_mb(path: str, names: list[str]) -> float:
+    files = [os.path.join(path, name) for name in names]
+    return sum(os.path.getsize(f) for f in files if os.path.exists(f)) / 2**20
+
+
+def measure(backend: str, workdir: str, k: int) -> dict:
+    """Mesures dans le process courant (appelé dans un process neuf par `main`)."""
+    queries = np.load(os.path.join(workdir, "queries.npy"))
+    truth = np.load(os.path.join(workdir, "truth.npy"))
+
+    if backend == "chroma":
+        from langchain_chroma import Chroma
+
+        def open_store():
+            return Chroma(collection_name=COLLECTION, persist_directory=os.path.join(workdir, "chroma"))
+
+        def batch_search(store):
+            return store._collection.query(query_embeddings=queries, n_results=k, include=["distances"])
+
+        index_names = None
+    else:
+        from src.numpy_store import NumpyVectorStore
+
+        matryoshka = backend.endswith("matryoshka")
+        rescore = backend.endswith("rescore") or matryoshka
+        name = "matryoshka" if matryoshka else "int8" if "int8" in backend else "float16"
+        path = os.path.join(workdir, f"numpy-{name}")
+
+        def open_store():
+            return NumpyVectorStore(path, rescore=rescore, coarse=matryoshka)
+
+        def batch_search(store):
+            return store.search_batch(queries, k)
+
+        # Matrice parcourue en entier à chaque requête (le reste n'est lu que pour les candidats)
+        index_names = ["coarse.npy", "coarse_scales.npy"] if matryoshka else ["vectors.npy", "scales.npy"]
+
+    baseline = _rss_mb()
+    start = time.perf_counter()
+    store = open_store()
+    opened = time.perf_counter()
+    store.similarity_search_by_vector_with_relevance_scores(queries[0].tolist(), k=k)
+    cold = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        t = time.perf_counter()
+        found = store.similarity_search_by_vector_with_relevance_scores(query.tolist(), k=k)
+        latencies.append(time.perf_counter() - t)
+        found_rows = {int(doc.id) for doc, _ in found}
+        hits += len(found_rows & set(expected.tolist()))
+
+    t = time.perf_counter()
+    batch_search(store)
+    batch_seconds = time.perf_counter() - t
+
+    return {
+        "backend": backend,
+        "open_ms": round((opened - start) * 1000, 1),
+        "cold_load_ms": round(cold * 1000, 1),
+        "rss_loaded_mb": round(rss_loaded - baseline, 1),
+        "rss_after_queries_mb": round(_rss_mb() - baseline, 1),
+        "scanned_mb": round(_disk_mb(path, index_names), 1) if index_names else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 2),
+        "batch_ms_per_query": round(batch_seconds / len(queries) * 1000, 3),
+        f"recall@{k}": round(hits / truth.size, 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=10_000)
+    parser.add_argument("--dims", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--coarse-dims", type=int, default=256, help="Préfixe Matryoshka du store 'matryoshka'.")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--json", help="Écrit les résultats dans ce fichier JSON.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.workdir, args.k)))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench_vectors_")
+    try:
+        build(workdir, args.vectors, args.dims, args.queries, args.k, args.coarse_dims)
+        results = []
+        for backend in args.backends:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_vector_backends", "--child", backend,
+                 "--workdir", workdir, "--k", str(args.k)],
+                cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    recall = f"recall@{args.k}"
+    print(
+        f"\n{'backend':<22} {'froid (ms)':>10} {'RSS (Mo)':>9} {'RSS fin':>8} {'scan':>7} "
+        f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'lot/req':>8} {recall:>9}"
+    )
+    for r in results:
+        disk = f"{r['scanned_mb']:.0f}" if r["scanned_mb"] is not None else "-"
+        print(
+            f"{r['backend']:<22} {r['cold_load_ms']:>10} {r['rss_loaded_mb']:>9} {r['rss_after_queries_mb']:>8} "
+            f"{disk:>7} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['batch_ms_per_query']:>8} {r[recall]:>9}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+mock_openai_server.py
+Serveur local compatible OpenAI (POST /v1/embeddings, POST /v1/chat/completions) pour tester
+sans clé ni réseau : vecteurs et réponses déterministes (streaming SSE compris), latence
+simulée, 429 quand la limite de débit est dépassée, et comptage des connexions TCP ouvertes
+(pour vérifier le keep-alive des clients).
+
+Usage autonome :
+    python -m benchmarks.mock_openai_server --port 8765 --max-concurrent 2
+puis pointer un client OpenAI sur http://127.0.0.1:8765/v1
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+def fake_vector(text: str, dim: int) -> List[float]:
+    """Vecteur unitaire déterministe dérivé du hash du texte."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    values = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+class MockOpenAIServer:
+    """
+    Faux endpoint d'embeddings et de chat.
+
+    - `latency` : délai fixe par requête (+ `latency_per_input` par texte).
+    - `max_concurrent` : au-delà de N requêtes simultanées, réponse 429.
+    - `max_rps` : au-delà de N requêtes par seconde (fenêtre glissante), réponse 429.
+    - `retry_after` : valeur de l'en-tête Retry-After renvoyé avec les 429 (None = absent).
+    - `counters["connections"]` : connexions TCP acceptées (une seule si le client garde la sienne).
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        dim: int = 256,
+        latency: float = 0.05,
+        latency_per_input: float = 0.0,
+        max_concurrent: Optional[int] = None,
+        max_rps: Optional[float] = None,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        self.dim = dim
+        self.latency = latency
+        self.latency_per_input = latency_per_input
+        self.max_concurrent = max_concurrent
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.counters: Dict[str, int] = {"requests": 0, "throttled": 0, "inputs": 0, "connections": 0}
+        self._active = 0
+        self._recent: List[float] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _admit(self) -> bool:
+        """Réserve un créneau, ou False si la requête doit être rejetée en 429."""
+        now = time.monotonic()
+        with self._lock:
+            self.counters["requests"] += 1
+            self._recent = [t for t in self._recent if now - t < 1.0]
+            too_many = self.max_concurrent is not None and self._active >= self.max_concurrent
+            too_fast = self.max_rps is not None and len(self._recent) >= self.max_rps
+            if too_many or too_fast:
+                self.counters["throttled"] += 1
+                return False
+            self._active += 1
+            self._recent.append(now)
+            return True
+
+    def _done(self) -> None:
+        with self._lock:
+            self._active -= 1
+
+    def _embeddings_response(self, payload: Dict) -> Dict:
+        inputs = payload.get("input", [])
+        if isinstance(inputs, (str, int)) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        # Les clients LangChain peuvent envoyer des listes de token IDs au lieu de texte
+        texts = [t if isinstance(t, str) else " ".join(map(str, t)) for t in inputs]
+        dim = int(payload.get("dimensions") or self.dim)
+
+        with self._lock:
+            self.counters["inputs"] += len(texts)
+        time.sleep(self.latency + self.latency_per_input * len(texts))
+
+        data = []
+        for i, text in enumerate(texts):
+            vector = fake_vector(text, dim)
+            if payload.get("encoding_format") == "base64":
+                embedding = base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+            else:
+                embedding = vector
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+        n_tokens = sum(len(t.split()) for t in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": payload.get("model", "mock"),
+            "usage": {"prompt_tokens": n_tokens, "total_tokens": n_tokens},
+        }
+
+    def _chat_chunks(self, payload: Dict) -> List[str]:
+        """Réponse déterministe, découpée en tokens (mots) pour le streaming."""
+        messages = payload.get("messages", [])
+        last = str(messages[-1].get("content", "")) if messages else ""
+        digest = hashlib.sha256(last.encode("utf-8")).hexdigest()[:8]
+        return [f"{word} " for word in f"Réponse simulée {digest} à {len(messages)} messages.".split()]
+
+    def _chat_response(self, payload: Dict) -> Dict:
+        time.sleep(self.latency)
+        content = "".join(self._chat_chunks(payload)).strip()
+        return {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+        }
+
+    def _chat_stream(self, payload: Dict) -> bytes:
+        """Corps SSE complet (chunks puis [DONE]) ; envoyé d'un bloc avec Content-Length."""
+        time.sleep(self.latency)
+        base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": payload.get("model", "mock")}
+        events = []
+        for i, token in enumerate(self._chat_chunks(payload)):
+            delta = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+            events.append(dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}]))
+        events.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        lines = [f"data: {json.dumps(event)}\n\n" for event in events] + ["data: [DONE]\n\n"]
+        return "".join(lines).encode("utf-8")
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            disable_nagle_algorithm = True  # en-têtes et corps écrits séparément : pas d'attente d'ACK
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def setup(self) -> None:
+                super().setup()
+                with server._lock:
+                    server.counters["connections"] += 1
+
+            def _send_json(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _send_sse(self, body: bytes) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                path = self.path.rstrip("/")
+
+                if not path.endswith("/embeddings") and not path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+
+                if not server._admit():
+                    headers = {}
+                    if server.retry_after is not None:
+                        headers["retry-after"] = str(server.retry_after)
+                    self._send_json(
+                        429,
+                        {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_exceeded"}},
+                        headers,
+                    )
+                    return
+                try:
+                    if path.endswith("/embeddings"):
+                        self._send_json(200, server._embeddings_response(payload))
+                    elif payload.get("stream"):
+                        self._send_sse(server._chat_stream(payload))
+                    else:
+                        self._send_json(200, server._chat_response(payload))
+                finally:
+                    server._done()
+
+        return Handler
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Faux endpoint OpenAI local.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max-concurrent", type=int, default=None)
+    parser.add_argument("--max-rps", type=float, default=None)
+    parser.add_argument("--retry-after", type=float, default=None)
+    args = parser.parse_args()
+
+    mock = MockOpenAIServer(
+        port=args.port,
+        dim=args.dim,
+        latency=args.latency,
+        max_concurrent=args.max_concurrent,
+        max_rps=args.max_rps,
+        retry_after=args.retry_after,
+    )
+    print(f"Mock OpenAI en écoute sur {mock.base_url}")
+    mock._httpd.serve_forever()
@@ -3,16 +3,37 @@ config.py
 Configuration centralisée : Gestion hybride (Local .env / Cloud Streamlit Secrets).
 Supporte GPT-5.1 comme demandé.
 Correction : Ajout des alias de compatibilité pour éviter les ImportError.
+
+L'import ne fait que lire la configuration (.env, variables d'environnement) : le journal
+fichier et les avertissements de démarrage sont mis en place par `init_config()`, appelé
+par les points d'entrée (app Streamlit, CLI d'ingestion). Streamlit n'est importé que si
+ses secrets peuvent servir (app lancée par Streamlit, ou fichier secrets.toml présent).
 """
 
 import os
-import streamlit as st
+import sys
+import threading
 from dotenv import load_dotenv
 from loguru import logger
 
 # Chargement du .env en local (ne fait rien si le fichier n'existe pas sur le Cloud)
 load_dotenv()
 
+_SECRETS_FILES = (
+    os.path.join(os.getcwd(), ".streamlit", "secrets.toml"),
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+)
+
+
+def _streamlit_secrets():
+    """`st.secrets` si Streamlit est déjà chargé ou qu'un secrets.toml existe, sinon None."""
+    if "streamlit" not in sys.modules and not any(os.path.exists(p) for p in _SECRETS_FILES):
+        return None
+    import streamlit as st
+
+    return st.secrets
+
+
 def get_secret(key_name: str, default: str = None) -> str | None:
     """
     Récupère une clé de configuration de manière robuste :
@@ -27,8 +48,9 @@ def get_secret(key_name: str, default: str = None) -> str | None:
     
     # 2. Fallback sur Streamlit Secrets (Déploiement Cloud)
     try:
-        if key_name in st.secrets:
-            return st.secrets[key_name]
+        secrets = _streamlit_secrets()
+        if secrets is not None and key_name in secrets:
+            return secrets[key_name]
     except FileNotFoundError:
         pass # Pas de fichier secrets.toml, c'est normal en local
     except Exception:
@@ -46,10 +68,6 @@ PROJECT_NAME = "Data Governance Intelligence"
 # ============================
 OPENAI_API_KEY = get_secret("OPENAI_API_KEY")
 
-if not OPENAI_API_KEY:
-    # On ne lève une erreur que si on est sûr de ne pas l'avoir trouvée
-    logger.warning("⚠️ OPENAI_API_KEY non trouvée. L'application risque de ne pas fonctionner.")
-
 # ============================
 #   LLM CONFIG (Sélecteur de modèles)
 # ============================
@@ -57,10 +75,23 @@ if not OPENAI_API_KEY:
 LLM_MODEL = get_secret("CHAT_MODEL", "gpt-5.1")
 EMBEDDING_MODEL = get_secret("EMBEDDING_MODEL", "text-embedding-3-large")
 
+# Dimension de sortie des embeddings (None = dimension native du modèle, 3072 pour -3-large)
+EMBEDDING_DIMENSIONS = int(get_secret("EMBEDDING_DIMENSIONS", "0")) or None
+
 # 🔥 CORRECTION CRUCIALE : ALIAS DE COMPATIBILITÉ
 # Ton fichier src/retrieval.py cherche 'MODEL_EMBEDDINGS', on lui donne ce qu'il veut.
 MODEL_EMBEDDINGS = EMBEDDING_MODEL 
 
+# ==============================
+#   CLIENTS HTTP (OpenAI)
+# ==============================
+# Pool de connexions partagé par tous les clients LLM / embeddings (keep-alive : TCP + TLS une seule fois)
+HTTP_MAX_CONNECTIONS = int(get_secret("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(get_secret("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = 60.0  # secondes d'inactivité avant fermeture d'une connexion du pool
+HTTP_CONNECT_TIMEOUT = 5.0
+HTTP_TIMEOUT = float(get_secret("HTTP_TIMEOUT", "120"))  # lecture : longues réponses LLM
+
 # ==============================
 #   CHROMA DB PATHS
 # ==============================
@@ -69,26 +100,177 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 DOCUMENTS_DIR = os.path.join(DATA_DIR, "documents")
 CHROMA_DB_DIR = os.path.join(BASE_DIR, "chroma_db")
 CHROMA_COLLECTION_NAME = "data_governance_rag"
+# Fichier "témoin" réécrit à chaque ingestion : permet aux process déjà lancés
+# (Streamlit) de détecter un nouvel index et de recharger leur handle Chroma.
+INDEX_VERSION_FILE = os.path.join(CHROMA_DB_DIR, "index_version")
+# Manifeste de l'ingestion incrémentale : hash de chaque PDF + IDs de ses chunks.
+INGEST_MANIFEST_FILE = os.path.join(CHROMA_DB_DIR, "ingest_manifest.json")
+# Index lexical BM25 (texte des chunks + index inversé), reconstruit avec la base vectorielle
+LEXICAL_INDEX_FILE = os.path.join(CHROMA_DB_DIR, "lexical_index.json.gz")
+
+# Backend de recherche vectorielle : "chroma" (HNSW) ou "numpy" (matrice memory-mappée
+# quantifiée, recherche exacte). Chroma reste la base de référence de l'ingestion ;
+# le store NumPy en est un export, régénéré à chaque ingestion quand il est sélectionné.
+VECTOR_BACKEND = get_secret("VECTOR_BACKEND", "chroma").lower()
+NUMPY_STORE_DIR = os.path.join(CHROMA_DB_DIR, "numpy_store")
+NUMPY_STORE_DTYPE = get_secret("NUMPY_STORE_DTYPE", "int8")  # "int8" ou "float16"
+# Re-score float32 des meilleurs candidats quantifiés : l'export écrit alors aussi `full.npy`
+# (4 octets par dimension, 4x la matrice int8). Désactivé par défaut.
+NUMPY_STORE_RESCORE = get_secret("NUMPY_STORE_RESCORE", "false").lower() == "true"
+NUMPY_STORE_RESCORE_FACTOR = 4   # candidats re-scorés = k x facteur
+# Recherche en deux temps (embeddings Matryoshka de text-embedding-3) : passe grossière sur les
+# MATRYOSHKA_DIM premières dimensions, puis re-classement des MATRYOSHKA_CANDIDATES meilleurs
+# en pleine dimension. 0 = désactivé. La dimension est consignée dans le meta.json du store.
+MATRYOSHKA_DIM = int(get_secret("MATRYOSHKA_DIM", "256"))
+MATRYOSHKA_CANDIDATES = 200
+
+# Cache disque des embeddings (SQLite), partagé par l'ingestion et le retrieval
+EMBEDDING_CACHE_ENABLED = get_secret("EMBEDDING_CACHE_ENABLED", "true").lower() != "false"
+EMBEDDING_CACHE_PATH = os.path.join(DATA_DIR, "cache", "embeddings.sqlite")
+EMBEDDING_CACHE_MAX_ENTRIES = 50_000  # ~600 Mo en 3072 dimensions (float32)
 
 # ==============================
 #   RAG PARAMETERS
 # ==============================
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 150
+# Découpeur : "recursive" (RecursiveCharacterTextSplitter, CHUNK_SIZE / CHUNK_OVERLAP en caractères)
+# ou "tokens" (src/chunking.py, tailles en tokens tiktoken : coût d'embedding et budgets de
+# contexte prévisibles). Changer de découpeur déclenche une ré-indexation complète.
+CHUNKER = get_secret("CHUNKER", "recursive").lower()
+CHUNK_TOKENS = 256
+CHUNK_OVERLAP_TOKENS = 40
+
+# Parsing PDF parallèle : nombre de process, et taille des lots de pages
+# au-delà de laquelle un gros PDF est découpé entre plusieurs workers.
+INGEST_WORKERS = int(get_secret("INGEST_WORKERS", str(os.cpu_count() or 1)))
+PDF_PAGES_PER_TASK = 40
+# Cache des pages extraites, adressé par le hash du PDF : un fichier inchangé n'est pas re-parsé
+# (changement de découpage ou de modèle d'embedding compris)
+PAGE_STORE_ENABLED = get_secret("PAGE_STORE_ENABLED", "true").lower() != "false"
+PAGE_STORE_DIR = os.path.join(DATA_DIR, "cache", "pages")
+
+# Pipeline streaming : nombre max de chunks par lot d'embedding / d'écriture,
+# et nombre max de lots (ou de plages PDF par worker) en attente entre deux étapes.
+INGEST_BATCH_SIZE = 128
+INGEST_QUEUE_DEPTH = 4
+
+# Ordonnanceur d'embeddings : lots bornés en tokens, requêtes concurrentes, retries sur 429
+EMBED_BATCH_MAX_TOKENS = 32_000
+EMBED_CONCURRENCY = int(get_secret("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = 8
 
 # Paramètres de recherche
 TOP_K_RESULTS = 6
-SIMILARITY_THRESHOLD = 0.7
+# Similarité cosinus minimale d'un chunk pour entrer dans le contexte.
+# Les embeddings text-embedding-3 donnent des cosinus bas (souvent 0.3-0.6 pour un passage
+# pertinent) : l'ancien seuil de 0.7 n'était pas appliqué et aurait presque tout écarté.
+SIMILARITY_THRESHOLD = 0.3
+
+# Nombre de chunks exploités par chaque agent. Le moteur ne fait qu'une recherche par tour,
+# au plus grand de ces k : chaque agent (ou un re-routage) en garde les k premiers.
+AGENT_TOP_K = {
+    "rag": 5,
+    "summary": 7,
+    "compliance": 6,
+    "generator": 4,
+}
+
+# Budget de tokens du contexte documentaire, par agent (après fusion des chunks adjacents)
+CONTEXT_TOKEN_BUDGETS = {
+    "rag": 2500,
+    "summary": 4000,
+    "compliance": 3000,
+    "generator": 2000,
+}
+
+# Recherche hybride : "vector" (Chroma seul) ou "hybrid" (BM25 + vecteurs, fusion RRF)
+RETRIEVAL_MODE = get_secret("RETRIEVAL_MODE", "hybrid").lower()
+HYBRID_CANDIDATES = 20  # candidats demandés à chaque moteur avant fusion
+HYBRID_RRF_K = 60       # constante de la Reciprocal Rank Fusion
+# Requête "mots-clés" (au plus N mots, tous présents dans l'index) : BM25 seul, sans appel d'embedding
+LEXICAL_FAST_PATH_MAX_TERMS = 4
+
+# ==============================
+#   ROUTAGE (mode Auto)
+# ==============================
+# "semantic" : centroïdes d'embeddings par agent (repli sur les mots-clés) ; "keywords" : mots-clés seuls
+ROUTER_MODE = get_secret("ROUTER_MODE", "semantic").lower()
+ROUTER_CACHE_FILE = os.path.join(DATA_DIR, "cache", "router_centroids.npz")
+# Similarité cosinus minimale avec le meilleur centroïde ; en dessous, repli sur les mots-clés.
+# À recalibrer avec `python -m benchmarks.bench_router` si le modèle d'embedding change.
+ROUTER_MIN_SIMILARITY = 0.35
+
+# ==============================
+#   HISTORIQUE DE CONVERSATION (UI)
+# ==============================
+HISTORY_WINDOW = 20          # messages affichés ; les plus anciens via "Afficher les messages précédents"
+HISTORY_MEMORY_CAP = 200     # messages gardés en mémoire de session ; au-delà, les plus anciens vont sur disque
+HISTORY_SPILL_DIR = os.path.join(DATA_DIR, "cache", "sessions")
+HISTORY_SPILL_MAX_AGE_DAYS = 2  # fichiers de sessions abandonnées supprimés au-delà
+
+# ==============================
+#   TRAITEMENT PAR LOT (src/batch.py)
+# ==============================
+# Questions traitées simultanément par `python src/batch.py` (chacune occupe un appel LLM)
+BATCH_WORKERS = int(get_secret("BATCH_WORKERS", "4"))
+BATCH_DEFAULT_FRAMEWORK = "EU AI Act"
+BATCH_DEFAULT_RISK = "Medium (Standard)"
+
+# ==============================
+#   TÉLÉMÉTRIE
+# ==============================
+# Spans par étape (routage, retrieval, prompt, TTFT, LLM, rendu) et tokens de chaque requête
+TELEMETRY_ENABLED = get_secret("TELEMETRY_ENABLED", "true").lower() != "false"
+TELEMETRY_FILE = os.path.join(BASE_DIR, "telemetry.jsonl")  # une ligne JSON par requête
+# Rotation par taille : au-delà de TELEMETRY_MAX_MB, le fichier devient telemetry.jsonl.1
+# (les archives précédentes sont décalées), TELEMETRY_BACKUPS archives au plus
+TELEMETRY_MAX_MB = float(get_secret("TELEMETRY_MAX_MB", "20"))
+TELEMETRY_BACKUPS = int(get_secret("TELEMETRY_BACKUPS", "3"))
+# Endpoint Prometheus /metrics (0 = désactivé)
+METRICS_PORT = int(get_secret("METRICS_PORT", "0"))
+
+# ==============================
+#   PROFILING (opt-in)
+# ==============================
+# Profil d'une requête (agent, ingestion) : cProfile du thread appelant + échantillonnage des piles
+# de tous les threads. Fichiers .prof / .collapsed (flamegraph) / .txt dans PROFILES_DIR.
+PROFILING_ENABLED = get_secret("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_SAMPLE_RATE = float(get_secret("PROFILING_SAMPLE_RATE", "1.0"))  # fraction des requêtes profilées
+PROFILING_MODE = get_secret("PROFILING_MODE", "both").lower()  # "cprofile", "sampling" ou "both"
+PROFILING_INTERVAL = 0.005  # secondes entre deux échantillons de piles
+PROFILES_DIR = os.path.join(BASE_DIR, "profiles")
 
 # ==============================
 #   LOGGING
 # ==============================
-logger.add(
-    "logs.log",
-    rotation="500 KB",
-    retention="2 days",
-    level="INFO",
-    encoding="utf-8"
-)
+LOG_FILE = "logs.log"
+
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def init_config() -> None:
+    """
+    Initialisation explicite, une fois par process (appels suivants sans effet) :
+    journal fichier et vérification de la clé API.
+    """
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        _initialized = True
+
+    logger.add(
+        LOG_FILE,
+        rotation="500 KB",
+        retention="2 days",
+        level="INFO",
+        encoding="utf-8"
+    )
+
+    if not OPENAI_API_KEY:
+        # On ne lève une erreur que si on est sûr de ne pas l'avoir trouvée
+        logger.warning("⚠️ OPENAI_API_KEY non trouvée. L'application risque de ne pas fonctionner.")
 
-logger.info(f"Config chargée. Modèle actif : {LLM_MODEL}")
\ No newline at end of file
+    logger.info(f"Config chargée. Modèle actif : {LLM_MODEL}")
\ No newline at end of file
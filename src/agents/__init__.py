@@ -1,13 +1,29 @@
 """
 src.agents
 Regroupe tous les agents spécialisés (RAG, résumé, compliance, gouvernance, génération).
+
+Les modules d'agents (et langchain_openai avec eux) sont importés à la première utilisation
+d'une de leurs fonctions : `from src.agents import run_rag_agent` ne charge que l'agent RAG,
+et importer `src.agents.common` ne charge aucun agent.
 """
 
-from .rag_agent import run_rag_agent
-from .summary_agent import run_summary_agent
-from .compliance_agent import run_compliance_agent
-from .governance_agent import run_governance_agent
-from .generator_agent import run_generator_agent
+from importlib import import_module
+from typing import Any
+
+_AGENT_MODULES = {
+    "rag": ".rag_agent",
+    "summary": ".summary_agent",
+    "compliance": ".compliance_agent",
+    "governance": ".governance_agent",
+    "generator": ".generator_agent",
+}
+
+# Nom exporté -> module qui le définit
+_EXPORTS = {
+    f"{prefix}_{agent}_agent": module
+    for agent, module in _AGENT_MODULES.items()
+    for prefix in ("run", "arun", "stream")
+}
 
 __all__ = [
     "run_rag_agent",
@@ -15,4 +31,32 @@ __all__ = [
     "run_compliance_agent",
     "run_governance_agent",
     "run_generator_agent",
+    "arun_rag_agent",
+    "arun_summary_agent",
+    "arun_compliance_agent",
+    "arun_governance_agent",
+    "arun_generator_agent",
+    "stream_rag_agent",
+    "stream_summary_agent",
+    "stream_compliance_agent",
+    "stream_governance_agent",
+    "stream_generator_agent",
 ]
+
+
+def get_agent_function(agent: str, kind: str = "run") -> Any:
+    """Fonction `kind` ("run", "arun" ou "stream") de l'agent, importée à la demande."""
+    return getattr(import_module(_AGENT_MODULES[agent], __name__), f"{kind}_{agent}_agent")
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value  # les accès suivants ne repassent plus par __getattr__
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,106 @@
+"""
+common.py
+Briques partagées par les agents : appel LLM asynchrone ou en streaming, avec mesure de latence
+(spans "ttft" / "llm_total" et tokens de la trace de télémétrie en cours), et préchauffage du client LLM.
+"""
+
+from __future__ import annotations
+
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Iterator, List, Optional
+
+from loguru import logger
+
+from config import LLM_MODEL
+from src.telemetry import add_tokens, current_trace, record_span
+from src.tokens import count_tokens, count_tokens_batch, get_encoding
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+
+@lru_cache(maxsize=None)
+def warm_up_llm() -> None:
+    """
+    Préchauffe, une fois par process, ce que le premier appel LLM paierait sinon : import de
+    langchain_openai, client OpenAI et pool httpx partagé (`src.clients`), encodage tiktoken
+    du budget de contexte.
+    """
+    start = time.perf_counter()
+    from src.clients import get_chat_model
+
+    get_chat_model(LLM_MODEL)
+    try:
+        get_encoding(LLM_MODEL)
+    except Exception as e:
+        logger.debug(f"Encodage tiktoken non préchargé : {e}")
+    logger.info(f"🔥 Client LLM préchauffé en {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+def _text_of(message: Any) -> str:
+    """Texte d'une réponse / d'un chunk LLM (le contenu peut être une liste de blocs)."""
+    content = message.content if hasattr(message, "content") else message
+    if isinstance(content, list):
+        return "".join(
+            block.get("text", "") if isinstance(block, dict) else str(block) for block in content
+        )
+    return str(content)
+
+
+def _record_tokens(messages: List, output: str, usage: Optional[dict]) -> None:
+    """
+    Tokens de l'appel dans la trace courante : métadonnées d'usage renvoyées par l'API,
+    sinon estimation tiktoken (prompt + réponse), calculée seulement si une trace est ouverte.
+    """
+    if current_trace() is None:
+        return
+    if usage and usage.get("input_tokens"):
+        add_tokens(usage.get("input_tokens", 0), usage.get("output_tokens", 0), source="usage")
+        return
+    texts = [_text_of(m[1] if isinstance(m, tuple) else m) for m in messages]
+    try:
+        add_tokens(sum(count_tokens_batch(texts, LLM_MODEL)), count_tokens(output, LLM_MODEL), source="tiktoken")
+    except Exception as e:
+        logger.debug(f"Comptage des tokens impossible : {e}")
+
+
+async def ainvoke_llm(llm: ChatOpenAI, messages: List, label: str) -> str:
+    """Appel asynchrone (`ainvoke`) : renvoie la réponse complète et journalise la latence totale."""
+    start = time.perf_counter()
+    response = await llm.ainvoke(messages)
+    elapsed = time.perf_counter() - start
+    record_span("llm_total", elapsed, start)
+    logger.info(f"⏱️ [{label}] Réponse LLM complète en {elapsed * 1000:.0f} ms")
+    text = _text_of(response)
+    _record_tokens(messages, text, getattr(response, "usage_metadata", None))
+    return text
+
+
+def stream_llm(llm: ChatOpenAI, messages: List, label: str) -> Iterator[str]:
+    """
+    Appel en streaming (`llm.stream`) : produit les tokens au fil de l'eau.
+    Journalise le time-to-first-token à côté de la latence totale.
+    """
+    start = time.perf_counter()
+    first_token_at = None
+    parts: List[str] = []
+    usage = None
+
+    for chunk in llm.stream(messages):
+        # Avec `stream_usage`, le dernier chunk (sans texte) porte l'usage de l'appel
+        usage = getattr(chunk, "usage_metadata", None) or usage
+        text = _text_of(chunk)
+        if not text:
+            continue
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+            record_span("ttft", first_token_at - start, start)
+        parts.append(text)
+        yield text
+
+    total = time.perf_counter() - start
+    ttft = (first_token_at - start) if first_token_at is not None else total
+    record_span("llm_total", total, start)
+    _record_tokens(messages, "".join(parts), usage)
+    logger.info(f"⏱️ [{label}] Streaming LLM : TTFT {ttft * 1000:.0f} ms | total {total * 1000:.0f} ms")
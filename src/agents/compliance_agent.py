@@ -4,43 +4,37 @@ Analyse le document sous l’angle safeguards / sécurité / conformité / risqu
 Version dynamique connectée à la Sidebar.
 """
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 from loguru import logger
 from langchain_core.documents import Document
 from langchain_openai import ChatOpenAI
 
-from config import LLM_MODEL
-from src.retrieval import load_vectorstore
+from config import LLM_MODEL, CONTEXT_TOKEN_BUDGETS, AGENT_TOP_K
+from src.aio import run_sync
+from src.clients import get_chat_model
+from src.context import build_context
+from src.retrieval import aget_relevant_docs, get_relevant_docs
+from src.agents.common import ainvoke_llm, stream_llm
+from src.telemetry import spanned
 
 
-def _retrieve_compliance_context(question: str, k: int = 6) -> List[Document]:
+def _retrieve_compliance_context(question: str, k: int = AGENT_TOP_K["compliance"]) -> List[Document]:
     """Récupère les segments pertinents dans la vector DB."""
-    vs = load_vectorstore()
-    retriever = vs.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": k},
-    )
-    return retriever.invoke(question)
+    return get_relevant_docs(question, k=k)
 
 
-def run_compliance_agent(
-    question: str, 
-    framework: str = "Général", 
-    risk_level: str = "Medium"
-) -> Dict[str, Any]:
-    """
-    Fournit une analyse compliance dynamique.
-    Args:
-        question: La question de l'utilisateur.
-        framework: Le référentiel choisi (ex: EU AI Act, GDPR).
-        risk_level: Le niveau d'appétence au risque (Low, Medium, High).
-    """
-    logger.info(f"🔐 [COMPLIANCE] Mode: {framework} | Risque: {risk_level}")
+async def _aretrieve_compliance_context(question: str, k: int = AGENT_TOP_K["compliance"]) -> List[Document]:
+    return await aget_relevant_docs(question, k=k)
 
-    # 1. Récupération du contexte (RAG)
-    docs = _retrieve_compliance_context(question)
-    context = "\n\n".join(d.page_content for d in docs)
+
+@spanned("prompt_build")
+def _build(
+    question: str, docs: List[Document], framework: str, risk_level: str
+) -> Tuple[List, Dict[str, Any]]:
+    """Construction du prompt : renvoie (messages, résultat sans réponse)."""
+    # Contexte filtré (seuil de score), dédoublonné (overlap) et borné en tokens
+    context, docs = build_context(docs, CONTEXT_TOKEN_BUDGETS["compliance"])
 
     # 2. Construction du Prompt Dynamique (Prompt Engineering avancée)
     # On force l'IA à adopter la posture choisie dans la sidebar.
@@ -62,11 +56,6 @@ def run_compliance_agent(
     - ✅ **Recommandations** : Actions concrètes à mener.
     """
 
-    llm = ChatOpenAI(
-        model=LLM_MODEL,
-        temperature=0.1, # Température basse pour la rigueur
-    )
-
     messages = [
         ("system", system_prompt),
         (
@@ -75,14 +64,76 @@ def run_compliance_agent(
         ),
     ]
 
-    # 3. Exécution
-    logger.info("🧠 [COMPLIANCE] Appel du LLM...")
-    response = llm.invoke(messages)
-    answer_text = response.content if hasattr(response, "content") else str(response)
-
-    return {
+    return messages, {
         "agent": "Compliance Agent",
-        "answer": answer_text,
         "docs": docs,
         "sources_text": f"Analyse croisée : Document interne vs Référentiel {framework}.",
-    }
\ No newline at end of file
+    }
+
+
+def _prepare(
+    question: str, framework: str, risk_level: str, docs: Optional[List[Document]] = None
+) -> Tuple[List, Dict[str, Any]]:
+    logger.info(f"🔐 [COMPLIANCE] Mode: {framework} | Risque: {risk_level}")
+    # 1. Récupération du contexte (RAG), ou documents du tour tronqués au k de l'agent
+    docs = _retrieve_compliance_context(question) if docs is None else docs[:AGENT_TOP_K["compliance"]]
+    return _build(question, docs, framework, risk_level)
+
+
+async def _aprepare(
+    question: str, framework: str, risk_level: str, docs: Optional[List[Document]] = None
+) -> Tuple[List, Dict[str, Any]]:
+    logger.info(f"🔐 [COMPLIANCE] Mode: {framework} | Risque: {risk_level}")
+    # 1. Récupération du contexte (RAG), ou documents du tour tronqués au k de l'agent
+    docs = await _aretrieve_compliance_context(question) if docs is None else docs[:AGENT_TOP_K["compliance"]]
+    return _build(question, docs, framework, risk_level)
+
+
+def _llm() -> ChatOpenAI:
+    return get_chat_model(LLM_MODEL, temperature=0.1) # Température basse pour la rigueur
+
+
+async def arun_compliance_agent(
+    question: str, 
+    framework: str = "Général", 
+    risk_level: str = "Medium",
+    docs: Optional[List[Document]] = None,
+) -> Dict[str, Any]:
+    """
+    Fournit une analyse compliance dynamique.
+    Args:
+        question: La question de l'utilisateur.
+        framework: Le référentiel choisi (ex: EU AI Act, GDPR).
+        risk_level: Le niveau d'appétence au risque (Low, Medium, High).
+        docs: Documents déjà récupérés pour ce tour (sinon, retrieval par l'agent).
+    """
+    messages, result = await _aprepare(question, framework, risk_level, docs)
+
+    # 3. Exécution
+    logger.info("🧠 [COMPLIANCE] Appel du LLM...")
+    result["answer"] = await ainvoke_llm(_llm(), messages, "COMPLIANCE")
+    return result
+
+
+def run_compliance_agent(
+    question: str,
+    framework: str = "Général",
+    risk_level: str = "Medium",
+    docs: Optional[List[Document]] = None,
+) -> Dict[str, Any]:
+    """Version synchrone de `arun_compliance_agent`."""
+    return run_sync(arun_compliance_agent(question, framework=framework, risk_level=risk_level, docs=docs))
+
+
+def stream_compliance_agent(
+    question: str,
+    framework: str = "Général",
+    risk_level: str = "Medium",
+    docs: Optional[List[Document]] = None,
+) -> Dict[str, Any]:
+    """Variante streaming : `stream` (générateur de tokens) remplace `answer`."""
+    messages, result = _prepare(question, framework, risk_level, docs)
+
+    logger.info("🧠 [COMPLIANCE] Appel du LLM (streaming)...")
+    result["stream"] = stream_llm(_llm(), messages, "COMPLIANCE")
+    return result
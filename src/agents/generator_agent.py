@@ -3,35 +3,36 @@ generator_agent.py
 Agent orienté 'Deliverables' : Produit des plans d'action, roadmaps et frameworks.
 """
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 from loguru import logger
 from langchain_core.documents import Document
 from langchain_openai import ChatOpenAI
 
-from config import LLM_MODEL
-from src.retrieval import load_vectorstore
+from config import LLM_MODEL, CONTEXT_TOKEN_BUDGETS, AGENT_TOP_K
+from src.aio import run_sync
+from src.clients import get_chat_model
+from src.context import build_context
+from src.retrieval import aget_relevant_docs, get_relevant_docs
+from src.agents.common import ainvoke_llm, stream_llm
+from src.telemetry import spanned
 
 
-def _maybe_retrieve_context(question: str, k: int = 4) -> List[Document]:
+def _maybe_retrieve_context(question: str, k: int = AGENT_TOP_K["generator"]) -> List[Document]:
     """Récupère du contexte si nécessaire pour ancrer la recommandation."""
-    vs = load_vectorstore()
-    retriever = vs.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": k},
-    )
-    return retriever.invoke(question)
+    return get_relevant_docs(question, k=k)
 
 
-def run_generator_agent(question: str) -> Dict[str, Any]:
-    """
-    Produit un livrable consulting actionnable (Roadmap, Slide Structure, Framework).
-    """
-    logger.info("🧰 [GENERATOR] Création du livrable...")
+async def _amaybe_retrieve_context(question: str, k: int = AGENT_TOP_K["generator"]) -> List[Document]:
+    return await aget_relevant_docs(question, k=k)
+
 
-    # On récupère un peu de contexte pour ne pas être hors-sol
-    docs = _maybe_retrieve_context(question)
-    context = "\n\n".join(d.page_content for d in docs) if docs else "Aucun document spécifique."
+@spanned("prompt_build")
+def _build(question: str, docs: List[Document]) -> Tuple[List, Dict[str, Any]]:
+    """Construction du prompt : renvoie (messages, résultat sans réponse)."""
+    # Contexte filtré (seuil de score), dédoublonné (overlap) et borné en tokens
+    context, docs = build_context(docs, CONTEXT_TOKEN_BUDGETS["generator"])
+    context = context or "Aucun document spécifique."
 
     system_prompt = """
     Vous êtes Directeur de Mission (Engagement Manager) chez Accenture.
@@ -51,11 +52,6 @@ def run_generator_agent(question: str) -> Dict[str, Any]:
     - Soyez force de proposition.
     """
 
-    llm = ChatOpenAI(
-        model=LLM_MODEL,
-        temperature=0.5, # Un peu de créativité pour la structuration
-    )
-
     user_prompt = (
         f"Demande du client : {question}\n\n"
         f"Contexte projet (si applicable) :\n{context}"
@@ -66,12 +62,46 @@ def run_generator_agent(question: str) -> Dict[str, Any]:
         ("user", user_prompt),
     ]
 
-    response = llm.invoke(messages)
-    answer_text = response.content if hasattr(response, "content") else str(response)
-
-    return {
+    return messages, {
         "agent": "Consulting Delivery Lead",
-        "answer": answer_text,
         "docs": docs,
         "sources_text": "Recommandation basée sur les standards du cabinet et le contexte client.",
-    }
\ No newline at end of file
+    }
+
+
+def _prepare(question: str, docs: Optional[List[Document]] = None) -> Tuple[List, Dict[str, Any]]:
+    logger.info("🧰 [GENERATOR] Création du livrable...")
+    # Documents du tour fournis par le moteur : on les tronque au k de l'agent
+    docs = _maybe_retrieve_context(question) if docs is None else docs[:AGENT_TOP_K["generator"]]
+    return _build(question, docs)
+
+
+async def _aprepare(question: str, docs: Optional[List[Document]] = None) -> Tuple[List, Dict[str, Any]]:
+    logger.info("🧰 [GENERATOR] Création du livrable...")
+    docs = await _amaybe_retrieve_context(question) if docs is None else docs[:AGENT_TOP_K["generator"]]
+    return _build(question, docs)
+
+
+def _llm() -> ChatOpenAI:
+    return get_chat_model(LLM_MODEL, temperature=0.5) # Un peu de créativité pour la structuration
+
+
+async def arun_generator_agent(question: str, docs: Optional[List[Document]] = None) -> Dict[str, Any]:
+    """
+    Produit un livrable consulting actionnable (Roadmap, Slide Structure, Framework).
+    """
+    messages, result = await _aprepare(question, docs)
+    result["answer"] = await ainvoke_llm(_llm(), messages, "GENERATOR")
+    return result
+
+
+def run_generator_agent(question: str, docs: Optional[List[Document]] = None) -> Dict[str, Any]:
+    """Version synchrone de `arun_generator_agent`."""
+    return run_sync(arun_generator_agent(question, docs))
+
+
+def stream_generator_agent(question: str, docs: Optional[List[Document]] = None) -> Dict[str, Any]:
+    """Variante streaming : `stream` (générateur de tokens) remplace `answer`."""
+    messages, result = _prepare(question, docs)
+    result["stream"] = stream_llm(_llm(), messages, "GENERATOR")
+    return result
@@ -3,17 +3,20 @@ governance_agent.py
 Agent expert en Data Governance & Data Strategy (Vision Accenture).
 """
 
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 
 from loguru import logger
 from langchain_openai import ChatOpenAI
 
 from config import LLM_MODEL
+from src.aio import run_sync
+from src.clients import get_chat_model
+from src.agents.common import ainvoke_llm, stream_llm
+from src.telemetry import spanned
 
-def run_governance_agent(question: str, risk_level: str = "Medium") -> Dict[str, Any]:
-    """
-    Répond avec la vision stratégique d'un Directeur Data Strategy.
-    """
+@spanned("prompt_build")
+def _prepare(question: str, risk_level: str) -> Tuple[List, Dict[str, Any]]:
+    """Construction du prompt (pas de retrieval) : renvoie (messages, résultat sans réponse)."""
     logger.info(f"📘 [GOVERNANCE] Démarrage... (Risk Level: {risk_level})")
 
     system_prompt = f"""
@@ -33,22 +36,38 @@ def run_governance_agent(question: str, risk_level: str = "Medium") -> Dict[str,
     mais comme une opportunité de transformation pour l'entreprise.
     """
 
-    llm = ChatOpenAI(
-        model=LLM_MODEL,
-        temperature=0.5, # Plus créatif pour la stratégie
-    )
-
     messages = [
         ("system", system_prompt),
         ("user", question),
     ]
 
-    response = llm.invoke(messages)
-    answer_text = response.content if hasattr(response, "content") else str(response)
-
-    return {
+    return messages, {
         "agent": "Data Strategy Director",
-        "answer": answer_text,
         "docs": [],
         "sources_text": "Expertise Accenture Strategy & Consulting.",
-    }
\ No newline at end of file
+    }
+
+
+def _llm() -> ChatOpenAI:
+    return get_chat_model(LLM_MODEL, temperature=0.5) # Plus créatif pour la stratégie
+
+
+async def arun_governance_agent(question: str, risk_level: str = "Medium") -> Dict[str, Any]:
+    """
+    Répond avec la vision stratégique d'un Directeur Data Strategy.
+    """
+    messages, result = _prepare(question, risk_level)
+    result["answer"] = await ainvoke_llm(_llm(), messages, "GOVERNANCE")
+    return result
+
+
+def run_governance_agent(question: str, risk_level: str = "Medium") -> Dict[str, Any]:
+    """Version synchrone de `arun_governance_agent`."""
+    return run_sync(arun_governance_agent(question, risk_level=risk_level))
+
+
+def stream_governance_agent(question: str, risk_level: str = "Medium") -> Dict[str, Any]:
+    """Variante streaming : `stream` (générateur de tokens) remplace `answer`."""
+    messages, result = _prepare(question, risk_level)
+    result["stream"] = stream_llm(_llm(), messages, "GOVERNANCE")
+    return result
@@ -3,32 +3,37 @@ rag_agent.py
 Agent généraliste qui interroge la base de connaissances avec une posture de Consultant.
 """
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 from loguru import logger
 from langchain_core.documents import Document
 from langchain_openai import ChatOpenAI
 
-from config import LLM_MODEL
-from src.retrieval import load_vectorstore
+from config import LLM_MODEL, CONTEXT_TOKEN_BUDGETS, AGENT_TOP_K
+from src.aio import run_sync
+from src.clients import get_chat_model
+from src.context import build_context
+from src.retrieval import aget_relevant_docs, get_relevant_docs
+from src.agents.common import ainvoke_llm, stream_llm
+from src.telemetry import spanned
 
-def _retrieve_docs(question: str, k: int = 5) -> List[Document]:
-    vs = load_vectorstore()
-    retriever = vs.as_retriever(search_kwargs={"k": k})
-    return retriever.invoke(question)
+def _retrieve_docs(question: str, k: int = AGENT_TOP_K["rag"]) -> List[Document]:
+    return get_relevant_docs(question, k=k)
 
-def run_rag_agent(question: str) -> Dict[str, Any]:
+async def _aretrieve_docs(question: str, k: int = AGENT_TOP_K["rag"]) -> List[Document]:
+    return await aget_relevant_docs(question, k=k)
+
+@spanned("prompt_build")
+def _build(question: str, docs: List[Document]) -> Tuple[Optional[List], Dict[str, Any]]:
     """
-    Répond aux questions sur les documents avec un ton professionnel.
+    Construction du prompt à partir des documents retrouvés.
+    Renvoie (messages, résultat sans réponse) ; messages=None si aucun contexte trouvé.
     """
-    logger.info("🔍 [RAG AGENT] Recherche d'informations...")
-
-    # 1. Retrieval
-    docs = _retrieve_docs(question)
-    context = "\n\n".join(d.page_content for d in docs)
+    # Contexte filtré (seuil de score), dédoublonné (overlap) et borné en tokens
+    context, docs = build_context(docs, CONTEXT_TOKEN_BUDGETS["rag"])
 
     if not context:
-        return {
+        return None, {
             "agent": "Knowledge Base",
             "answer": "Après analyse de vos documents internes, nous n'avons trouvé aucune information spécifique à ce sujet. Souhaitez-vous élargir la recherche aux standards du marché ?",
             "docs": [],
@@ -47,20 +52,61 @@ def run_rag_agent(question: str) -> Dict[str, Any]:
     4. Citez vos sources quand c'est possible (ex: "Selon la section Sécurité...").
     """
 
-    llm = ChatOpenAI(model=LLM_MODEL, temperature=0)
-
     messages = [
         ("system", system_prompt),
         ("user", f"Question du client : {question}\n\nCONTEXTE EXTRAIT :\n{context}"),
     ]
 
-    # 3. Generation
-    response = llm.invoke(messages)
-    answer = response.content if hasattr(response, "content") else str(response)
-
-    return {
+    return messages, {
         "agent": "Knowledge Base Analyst",
-        "answer": answer,
         "docs": docs,
         "sources_text": "Extraits de la base documentaire client (Accenture Data Cloud POV).",
-    }
\ No newline at end of file
+    }
+
+
+def _prepare(question: str, docs: Optional[List[Document]] = None) -> Tuple[Optional[List], Dict[str, Any]]:
+    logger.info("🔍 [RAG AGENT] Recherche d'informations...")
+    # 1. Retrieval (ou documents du tour fournis par le moteur, tronqués au k de l'agent)
+    docs = _retrieve_docs(question) if docs is None else docs[:AGENT_TOP_K["rag"]]
+    return _build(question, docs)
+
+
+async def _aprepare(question: str, docs: Optional[List[Document]] = None) -> Tuple[Optional[List], Dict[str, Any]]:
+    logger.info("🔍 [RAG AGENT] Recherche d'informations...")
+    docs = await _aretrieve_docs(question) if docs is None else docs[:AGENT_TOP_K["rag"]]
+    return _build(question, docs)
+
+
+def _llm() -> ChatOpenAI:
+    return get_chat_model(LLM_MODEL, temperature=0)
+
+
+async def arun_rag_agent(question: str, docs: Optional[List[Document]] = None) -> Dict[str, Any]:
+    """
+    Répond aux questions sur les documents avec un ton professionnel.
+    """
+    messages, result = await _aprepare(question, docs)
+    if messages is None:
+        return result
+
+    # 3. Generation
+    result["answer"] = await ainvoke_llm(_llm(), messages, "RAG AGENT")
+    return result
+
+
+def run_rag_agent(question: str, docs: Optional[List[Document]] = None) -> Dict[str, Any]:
+    """Version synchrone de `arun_rag_agent`."""
+    return run_sync(arun_rag_agent(question, docs))
+
+
+def stream_rag_agent(question: str, docs: Optional[List[Document]] = None) -> Dict[str, Any]:
+    """
+    Variante streaming : même résultat, mais `stream` (générateur de tokens) remplace `answer`.
+    """
+    messages, result = _prepare(question, docs)
+    if messages is None:
+        result["stream"] = iter([result.pop("answer")])
+        return result
+
+    result["stream"] = stream_llm(_llm(), messages, "RAG AGENT")
+    return result
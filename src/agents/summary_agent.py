@@ -3,34 +3,35 @@ summary_agent.py
 Agent spécialisé dans la production de notes de synthèse exécutives (Executive Summaries).
 """
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 from loguru import logger
 from langchain_core.documents import Document
 from langchain_openai import ChatOpenAI
 
-from config import LLM_MODEL
-from src.retrieval import load_vectorstore
+from config import LLM_MODEL, CONTEXT_TOKEN_BUDGETS, AGENT_TOP_K
+from src.aio import run_sync
+from src.clients import get_chat_model
+from src.context import build_context
+from src.retrieval import aget_relevant_docs, get_relevant_docs
+from src.agents.common import ainvoke_llm, stream_llm
+from src.telemetry import spanned
 
 
-def _pick_docs_for_summary(question: str, max_docs: int = 7) -> List[Document]:
+def _pick_docs_for_summary(question: str, max_docs: int = AGENT_TOP_K["summary"]) -> List[Document]:
     """Sélectionne les passages clés pour la synthèse."""
-    vs = load_vectorstore()
-    retriever = vs.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": max_docs},
-    )
-    return retriever.invoke(question)
+    return get_relevant_docs(question, k=max_docs)
 
 
-def run_summary_agent(question: str) -> Dict[str, Any]:
-    """
-    Produit une synthèse niveau 'Comité Exécutif' (CODIR).
-    """
-    logger.info("📝 [SUMMARY] Rédaction de la note de synthèse...")
+async def _apick_docs_for_summary(question: str, max_docs: int = AGENT_TOP_K["summary"]) -> List[Document]:
+    return await aget_relevant_docs(question, k=max_docs)
+
 
-    docs = _pick_docs_for_summary(question)
-    context = "\n\n".join(d.page_content for d in docs)
+@spanned("prompt_build")
+def _build(question: str, docs: List[Document]) -> Tuple[List, Dict[str, Any]]:
+    """Construction du prompt : renvoie (messages, résultat sans réponse)."""
+    # Contexte filtré (seuil de score), dédoublonné (overlap) et borné en tokens
+    context, docs = build_context(docs, CONTEXT_TOKEN_BUDGETS["summary"])
 
     # Prompt "Consultant Senior"
     system_prompt = """
@@ -49,11 +50,6 @@ def run_summary_agent(question: str) -> Dict[str, Any]:
     - ⚠️ **Points de Vigilance / Risques** (Si mentionnés dans le texte)
     """
 
-    llm = ChatOpenAI(
-        model=LLM_MODEL,
-        temperature=0.2, # Faible température pour la fidélité
-    )
-
     user_prompt = (
         f"Sujet de la demande : {question}\n\n"
         f"CONTEXTE DOCUMENTAIRE BRUT :\n{context}"
@@ -64,12 +60,46 @@ def run_summary_agent(question: str) -> Dict[str, Any]:
         ("user", user_prompt),
     ]
 
-    response = llm.invoke(messages)
-    answer_text = response.content if hasattr(response, "content") else str(response)
-
-    return {
+    return messages, {
         "agent": "Executive Summary Lead",
-        "answer": answer_text,
         "docs": docs,
         "sources_text": "Synthèse consolidée des documents stratégiques.",
-    }
\ No newline at end of file
+    }
+
+
+def _prepare(question: str, docs: Optional[List[Document]] = None) -> Tuple[List, Dict[str, Any]]:
+    logger.info("📝 [SUMMARY] Rédaction de la note de synthèse...")
+    # Documents du tour fournis par le moteur : on les tronque au k de l'agent
+    docs = _pick_docs_for_summary(question) if docs is None else docs[:AGENT_TOP_K["summary"]]
+    return _build(question, docs)
+
+
+async def _aprepare(question: str, docs: Optional[List[Document]] = None) -> Tuple[List, Dict[str, Any]]:
+    logger.info("📝 [SUMMARY] Rédaction de la note de synthèse...")
+    docs = await _apick_docs_for_summary(question) if docs is None else docs[:AGENT_TOP_K["summary"]]
+    return _build(question, docs)
+
+
+def _llm() -> ChatOpenAI:
+    return get_chat_model(LLM_MODEL, temperature=0.2) # Faible température pour la fidélité
+
+
+async def arun_summary_agent(question: str, docs: Optional[List[Document]] = None) -> Dict[str, Any]:
+    """
+    Produit une synthèse niveau 'Comité Exécutif' (CODIR).
+    """
+    messages, result = await _aprepare(question, docs)
+    result["answer"] = await ainvoke_llm(_llm(), messages, "SUMMARY")
+    return result
+
+
+def run_summary_agent(question: str, docs: Optional[List[Document]] = None) -> Dict[str, Any]:
+    """Version synchrone de `arun_summary_agent`."""
+    return run_sync(arun_summary_agent(question, docs))
+
+
+def stream_summary_agent(question: str, docs: Optional[List[Document]] = None) -> Dict[str, Any]:
+    """Variante streaming : `stream` (générateur de tokens) remplace `answer`."""
+    messages, result = _prepare(question, docs)
+    result["stream"] = stream_llm(_llm(), messages, "SUMMARY")
+    return result
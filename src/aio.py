@@ -0,0 +1,61 @@
+"""
+aio.py
+Boucle asyncio unique pour tout le process, exécutée dans un thread dédié.
+
+Les agents et l'orchestrateur sont asynchrones : les appels synchrones (Streamlit, CLI)
+soumettent leur coroutine à cette boucle au lieu d'en créer une à chaque fois
+(`asyncio.run`). Les requêtes en vol se chevauchent ainsi sur une seule boucle, et les
+clients HTTP asynchrones restent liés à une boucle qui ne meurt pas entre deux appels.
+Le contexte de l'appelant (`contextvars`, ex : trace de télémétrie en cours) suit la coroutine.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Boucle partagée (démarrée au premier appel)."""
+    global _loop, _thread
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                _thread = threading.Thread(target=loop.run_forever, name="agents-event-loop", daemon=True)
+                _thread.start()
+                _loop = loop
+    return _loop
+
+
+def submit(coro: Coroutine[Any, Any, T]) -> "Future[T]":
+    """
+    Planifie une coroutine sur la boucle partagée et renvoie un Future thread-safe.
+    La tâche s'exécute dans une copie du contexte de l'appelant (`run_coroutine_threadsafe`
+    ne le propage pas).
+    """
+    context = contextvars.copy_context()
+
+    async def _in_context() -> T:
+        for var, value in context.items():
+            var.set(value)
+        return await coro
+
+    return asyncio.run_coroutine_threadsafe(_in_context(), get_loop())
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Exécute une coroutine depuis du code synchrone et attend son résultat."""
+    if threading.current_thread() is _thread:
+        coro.close()
+        raise RuntimeError("run_sync() appelé depuis la boucle partagée : utiliser `await` directement.")
+    return submit(coro).result()
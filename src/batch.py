@@ -0,0 +1,264 @@
+"""
+batch.py
+Traitement par lot, sans interface : des centaines de questions d'audit passées aux agents
+(routage Auto compris) avec un nombre borné de questions simultanées.
+
+    python src/batch.py questions.jsonl --output resultats.jsonl --workers 8
+
+Entrée JSONL, une question par ligne (format de `requests.jsonl`) :
+    {"request_id": "q-001", "title": "...", "body": "..."}
+ou {"id": "...", "question": "...", "agent": "compliance", "framework": "GDPR", "risk": "..."}
+`agent`, `framework` et `risk` sont optionnels (valeurs de la ligne de commande par défaut).
+
+Sortie JSONL écrite au fil de l'eau (une ligne dès qu'une question est terminée) : agent,
+réponse, sources, durée de chaque étape (spans de télémétrie), tokens, erreur éventuelle.
+Relancer la même commande reprend là où le lot s'était arrêté : les questions ayant déjà un
+résultat sans erreur dans le fichier de sortie sont sautées, celles en erreur sont rejouées
+(la dernière ligne d'un même id fait foi).
+"""
+
+import sys
+import os
+# Ajoute le dossier racine (parent) au chemin de recherche de Python
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import hashlib
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from loguru import logger
+
+from config import (
+    BATCH_WORKERS,
+    BATCH_DEFAULT_FRAMEWORK,
+    BATCH_DEFAULT_RISK,
+    init_config,
+)
+from src.engine import run_agent_engine
+from src.router import route_agent
+from src.telemetry import set_attribute, span, trace
+
+AGENTS = ("auto", "rag", "summary", "compliance", "governance", "generator")
+
+
+@dataclass
+class BatchQuestion:
+    id: str
+    question: str
+    agent: str
+    framework: str
+    risk: str
+
+
+def _question_text(row: Dict[str, Any]) -> str:
+    """Champ `question`, sinon `title` + `body` (format de requests.jsonl)."""
+    if row.get("question"):
+        return str(row["question"]).strip()
+    parts = [str(row[key]).strip() for key in ("title", "body") if row.get(key)]
+    return "\n\n".join(parts)
+
+
+def read_questions(path: str, agent: str, framework: str, risk: str) -> Iterator[BatchQuestion]:
+    """Questions du fichier JSONL (lignes vides, invalides ou sans texte ignorées)."""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                logger.warning(f"⚠️ Ligne {line_no} ignorée : JSON invalide.")
+                continue
+            text = _question_text(row)
+            if not text:
+                logger.warning(f"⚠️ Ligne {line_no} ignorée : aucune question.")
+                continue
+            qid = row.get("id") or row.get("request_id") or hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+            row_agent = row.get("agent", agent)
+            if row_agent not in AGENTS:
+                logger.warning(f"⚠️ Ligne {line_no} : agent inconnu '{row_agent}', routage Auto.")
+                row_agent = "auto"
+            yield BatchQuestion(
+                id=str(qid),
+                question=text,
+                agent=row_agent,
+                framework=row.get("framework", framework),
+                risk=row.get("risk", risk),
+            )
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids déjà traités sans erreur dans le fichier de sortie (ligne tronquée par un arrêt brutal ignorée)."""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if row.get("error"):
+                done.discard(row.get("id"))
+            else:
+                done.add(row.get("id"))
+    return done
+
+
+def _sources(docs: Optional[List[Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "source": d.metadata.get("source", "unknown"),
+            "page": d.metadata.get("page"),
+            "score": d.metadata.get("score"),
+        }
+        for d in docs or []
+    ]
+
+
+def answer_question(item: BatchQuestion) -> Dict[str, Any]:
+    """Routage + exécution d'une question ; renvoie la ligne de résultat (jamais d'exception)."""
+    start = time.perf_counter()
+    result: Dict[str, Any] = {}
+    agent = item.agent
+    error = None
+    with trace("batch", agent=agent, question_id=item.id) as current:
+        try:
+            if agent == "auto":
+                with span("routing"):
+                    agent = route_agent(item.question)
+                set_attribute("agent", agent)
+            result = run_agent_engine(item.question, agent, item.framework, item.risk)
+        except Exception as e:
+            logger.exception(f"Question {item.id} en échec")
+            error = f"{type(e).__name__}: {e}"
+            set_attribute("error", error)
+
+    timings: Dict[str, float] = {}
+    for s in current.spans if current is not None else []:
+        timings[s["stage"]] = round(timings.get(s["stage"], 0.0) + s["ms"], 2)
+    return {
+        "id": item.id,
+        "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "question": item.question,
+        "agent": agent,
+        "agent_label": result.get("agent"),
+        "framework": item.framework,
+        "risk": item.risk,
+        "answer": result.get("answer"),
+        "sources": _sources(result.get("docs")),
+        "sources_text": result.get("sources_text"),
+        "timings_ms": timings,
+        "total_ms": round((time.perf_counter() - start) * 1000, 1),
+        "prompt_tokens": current.prompt_tokens if current is not None else None,
+        "completion_tokens": current.completion_tokens if current is not None else None,
+        "error": error,
+    }
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    workers: int = BATCH_WORKERS,
+    agent: str = "auto",
+    framework: str = BATCH_DEFAULT_FRAMEWORK,
+    risk: str = BATCH_DEFAULT_RISK,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Traite les questions de `input_path` avec `workers` questions en vol, en ajoutant chaque
+    résultat à `output_path` dès qu'il est prêt. Renvoie un récapitulatif du lot.
+    """
+    done = completed_ids(output_path)
+    seen: Set[str] = set()
+    pending: List[BatchQuestion] = []
+    for item in read_questions(input_path, agent, framework, risk):
+        if item.id in seen:
+            continue
+        seen.add(item.id)
+        if item.id not in done:
+            pending.append(item)
+    if limit is not None:
+        pending = pending[:limit]
+
+    skipped = len(seen & done)
+    logger.info(
+        f"📋 Lot : {len(seen)} question(s), {skipped} déjà traitée(s), "
+        f"{len(pending)} à traiter avec {workers} worker(s) -> {output_path}"
+    )
+
+    errors = 0
+    totals: List[float] = []
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    # Ligne par ligne, vidée à chaque résultat : un arrêt du lot ne perd que les questions en vol
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(
+        max_workers=max(1, workers), thread_name_prefix="batch"
+    ) as pool:
+        futures = [pool.submit(answer_question, item) for item in pending]
+        try:
+            for i, future in enumerate(as_completed(futures), 1):
+                row = future.result()
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                out.flush()
+                totals.append(row["total_ms"])
+                if row["error"]:
+                    errors += 1
+                logger.info(
+                    f"✅ [{i}/{len(pending)}] {row['id']} -> {row['agent']} en {row['total_ms']:.0f} ms"
+                    + (f" (erreur : {row['error']})" if row["error"] else "")
+                )
+        except KeyboardInterrupt:
+            logger.warning("⏹️ Lot interrompu : les résultats écrits seront repris à la prochaine exécution.")
+            for future in futures:
+                future.cancel()
+            raise
+
+    summary = {
+        "processed": len(totals),
+        "skipped": skipped,
+        "errors": errors,
+        "elapsed_s": round(time.perf_counter() - start, 1),
+        "p50_ms": round(statistics.median(totals), 1) if totals else None,
+        "max_ms": max(totals) if totals else None,
+    }
+    logger.success(
+        f"🏁 Lot terminé : {summary['processed']} traitée(s), {summary['errors']} erreur(s), "
+        f"{summary['skipped']} sautée(s) en {summary['elapsed_s']} s"
+    )
+    return summary
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Passe un fichier JSONL de questions aux agents, sans interface.")
+    parser.add_argument("input", help="Fichier JSONL de questions (format de requests.jsonl).")
+    parser.add_argument("--output", help="Fichier JSONL de résultats (défaut : <input>.results.jsonl).")
+    parser.add_argument(
+        "--workers", type=int, default=BATCH_WORKERS, help=f"Questions simultanées (défaut : {BATCH_WORKERS})."
+    )
+    parser.add_argument("--agent", choices=AGENTS, default="auto", help="Agent par défaut (défaut : routage Auto).")
+    parser.add_argument("--framework", default=BATCH_DEFAULT_FRAMEWORK, help="Référentiel de conformité par défaut.")
+    parser.add_argument("--risk", default=BATCH_DEFAULT_RISK, help="Niveau de risque par défaut.")
+    parser.add_argument("--limit", type=int, default=None, help="Nombre maximal de questions à traiter.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    init_config()
+    args = _parse_args()
+    output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+    run_batch(
+        args.input,
+        output,
+        workers=args.workers,
+        agent=args.agent,
+        framework=args.framework,
+        risk=args.risk,
+        limit=args.limit,
+    )
@@ -0,0 +1,209 @@
+"""
+chunking.py
+Découpage des pages en chunks bornés en tokens (tiktoken), alternative à
+RecursiveCharacterTextSplitter (tailles en caractères) : CHUNKER="tokens" dans config.py.
+
+Même logique que le splitter récursif de LangChain (séparateurs par priorité, séparateur
+conservé en tête du morceau suivant, fusion gloutonne avec overlap), mais :
+- chaque page est encodée une seule fois, par lots de pages (multi-thread côté Rust quand le
+  poste a plusieurs cœurs), et la position de chaque token dans le texte est déduite d'une
+  table par token du vocabulaire (NumPy), au lieu de `decode_with_offsets` (boucle Python) ;
+- le découpage travaille sur des positions dans le texte : les tokens des morceaux d'un niveau
+  de séparateur sont comptés en un seul `searchsorted` sur ces positions, sans ré-encoder
+  ni recopier de sous-chaînes ;
+- `start_index` est la position exacte du chunk dans la page (pas de recherche de sous-chaîne).
+
+Les comptes par morceau ne sont qu'une estimation du chunk final : un token à cheval sur deux
+morceaux, ou un mot qui perd son espace de tête au `strip()` (" essentially" = 1 token,
+"essentially" = 2), peuvent faire dépasser le budget. Chaque chunk est donc ré-encodé tel qu'il
+sera indexé avant d'être fermé, en reculant d'un morceau tant qu'il dépasse `chunk_tokens`.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import tiktoken
+from langchain_core.documents import Document
+
+from src.tokens import get_encoding
+
+Span = Tuple[int, int]  # [début, fin[ dans le texte de la page
+
+
+@lru_cache(maxsize=None)
+def _offset_tables(encoding: tiktoken.Encoding) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Par token du vocabulaire : nombre de caractères qu'il commence (octets UTF-8 hors
+    continuation), et 1 s'il débute au milieu d'un caractère. Même calcul que
+    `Encoding.decode_with_offsets`, fait une fois par encodage (~100k tokens).
+    """
+    starts = np.zeros(encoding.n_vocab, dtype=np.int64)
+    continues = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            data = encoding.decode_single_token_bytes(token)
+        except KeyError:  # rang non attribué (entre le vocabulaire et les tokens spéciaux)
+            continue
+        starts[token] = sum(not 0x80 <= byte < 0xC0 for byte in data)
+        continues[token] = bool(data) and 0x80 <= data[0] < 0xC0
+    return starts, continues
+
+
+class TokenChunker:
+    """Découpe des Documents en chunks d'au plus `chunk_tokens` tokens, `overlap_tokens` en commun."""
+
+    def __init__(
+        self,
+        chunk_tokens: int,
+        overlap_tokens: int,
+        separators: Sequence[str] = ("\n\n", "\n", ".", " ", ""),
+        model: Optional[str] = None,
+        batch_pages: int = 64,
+    ) -> None:
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError(f"overlap_tokens ({overlap_tokens}) doit être inférieur à chunk_tokens ({chunk_tokens})")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.separators = list(separators)
+        self.batch_pages = batch_pages
+        self._encoding = get_encoding(model)
+        self._starts, self._continues = _offset_tables(self._encoding)
+        self._patterns = {sep: re.compile(re.escape(sep)) for sep in self.separators if sep}
+        # Sur un seul cœur, le pool de threads de encode_ordinary_batch ne fait que coûter
+        self._threads = min(8, os.cpu_count() or 1)
+
+    # ---------- API (compatible TextSplitter.split_documents) ----------
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        return list(self.iter_split(documents))
+
+    def iter_split(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Découpe au fil de l'eau, en encodant les pages par lots de `batch_pages`."""
+        documents = iter(documents)
+        while batch := list(islice(documents, self.batch_pages)):
+            texts = [doc.page_content for doc in batch]
+            for doc, text, tokens in zip(batch, texts, self._encode(texts)):
+                offsets = self._token_offsets(tokens)
+                for start, end in self._split(text, offsets, 0, len(text), len(tokens), self.separators):
+                    chunk = text[start:end]
+                    stripped = chunk.strip()
+                    if not stripped:
+                        continue
+                    metadata = dict(doc.metadata)
+                    metadata["start_index"] = start + len(chunk) - len(chunk.lstrip())
+                    yield Document(page_content=stripped, metadata=metadata)
+
+    def _encode(self, texts: List[str]) -> List[List[int]]:
+        if self._threads > 1:
+            return self._encoding.encode_ordinary_batch(texts, num_threads=self._threads)
+        return [self._encoding.encode_ordinary(text) for text in texts]
+
+    def _fits(self, text: str, start: int, end: int) -> bool:
+        """Le chunk [start, end[ tel qu'indexé (sans espaces de bord) tient dans `chunk_tokens` tokens."""
+        return len(self._encoding.encode_ordinary(text[start:end].strip())) <= self.chunk_tokens
+
+    def _token_offsets(self, tokens: List[int]) -> np.ndarray:
+        """Position (en caractères) du début de chaque token dans le texte encodé."""
+        ids = np.asarray(tokens, dtype=np.int64)
+        chars = np.cumsum(self._starts[ids]) - self._starts[ids]  # caractères avant chaque token
+        return np.maximum(chars - self._continues[ids], 0)
+
+    # ---------- Découpage ----------
+
+    def _split(
+        self, text: str, offsets: np.ndarray, start: int, end: int, n_tokens: int, separators: List[str]
+    ) -> List[Span]:
+        """Chunks de [start, end[ (`n_tokens` tokens) : premier séparateur présent, récursion sur les morceaux trop longs."""
+        if n_tokens <= self.chunk_tokens and self._fits(text, start, end):
+            return [(start, end)]
+        for i, sep in enumerate(separators):
+            if sep == "":
+                return self._split_tokens(text, offsets, start, end)
+            if text.find(sep, start, end) != -1:
+                remaining = separators[i + 1 :]
+                break
+        else:
+            return [(start, end)]
+
+        # Morceaux coupés avant chaque occurrence du séparateur (séparateur en tête), tokens comptés en lot
+        bounds = [start] + [m.start() for m in self._patterns[sep].finditer(text, start + 1, end)] + [end]
+        counts = np.diff(np.searchsorted(offsets, bounds)).tolist()
+
+        chunks: List[Span] = []
+        fitting: List[Tuple[int, int, int]] = []
+        for piece_start, piece_end, n in zip(bounds, bounds[1:], counts):
+            if n <= self.chunk_tokens:
+                fitting.append((piece_start, piece_end, n))
+                continue
+            if fitting:
+                chunks.extend(self._merge(text, offsets, fitting, remaining))
+                fitting = []
+            if remaining:
+                chunks.extend(self._split(text, offsets, piece_start, piece_end, n, remaining))
+            else:
+                chunks.append((piece_start, piece_end))
+        if fitting:
+            chunks.extend(self._merge(text, offsets, fitting, remaining))
+        return chunks
+
+    def _merge(
+        self, text: str, offsets: np.ndarray, pieces: List[Tuple[int, int, int]], separators: List[str]
+    ) -> List[Span]:
+        """
+        Regroupe des morceaux contigus (début, fin, tokens) en chunks de `chunk_tokens` au plus, avec overlap.
+        Chaque chunk est vérifié sur son texte final avant d'être fermé : s'il dépasse, on recule d'un
+        morceau (repris dans le chunk suivant) ; un morceau seul qui dépasse est redécoupé (`separators`).
+        """
+        chunks: List[Span] = []
+        current: deque = deque()
+        total = 0
+        i = 0
+        while i < len(pieces) or current:
+            if i < len(pieces) and (not current or total + pieces[i][2] <= self.chunk_tokens):
+                current.append(pieces[i])
+                total += pieces[i][2]
+                i += 1
+                continue
+
+            while len(current) > 1 and not self._fits(text, current[0][0], current[-1][1]):
+                total -= current.pop()[2]
+                i -= 1
+            if len(current) == 1 and separators and not self._fits(text, current[0][0], current[0][1]):
+                chunks.extend(self._split(text, offsets, *current[0], separators))
+            else:
+                chunks.append((current[0][0], current[-1][1]))
+            if i == len(pieces):
+                break
+
+            # Overlap : on garde la fin du chunk précédent, dans la limite de overlap_tokens
+            # (au moins un morceau retiré : le chunk suivant commence plus loin)
+            n = pieces[i][2]
+            total -= current.popleft()[2]
+            while current and (total > self.overlap_tokens or total + n > self.chunk_tokens):
+                total -= current.popleft()[2]
+        return chunks
+
+    def _split_tokens(self, text: str, offsets: np.ndarray, start: int, end: int) -> List[Span]:
+        """Dernier recours (aucun séparateur) : coupe tous les `chunk_tokens` tokens (moins si le texte final dépasse)."""
+        first, last = np.searchsorted(offsets, [start, end]).tolist()
+        chunks: List[Span] = []
+        i = first
+        while i < last:
+            j = min(i + self.chunk_tokens, last)
+            chunk_start = start if i == first else int(offsets[i])
+            chunk_end = end if j == last else int(offsets[j])
+            while j > i + 1 and not self._fits(text, chunk_start, chunk_end):
+                j -= 1
+                chunk_end = int(offsets[j])
+            chunks.append((chunk_start, chunk_end))
+            if j == last:
+                break
+            i = max(j - self.overlap_tokens, i + 1)
+        return chunks or [(start, end)]
@@ -0,0 +1,166 @@
+"""
+clients.py
+Registre des clients OpenAI partagés par les agents, le routeur et le retrieval.
+
+Un `ChatOpenAI` / `OpenAIEmbeddings` est créé une fois par (modèle, paramètres) puis réutilisé.
+Tous s'appuient sur le même couple de clients httpx (synchrone + asynchrone) : les connexions
+restent ouvertes entre deux appels (keep-alive), la poignée de main TCP + TLS n'est payée
+qu'à la première requête. Limites du pool et timeouts : section "CLIENTS HTTP" de config.py.
+Les clients asynchrones sont utilisés depuis la boucle partagée (`src.aio`), qui vit aussi
+longtemps que le process.
+"""
+
+from __future__ import annotations
+
+import atexit
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from loguru import logger
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from config import (
+    LLM_MODEL,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    OPENAI_API_KEY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_TIMEOUT,
+)
+
+_lock = threading.RLock()  # get_chat_model -> get_http_client sous le même verrou
+_http: Optional[httpx.Client] = None
+_async_http: Optional[httpx.AsyncClient] = None
+_chat_models: Dict[Tuple, ChatOpenAI] = {}
+_embeddings: Dict[Tuple, OpenAIEmbeddings] = {}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+
+def get_http_client() -> httpx.Client:
+    """Client httpx synchrone partagé (pool de connexions keep-alive)."""
+    global _http
+    if _http is None or _http.is_closed:
+        with _lock:
+            if _http is None or _http.is_closed:
+                _http = httpx.Client(limits=_limits(), timeout=_timeout())
+    return _http
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Client httpx asynchrone partagé (pool de connexions keep-alive)."""
+    global _async_http
+    if _async_http is None or _async_http.is_closed:
+        with _lock:
+            if _async_http is None or _async_http.is_closed:
+                _async_http = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+    return _async_http
+
+
+def _key(model: str, params: Dict[str, Any]) -> Tuple:
+    return (model, tuple(sorted(params.items())))
+
+
+def get_chat_model(model: str = LLM_MODEL, **params: Any) -> ChatOpenAI:
+    """
+    `ChatOpenAI` partagé pour (modèle, paramètres), ex : `get_chat_model(temperature=0.2)`.
+    Les paramètres doivent être hashables (température, base_url, max_retries...).
+    `stream_usage` est activé par défaut : l'usage en tokens arrive aussi en streaming (télémétrie).
+    """
+    params.setdefault("stream_usage", True)
+    key = _key(model, params)
+    llm = _chat_models.get(key)
+    if llm is None:
+        with _lock:
+            llm = _chat_models.get(key)
+            if llm is None:
+                llm = ChatOpenAI(
+                    model=model,
+                    http_client=get_http_client(),
+                    http_async_client=get_async_http_client(),
+                    **params,
+                )
+                _chat_models[key] = llm
+    return llm
+
+
+def get_openai_embeddings(
+    model: str = EMBEDDING_MODEL,
+    dimensions: Optional[int] = EMBEDDING_DIMENSIONS,
+    **params: Any,
+) -> OpenAIEmbeddings:
+    """`OpenAIEmbeddings` partagé pour (modèle, dimension, paramètres), sur le pool commun."""
+    params.setdefault("api_key", OPENAI_API_KEY)
+    key = _key(model, dict(params, dimensions=dimensions))
+    embeddings = _embeddings.get(key)
+    if embeddings is None:
+        with _lock:
+            embeddings = _embeddings.get(key)
+            if embeddings is None:
+                embeddings = OpenAIEmbeddings(
+                    model=model,
+                    dimensions=dimensions,
+                    http_client=get_http_client(),
+                    http_async_client=get_async_http_client(),
+                    **params,
+                )
+                _embeddings[key] = embeddings
+    return embeddings
+
+
+def client_stats() -> Dict[str, Any]:
+    """Clients en registre et configuration du pool."""
+    return {
+        "chat_models": len(_chat_models),
+        "embeddings": len(_embeddings),
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        "http_open": _http is not None and not _http.is_closed,
+        "async_http_open": _async_http is not None and not _async_http.is_closed,
+    }
+
+
+def close_clients() -> None:
+    """
+    Ferme les pools de connexions, le cache d'embeddings partagé, et vide le registre
+    (appelé à l'arrêt du process). Les prochains `get_*` recréent des clients neufs.
+    """
+    global _http, _async_http
+    from src.embeddings import close_embedding_cache
+
+    close_embedding_cache()
+    with _lock:
+        http, async_http = _http, _async_http
+        _http, _async_http = None, None
+        _chat_models.clear()
+        _embeddings.clear()
+
+    if http is not None:
+        http.close()
+    if async_http is not None and not async_http.is_closed:
+        from src.aio import submit
+
+        try:
+            # Les connexions asynchrones appartiennent à la boucle partagée : fermeture sur celle-ci
+            submit(async_http.aclose()).result(timeout=5)
+        except Exception as e:
+            logger.debug(f"Fermeture du client HTTP asynchrone : {e}")
+    if http is not None or async_http is not None:
+        logger.info("🔌 Clients HTTP OpenAI fermés.")
+
+
+atexit.register(close_clients)
@@ -0,0 +1,126 @@
+"""
+context.py
+Assemblage du contexte documentaire envoyé aux LLMs, commun à tous les agents :
+seuil de score -> fusion des chunks adjacents (overlap) -> remplissage d'un budget de tokens.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+from langchain_core.documents import Document
+
+from config import LLM_MODEL, SIMILARITY_THRESHOLD
+from src.tokens import count_tokens_batch, get_encoding
+
+SEPARATOR = "\n\n"
+
+
+def filter_by_score(docs: List[Document], threshold: float = SIMILARITY_THRESHOLD) -> List[Document]:
+    """
+    Écarte les chunks dont la similarité cosinus (`metadata["score"]`) est sous le seuil.
+    Les chunks sans score (remontés par BM25 seul, sur des termes exacts) sont conservés.
+    """
+    return [d for d in docs if d.metadata.get("score") is None or d.metadata["score"] >= threshold]
+
+
+def merge_adjacent(docs: List[Document]) -> List[Document]:
+    """
+    Fusionne les chunks qui se chevauchent ou se touchent (même fichier, même page),
+    d'après `start_index` : l'overlap du découpage n'est envoyé qu'une fois.
+    Les blocs fusionnés gardent le rang de leur meilleur chunk et le meilleur score.
+    """
+    groups: Dict[Tuple, List[Tuple[int, Document]]] = {}
+    standalone: List[Tuple[int, Document]] = []
+    for rank, doc in enumerate(docs):
+        if doc.metadata.get("start_index") is None:
+            standalone.append((rank, doc))
+            continue
+        # `filename` (nom technique, unique) ; `source` n'est qu'un libellé d'affichage
+        name = doc.metadata.get("filename") or doc.metadata.get("source")
+        key = (name, doc.metadata.get("page"))
+        groups.setdefault(key, []).append((rank, doc))
+
+    merged: List[Tuple[int, Document]] = list(standalone)
+    for members in groups.values():
+        members.sort(key=lambda item: item[1].metadata["start_index"])
+        rank, current = members[0]
+        start = current.metadata["start_index"]
+        text = current.page_content
+        scores = [current.metadata.get("score")]
+
+        for next_rank, doc in members[1:]:
+            next_start = doc.metadata["start_index"]
+            end = start + len(text)
+            if next_start <= end:
+                # Chevauchement : on n'ajoute que la partie nouvelle
+                text += doc.page_content[end - next_start :]
+                rank = min(rank, next_rank)
+                scores.append(doc.metadata.get("score"))
+                continue
+            merged.append((rank, _merged_doc(current, start, text, scores)))
+            rank, current, start, text = next_rank, doc, next_start, doc.page_content
+            scores = [doc.metadata.get("score")]
+        merged.append((rank, _merged_doc(current, start, text, scores)))
+
+    merged.sort(key=lambda item: item[0])
+    return [doc for _, doc in merged]
+
+
+def _merged_doc(first: Document, start: int, text: str, scores: List[Optional[float]]) -> Document:
+    if text is first.page_content:
+        return first
+    metadata = dict(first.metadata, start_index=start)
+    known = [s for s in scores if s is not None]
+    if known:
+        metadata["score"] = max(known)
+    return Document(id=first.id, page_content=text, metadata=metadata)
+
+
+def pack_to_budget(docs: List[Document], max_tokens: int, model: Optional[str] = LLM_MODEL) -> List[Document]:
+    """
+    Garde les blocs par ordre de pertinence tant que le budget de tokens le permet.
+    Un bloc trop gros est sauté (les suivants peuvent encore tenir) ; si même le premier
+    ne tient pas, il est tronqué pour ne pas renvoyer un contexte vide.
+    """
+    if not docs:
+        return []
+
+    sizes = count_tokens_batch([d.page_content for d in docs], model=model)
+    separator_tokens = count_tokens_batch([SEPARATOR], model=model)[0]
+    kept: List[Document] = []
+    used = 0
+    for doc, size in zip(docs, sizes):
+        cost = size + (separator_tokens if kept else 0)
+        if used + cost <= max_tokens:
+            kept.append(doc)
+            used += cost
+
+    if not kept:
+        encoding = get_encoding(model)
+        truncated = encoding.decode(encoding.encode_ordinary(docs[0].page_content)[:max_tokens])
+        kept = [Document(id=docs[0].id, page_content=truncated, metadata=dict(docs[0].metadata))]
+    return kept
+
+
+def build_context(
+    docs: List[Document],
+    max_tokens: int,
+    threshold: float = SIMILARITY_THRESHOLD,
+    model: Optional[str] = LLM_MODEL,
+) -> Tuple[str, List[Document]]:
+    """
+    Contexte prêt pour le prompt : (texte, documents effectivement retenus).
+    Les documents retenus gardent leurs métadonnées (source, page) pour l'affichage des sources.
+    """
+    relevant = filter_by_score(docs, threshold)
+    blocks = merge_adjacent(relevant)
+    kept = pack_to_budget(blocks, max_tokens, model=model)
+
+    context = SEPARATOR.join(d.page_content for d in kept)
+    logger.debug(
+        f"🧱 Contexte : {len(docs)} chunks -> {len(relevant)} au-dessus du seuil -> "
+        f"{len(blocks)} blocs -> {len(kept)} retenus (budget {max_tokens} tokens)"
+    )
+    return context, kept
@@ -0,0 +1,240 @@
+"""
+embedding_scheduler.py
+Ordonnanceur d'embeddings pour l'ingestion :
+lots calibrés en tokens (tiktoken), requêtes concurrentes, backoff adaptatif sur les 429.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from config import (
+    EMBEDDING_MODEL,
+    INGEST_BATCH_SIZE,
+    EMBED_BATCH_MAX_TOKENS,
+    EMBED_CONCURRENCY,
+    EMBED_MAX_RETRIES,
+)
+from src.tokens import count_tokens_batch
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """
+    Délai demandé par l'API si l'erreur est un 429 (en-tête Retry-After), 0 si 429 sans en-tête,
+    None si ce n'est pas un rate limit.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return None
+    try:
+        return float(response.headers.get("retry-after", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+class _AdaptiveLimiter:
+    """
+    Limite de concurrence AIMD : divisée par deux à chaque 429, +1 après une série de succès.
+    Un 429 impose aussi une pause commune à tous les workers (`resume_at`).
+    """
+
+    def __init__(self, max_limit: int) -> None:
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.active = 0
+        self.resume_at = 0.0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                wait = self.resume_at - time.monotonic()
+                if wait <= 0 and self.active < self.limit:
+                    self.active += 1
+                    return
+                self._cond.wait(timeout=max(wait, 0.05))
+
+    def release(self, throttled: bool = False, delay: float = 0.0) -> None:
+        with self._cond:
+            self.active -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self.resume_at = max(self.resume_at, time.monotonic() + delay)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self.limit < self.max_limit and self._successes >= self.limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+@dataclass
+class SchedulerStats:
+    chunks: int = 0
+    batches: int = 0
+    tokens: int = 0
+    throttled: int = 0
+    retries: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class EmbeddingScheduler:
+    """
+    Envoie des chunks à un objet `Embeddings` par lots d'au plus `max_tokens_per_batch` tokens
+    (et `max_inputs_per_batch` textes), avec jusqu'à `max_concurrency` lots en parallèle.
+    Sur un 429, la concurrence est réduite et tous les workers marquent une pause
+    (Retry-After si fourni, sinon backoff exponentiel avec jitter).
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_tokens_per_batch: int = EMBED_BATCH_MAX_TOKENS,
+        max_inputs_per_batch: int = INGEST_BATCH_SIZE,
+        max_concurrency: int = EMBED_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        model: str = EMBEDDING_MODEL,
+    ) -> None:
+        self.embeddings = embeddings
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_inputs_per_batch = max_inputs_per_batch
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.model = model
+        self.stats = SchedulerStats()
+        self._limiter = _AdaptiveLimiter(self.max_concurrency)
+        self._stats_lock = threading.Lock()
+
+    # ---------- Batching ----------
+
+    def iter_batches(
+        self, items: Iterable[Tuple[Any, Document]], window: int = 256
+    ) -> Iterator[List[Tuple[Any, Document]]]:
+        """Regroupe un flux de (clé, chunk) en lots bornés en tokens et en nombre de textes."""
+        batch: List[Tuple[Any, Document]] = []
+        batch_tokens = 0
+        iterator = iter(items)
+
+        while True:
+            # Comptage des tokens par fenêtre (encodage en lot, plus rapide que texte par texte)
+            pending = [item for _, item in zip(range(window), iterator)]
+            if not pending:
+                break
+            sizes = count_tokens_batch([doc.page_content for _, doc in pending], self.model)
+            for item, n_tokens in zip(pending, sizes):
+                if batch and (
+                    batch_tokens + n_tokens > self.max_tokens_per_batch
+                    or len(batch) >= self.max_inputs_per_batch
+                ):
+                    yield batch
+                    batch, batch_tokens = [], 0
+                batch.append(item)
+                batch_tokens += n_tokens
+                with self._stats_lock:
+                    self.stats.tokens += n_tokens
+
+        if batch:
+            yield batch
+
+    # ---------- Exécution ----------
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            self._limiter.acquire()
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                retry_after = _retry_after(e)
+                if retry_after is None or attempt >= self.max_retries:
+                    self._limiter.release()
+                    raise
+                delay = retry_after or min(self.max_delay, self.base_delay * 2**attempt)
+                delay *= 1 + random.random() * 0.25  # jitter : évite que tous repartent ensemble
+                self._limiter.release(throttled=True, delay=delay)
+                with self._stats_lock:
+                    self.stats.throttled += 1
+                    self.stats.retries += 1
+                logger.warning(
+                    f"⏳ Rate limit (429) : pause {delay:.1f}s, concurrence réduite à {self._limiter.limit}."
+                )
+                attempt += 1
+                continue
+            self._limiter.release()
+            return vectors
+
+    def embed_stream(
+        self, items: Iterable[Tuple[Any, Document]]
+    ) -> Iterator[Tuple[List[Any], List[Document], List[List[float]]]]:
+        """
+        Embedde un flux de (clé, chunk) et produit des lots (clés, chunks, vecteurs),
+        dans l'ordre d'arrivée. Au plus `2 * max_concurrency` lots sont en mémoire.
+        """
+        start = time.perf_counter()
+        in_flight: deque = deque()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embed") as pool:
+
+            def collect(entry: Tuple[List[Tuple[Any, Document]], Future]):
+                batch, future = entry
+                vectors = future.result()
+                with self._stats_lock:
+                    self.stats.chunks += len(batch)
+                    self.stats.batches += 1
+                    self.stats.elapsed_seconds = time.perf_counter() - start
+                return [k for k, _ in batch], [d for _, d in batch], vectors
+
+            for batch in self.iter_batches(items):
+                texts = [doc.page_content for _, doc in batch]
+                in_flight.append((batch, pool.submit(self._embed_batch, texts)))
+                if len(in_flight) >= 2 * self.max_concurrency:
+                    yield collect(in_flight.popleft())
+
+            while in_flight:
+                yield collect(in_flight.popleft())
+
+        with self._stats_lock:
+            self.stats.elapsed_seconds = time.perf_counter() - start
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Version liste : mêmes lots / concurrence / backoff, vecteurs dans l'ordre des textes."""
+        items = ((i, Document(page_content=t)) for i, t in enumerate(texts))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for keys, _, batch_vectors in self.embed_stream(items):
+            for i, vector in zip(keys, batch_vectors):
+                vectors[i] = vector
+        return vectors
+
+    def report(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "chunks": self.stats.chunks,
+                "batches": self.stats.batches,
+                "tokens": self.stats.tokens,
+                "throttled": self.stats.throttled,
+                "retries": self.stats.retries,
+                "elapsed_seconds": round(self.stats.elapsed_seconds, 3),
+                "chunks_per_second": round(self.stats.chunks_per_second, 1),
+                "concurrency": self._limiter.limit,
+            }
@@ -0,0 +1,249 @@
+"""
+embeddings.py
+Fabrique des embeddings (ingestion + retrieval) avec cache disque persistant.
+Un vecteur déjà calculé pour (modèle, dimension, texte) n'est jamais redemandé à OpenAI.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from langchain_core.embeddings import Embeddings
+
+from config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+)
+
+
+def _text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Enveloppe un objet `Embeddings` avec un cache SQLite.
+
+    - Clé : (modèle, dimension, sha256 du texte) ; valeur : vecteur float32 compact.
+    - Compteurs `hits` / `misses` pour mesurer l'efficacité du cache.
+    - Taille plafonnée à `max_entries` : les entrées les moins récemment utilisées sont évincées.
+      Un hit n'écrit rien : les dates d'usage sont gardées en mémoire et écrites par lots
+      (`touch_flush_size` entrées ou `touch_flush_seconds` écoulées), avant chaque éviction
+      et à la fermeture.
+    - Thread-safe (une connexion partagée protégée par un verrou).
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model: str,
+        dimensions: Optional[int] = None,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        touch_flush_size: int = 1000,
+        touch_flush_seconds: float = 60.0,
+    ) -> None:
+        self.underlying = underlying
+        self.model = model
+        self.dimensions = dimensions or 0
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_flush_size = touch_flush_size
+        self.touch_flush_seconds = touch_flush_seconds
+        self.hits = 0
+        self.misses = 0
+        self._touched: Dict[bytes, float] = {}  # last_used en attente d'écriture
+        self._touched_since = time.monotonic()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dims INTEGER NOT NULL,
+                text_hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dims, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    # ---------- Cache ----------
+
+    def _lookup(self, hashes: List[bytes]) -> Dict[bytes, List[float]]:
+        found: Dict[bytes, List[float]] = {}
+        with self._lock:
+            # Requêtes par paquets : SQLite limite le nombre de paramètres par requête
+            for i in range(0, len(hashes), 500):
+                part = hashes[i : i + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND dims = ? "
+                    f"AND text_hash IN ({','.join('?' * len(part))})",
+                    [self.model, self.dimensions, *part],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._touched.update(dict.fromkeys(found, now))
+                if (
+                    len(self._touched) >= self.touch_flush_size
+                    or time.monotonic() - self._touched_since >= self.touch_flush_seconds
+                ):
+                    self._flush_touched()
+                    self._conn.commit()
+        return found
+
+    def _flush_touched(self) -> None:
+        """Écrit les dates d'usage en attente (appelé sous verrou, commit à la charge de l'appelant)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND dims = ? AND text_hash = ?",
+                [(now, self.model, self.dimensions, h) for h, now in self._touched.items()],
+            )
+            self._touched.clear()
+        self._touched_since = time.monotonic()
+
+    def _store(self, items: Dict[bytes, List[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, dims, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (self.model, self.dimensions, h, array("f", vector).tobytes(), now)
+                    for h, vector in items.items()
+                ],
+            )
+            self._entries += self._conn.total_changes - before
+            if self._entries > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Évince les entrées les plus anciennes jusqu'à 90 % du plafond (appelé sous verrou)."""
+        target = int(self.max_entries * 0.9)
+        excess = self._entries - target
+        self._flush_touched()  # l'ordre LRU doit tenir compte des hits récents
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE (model, dims, text_hash) IN ("
+            "SELECT model, dims, text_hash FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._entries = target
+        logger.info(f"♻️ Cache d'embeddings : {excess} entrées évincées (plafond {self.max_entries}).")
+
+    # ---------- Interface Embeddings ----------
+
+    def _partition(self, texts: List[str]):
+        """Sépare les textes déjà en cache des textes à calculer (dédupliqués)."""
+        hashes = [_text_hash(t) for t in texts]
+        cached = self._lookup(list(set(hashes)))
+
+        missing: Dict[bytes, str] = {}
+        for h, text in zip(hashes, texts):
+            if h not in cached:
+                missing.setdefault(h, text)
+
+        with self._lock:
+            self.hits += len(texts) - sum(1 for h in hashes if h in missing)
+            self.misses += len(missing)
+        return hashes, cached, missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, cached, missing = self._partition(texts)
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            cached.update(computed)
+        return [cached[h] for h in hashes]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Lectures / écritures SQLite hors de la boucle partagée (bloquantes, verrou compris)
+        hashes, cached, missing = await asyncio.to_thread(self._partition, texts)
+        if missing:
+            vectors = await self.underlying.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self._store, computed)
+            cached.update(computed)
+        return [cached[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": self._entries,
+                "max_entries": self.max_entries,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._flush_touched()
+                self._conn.commit()
+            except sqlite3.ProgrammingError:  # connexion déjà fermée
+                pass
+            self._conn.close()
+
+
+_shared_lock = threading.Lock()
+_shared: Optional[CachedEmbeddings] = None
+
+
+def get_embeddings() -> Embeddings:
+    """
+    Objet Embeddings utilisé par l'ingestion, le routeur et le retrieval :
+    OpenAI (client partagé, pool keep-alive), enveloppé par le cache disque si EMBEDDING_CACHE_ENABLED.
+    Le cache est unique pour le process (une connexion SQLite, un compteur d'entrées pour
+    le plafond) ; il est fermé avec les clients partagés (`src.clients.close_clients`).
+    """
+    global _shared
+    # langchain_openai n'est chargé qu'à la première demande d'embeddings
+    from src.clients import get_openai_embeddings
+
+    embeddings: Embeddings = get_openai_embeddings(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+    if not EMBEDDING_CACHE_ENABLED:
+        return embeddings
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = CachedEmbeddings(embeddings, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS)
+    return _shared
+
+
+def close_embedding_cache() -> None:
+    """Ferme le cache d'embeddings partagé ; le prochain `get_embeddings` en rouvre un."""
+    global _shared
+    with _shared_lock:
+        cache, _shared = _shared, None
+    if cache is not None:
+        cache.close()
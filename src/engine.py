@@ -0,0 +1,185 @@
+"""
+engine.py
+Orchestrateur des agents : exécute l'agent choisi en injectant le contexte métier (Framework, Risque).
+
+`arun_agent_engine` est la version asynchrone : les questions en vol se chevauchent sur la
+boucle partagée (`src.aio`) au lieu d'occuper chacune un thread pendant l'aller-retour
+retrieval + LLM. `run_agent_engine` en reste une enveloppe synchrone.
+
+Les modules d'agents sont importés à la première exécution de chacun (`get_agent_function`) :
+importer l'orchestrateur ne charge ni les agents ni langchain_openai.
+
+Le retrieval est fait une seule fois par tour, au plus grand k des agents : chaque agent
+reçoit le même résultat et en garde ce dont il a besoin (voir AGENT_TOP_K).
+"""
+
+import asyncio
+from typing import Any, Awaitable, Dict, Iterable, List, Literal, Optional, Union
+
+from loguru import logger
+from langchain_core.documents import Document
+
+from config import AGENT_TOP_K
+from src.aio import run_sync
+from src.profiling import profiled
+from src.retrieval import aget_relevant_docs, get_relevant_docs
+from src.telemetry import trace
+from src.agents import get_agent_function
+
+# --- DÉFINITION DES TYPES ---
+AgentName = Literal[
+    "auto",
+    "rag",
+    "summary",
+    "compliance",
+    "governance",
+    "generator",
+]
+
+
+# --- RETRIEVAL PARTAGÉ ---
+def turn_top_k(agents: Optional[Iterable[str]] = None) -> int:
+    """k de la recherche du tour : le plus grand k parmi `agents` (tous les agents par défaut)."""
+    ks = [AGENT_TOP_K[a] for a in (agents or AGENT_TOP_K) if a in AGENT_TOP_K]
+    return max(ks) if ks else 0
+
+
+async def aretrieve_for_turn(
+    user_input: str,
+    agents: Optional[Iterable[str]] = None,
+    vector: Union[List[float], Awaitable[Optional[List[float]]], None] = None,
+) -> List[Document]:
+    """
+    Retrieval unique du tour (embedding + recherche), partagé par tous les agents appelés.
+    `vector` : embedding de la question s'il est déjà calculé (ex. par le routeur), ou
+    awaitable qui le fournira, attendu seulement si le chemin lexical rapide ne répond pas.
+    """
+    k = turn_top_k(agents)
+    if not k:
+        if asyncio.iscoroutine(vector):
+            vector.close()
+        return []
+    return await aget_relevant_docs(user_input, k=k, vector=vector)
+
+
+def retrieve_for_turn(
+    user_input: str,
+    agents: Optional[Iterable[str]] = None,
+    vector: Optional[List[float]] = None,
+) -> List[Document]:
+    """Version synchrone de `aretrieve_for_turn`."""
+    k = turn_top_k(agents)
+    return get_relevant_docs(user_input, k=k, vector=vector) if k else []
+
+
+# --- EXÉCUTION ---
+async def arun_agent_engine(
+    user_input: str,
+    agent: AgentName,
+    framework: str,
+    risk: str,
+    docs: Optional[List[Document]] = None,
+) -> Dict[str, Any]:
+    """
+    Orchestrateur asynchrone : exécute l'agent choisi en injectant le contexte métier (Framework, Risque).
+    `docs` : résultat du retrieval du tour, s'il a déjà été fait (sinon il est fait ici, une fois).
+    Tracé en télémétrie, sauf s'il s'exécute dans une trace déjà ouverte (tour de l'UI, multi-agents).
+    """
+    with trace("agent", agent=agent):
+        logger.info(f"🚀 Execution Agent: {agent} | Context: {framework}, {risk}")
+
+        if docs is None and agent != "governance":
+            docs = await aretrieve_for_turn(user_input)
+
+        if agent == "rag":
+            return await get_agent_function("rag", "arun")(user_input, docs=docs)
+        elif agent == "summary":
+            return await get_agent_function("summary", "arun")(user_input, docs=docs)
+        elif agent == "compliance":
+            return await get_agent_function("compliance", "arun")(
+                user_input, framework=framework, risk_level=risk, docs=docs
+            )
+        elif agent == "governance":
+            return await get_agent_function("governance", "arun")(user_input, risk_level=risk)
+        elif agent == "generator":
+            return await get_agent_function("generator", "arun")(user_input, docs=docs)
+
+        return await get_agent_function("rag", "arun")(user_input, docs=docs)
+
+
+def run_agent_engine(
+    user_input: str,
+    agent: AgentName,
+    framework: str,
+    risk: str,
+    docs: Optional[List[Document]] = None,
+) -> Dict[str, Any]:
+    """
+    Version synchrone de `arun_agent_engine` (exécutée sur la boucle partagée).
+    Profilée si PROFILING_ENABLED : le profil est pris sur la boucle, là où l'agent s'exécute.
+    """
+
+    async def _profiled() -> Dict[str, Any]:
+        with profiled("agent", query=user_input, agent=agent):
+            return await arun_agent_engine(user_input, agent, framework, risk, docs=docs)
+
+    return run_sync(_profiled())
+
+
+async def arun_agents_parallel(
+    user_input: str,
+    agents: List[AgentName],
+    framework: str,
+    risk: str,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Mode multi-agents : un seul retrieval (au plus grand k des agents demandés), puis
+    tous les agents en parallèle sur ce même contexte. Renvoie {agent: résultat}.
+    """
+    with trace("agents_parallel", agent="+".join(agents)):
+        docs = await aretrieve_for_turn(user_input, agents)
+        logger.info(f"🚀 Execution multi-agents: {', '.join(agents)} | {len(docs)} documents partagés")
+        results = await asyncio.gather(
+            *(arun_agent_engine(user_input, agent, framework, risk, docs=docs) for agent in agents)
+        )
+    return dict(zip(agents, results))
+
+
+def run_agents_parallel(
+    user_input: str,
+    agents: List[AgentName],
+    framework: str,
+    risk: str,
+) -> Dict[str, Dict[str, Any]]:
+    """Version synchrone de `arun_agents_parallel`."""
+    return run_sync(arun_agents_parallel(user_input, agents, framework, risk))
+
+
+def stream_agent_engine(
+    user_input: str,
+    agent: AgentName,
+    framework: str,
+    risk: str,
+    docs: Optional[List[Document]] = None,
+) -> Dict[str, Any]:
+    """
+    Variante streaming de l'orchestrateur : le retrieval est fait tout de suite,
+    la réponse arrive token par token via la clé `stream` (à la place de `answer`).
+    """
+    logger.info(f"🚀 Execution Agent (streaming): {agent} | Context: {framework}, {risk}")
+
+    if docs is None and agent != "governance":
+        docs = retrieve_for_turn(user_input)
+
+    if agent == "summary":
+        return get_agent_function("summary", "stream")(user_input, docs=docs)
+    elif agent == "compliance":
+        return get_agent_function("compliance", "stream")(
+            user_input, framework=framework, risk_level=risk, docs=docs
+        )
+    elif agent == "governance":
+        return get_agent_function("governance", "stream")(user_input, risk_level=risk)
+    elif agent == "generator":
+        return get_agent_function("generator", "stream")(user_input, docs=docs)
+
+    return get_agent_function("rag", "stream")(user_input, docs=docs)
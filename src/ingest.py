@@ -1,7 +1,8 @@
 """
 ingest.py
-Pipeline d’ingestion PRO : PDF -> Nettoyage -> Chunks -> VectorDB.
-Gère le reset de la base et la tolérance aux pannes.
+Pipeline d’ingestion PRO : PDF -> Nettoyage -> Chunks -> VectorDB (+ index lexical BM25).
+Mode incrémental par défaut (manifeste de hash), reset complet sur demande (--full).
+Pipeline en streaming (mémoire bornée) et tolérance aux pannes.
 """
 
 import sys
@@ -9,25 +10,60 @@ import os
 # Ajoute le dossier racine (parent) au chemin de recherche de Python
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import argparse
+import hashlib
+import json
+import queue
 import shutil
-from typing import List
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from tqdm import tqdm  # Pour la barre de progression
 
+import pypdf
+
 from loguru import logger
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
 
 from config import (
     DOCUMENTS_DIR,
     CHROMA_DB_DIR,
     CHUNK_SIZE,
     CHUNK_OVERLAP,
+    CHUNKER,
+    CHUNK_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
     EMBEDDING_MODEL,
-    OPENAI_API_KEY,
+    EMBEDDING_DIMENSIONS,
     CHROMA_COLLECTION_NAME,
+    INDEX_VERSION_FILE,
+    INGEST_MANIFEST_FILE,
+    LEXICAL_INDEX_FILE,
+    VECTOR_BACKEND,
+    NUMPY_STORE_DIR,
+    NUMPY_STORE_DTYPE,
+    NUMPY_STORE_RESCORE,
+    MATRYOSHKA_DIM,
+    INGEST_WORKERS,
+    PDF_PAGES_PER_TASK,
+    PAGE_STORE_ENABLED,
+    PAGE_STORE_DIR,
+    INGEST_BATCH_SIZE,
+    INGEST_QUEUE_DEPTH,
+    init_config,
 )
+from src.chunking import TokenChunker
+from src.embeddings import get_embeddings
+from src.embedding_scheduler import EmbeddingScheduler
+from src.lexical_index import LexicalIndex
+from src.numpy_store import export_from_chroma
+from src.page_store import PageStore
+from src.profiling import profile_function
 
 def reset_vector_db() -> None:
     """
@@ -38,107 +74,618 @@ def reset_vector_db() -> None:
         try:
             shutil.rmtree(CHROMA_DB_DIR)
             logger.warning(f"🧹 Ancienne base de données supprimée : {CHROMA_DB_DIR}")
+            # Chroma garde un client ouvert par dossier dans le process : on l'oublie.
+            from chromadb.api.client import SharedSystemClient
+
+            SharedSystemClient.clear_system_cache()
         except Exception as e:
             logger.error(f"❌ Impossible de supprimer l'ancienne DB : {e}")
 
-def load_pdfs() -> List:
-    """Charge tous les PDFs avec gestion d'erreurs et barre de progression."""
+def publish_index_version() -> str:
+    """
+    Écrit une nouvelle version d'index : les process qui partagent le handle
+    Chroma (voir `VectorStoreService`) rechargeront la base à leur prochaine requête.
+    """
+    version = str(time.time_ns())
+    os.makedirs(os.path.dirname(INDEX_VERSION_FILE), exist_ok=True)
+    with open(INDEX_VERSION_FILE, "w", encoding="utf-8") as f:
+        f.write(version)
+    logger.info(f"🏷️ Version d'index publiée : {version}")
+    return version
+
+
+def list_pdf_files() -> List[str]:
+    """Liste (triée) des PDFs présents dans le dossier documents."""
     if not os.path.exists(DOCUMENTS_DIR):
         raise ValueError(f"❌ Dossier documents introuvable : {DOCUMENTS_DIR}")
 
-    files = [f for f in os.listdir(DOCUMENTS_DIR) if f.lower().endswith(".pdf")]
-    
-    if not files:
-        raise ValueError("❌ Aucun document PDF trouvé.")
+    return sorted(f for f in os.listdir(DOCUMENTS_DIR) if f.lower().endswith(".pdf"))
+
+
+def file_sha256(file_path: str) -> str:
+    """Hash du contenu d'un fichier (lecture par blocs, pas de chargement complet)."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-    docs: List = []
-    
-    logger.info(f"📂 Découverte de {len(files)} fichiers PDF...")
 
-    # Utilisation de TQDM pour une barre de progression pro
-    for filename in tqdm(files, desc="Chargement des PDF"):
-        file_path = os.path.join(DOCUMENTS_DIR, filename)
-        
+def _index_settings() -> Dict:
+    """Paramètres qui, s'ils changent, invalident tous les vecteurs existants."""
+    settings = {
+        "embedding_model": EMBEDDING_MODEL,
+        "embedding_dimensions": EMBEDDING_DIMENSIONS,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+    }
+    # Clés absentes pour le découpeur par défaut : les manifestes existants restent valides
+    if CHUNKER == "tokens":
+        settings.update(chunker=CHUNKER, chunk_tokens=CHUNK_TOKENS, chunk_overlap_tokens=CHUNK_OVERLAP_TOKENS)
+    return settings
+
+
+def load_manifest() -> Optional[Dict]:
+    """Charge le manifeste d'ingestion (None si absent ou illisible)."""
+    if not os.path.exists(INGEST_MANIFEST_FILE):
+        return None
+    try:
+        with open(INGEST_MANIFEST_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"⚠️ Manifeste illisible ({e}) : reconstruction complète nécessaire.")
+        return None
+
+
+def save_manifest(manifest: Dict) -> None:
+    """Écriture atomique du manifeste (fichier temporaire + rename)."""
+    os.makedirs(os.path.dirname(INGEST_MANIFEST_FILE), exist_ok=True)
+    tmp_path = f"{INGEST_MANIFEST_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, INGEST_MANIFEST_FILE)
+
+
+def _with_chunk_ids(
+    chunks: Iterable[Document], file_hashes: Dict[str, str], written: Dict[str, List[str]]
+) -> Iterator[Tuple[str, Document]]:
+    """
+    Associe à chaque chunk un ID déterministe `<empreinte nom + contenu>:<n° du chunk>` :
+    ré-ingérer le même fichier réécrit les mêmes IDs (upsert) au lieu de créer des doublons,
+    et deux PDFs identiques sous des noms différents gardent des IDs distincts (supprimer ou
+    modifier l'un ne retire pas les vecteurs de l'autre).
+    Les IDs produits sont consignés par fichier dans `written` (pour le manifeste).
+    """
+    prefixes: Dict[str, str] = {}
+    for chunk in chunks:
+        filename = chunk.metadata["filename"]
+        if filename not in prefixes:
+            key = f"{filename}\0{file_hashes[filename]}".encode("utf-8")
+            prefixes[filename] = hashlib.sha256(key).hexdigest()[:16]
+        file_ids = written.setdefault(filename, [])
+        chunk_id = f"{prefixes[filename]}:{len(file_ids)}"
+        file_ids.append(chunk_id)
+        yield chunk_id, chunk
+
+
+_DONE = object()
+
+
+def _prefetch(iterable: Iterable, depth: int) -> Iterator:
+    """
+    Consomme `iterable` dans un thread producteur, via une file bornée à `depth` éléments :
+    le parsing/découpage avance pendant l'embedding, sans jamais accumuler plus de `depth` lots.
+    """
+    items: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def produce() -> None:
         try:
-            loader = PyPDFLoader(file_path)
-            file_docs = loader.load()
-            
-            # Nettoyage des métadonnées pour l'UI
-            clean_name = os.path.splitext(filename)[0].replace("_", " ").title()
-            
-            for d in file_docs:
-                d.metadata["source"] = clean_name  # Nom joli pour l'UI
-                d.metadata["filename"] = filename  # Nom technique
-                
-            docs.extend(file_docs)
-            
-        except Exception as e:
-            logger.error(f"⚠️ Erreur lors du chargement de {filename} : {e}")
+            for item in iterable:
+                if stop.is_set():
+                    break
+                items.put(item)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            items.put(_DONE)
+
+    producer = threading.Thread(target=produce, name="ingest-prefetch", daemon=True)
+    producer.start()
+    try:
+        while (item := items.get()) is not _DONE:
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        # Arrêt anticipé côté consommateur : on débloque le producteur puis on l'attend.
+        stop.set()
+        while producer.is_alive():
+            try:
+                items.get_nowait()
+            except queue.Empty:
+                producer.join(timeout=0.05)
+
+
+def _clean_source_name(filename: str) -> str:
+    """Nom lisible pour l'UI à partir du nom de fichier."""
+    return os.path.splitext(filename)[0].replace("_", " ").title()
+
+
+def _pdf_metadata(reader: pypdf.PdfReader, file_path: str) -> Dict[str, Any]:
+    """
+    Métadonnées du document (producer, creator, dates, auteur, titre...) normalisées comme
+    le fait PyPDFParser (LangChain) : clés sans "/" en minuscules, dates ISO 8601, str / int.
+    """
+    raw = (
+        {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+        | dict(reader.metadata or {})
+        | {"source": file_path, "total_pages": len(reader.pages)}
+    )
+    renamed = {"page_count": "total_pages", "file_path": "source"}
+    metadata: Dict[str, Any] = {}
+    for key, value in raw.items():
+        if type(value) not in (str, int):
+            value = str(value)
+        key = (key[1:] if key.startswith("/") else key).lower()
+        if key in ("creationdate", "moddate"):
+            try:
+                value = datetime.strptime(value.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+            except ValueError:
+                pass
+        elif key in renamed:
+            metadata[renamed[key]] = value
+        elif isinstance(value, str):
+            value = value.strip()
+        metadata[key] = value
+    return metadata
+
+
+def _parse_pdf_pages(
+    file_path: str, page_range: Optional[Tuple[int, int]] = None
+) -> Tuple[Optional[List[Document]], Optional[str]]:
+    """
+    Extrait le texte d'un PDF (ou d'une plage de pages) — exécuté dans un worker.
+    Même extraction et mêmes métadonnées que PyPDFLoader (mode "plain", une Document par page,
+    métadonnées du document + n° et libellé de page).
+    Renvoie (pages, None) ou (None, message d'erreur) : une erreur ne fait pas tomber le pool.
+    """
+    try:
+        reader = pypdf.PdfReader(file_path)
+        doc_metadata = _pdf_metadata(reader, file_path)
+        start, end = page_range or (0, len(reader.pages))
+
+        pages = []
+        for page_number in range(start, end):
+            text = reader.pages[page_number].extract_text() or ""
+            pages.append(
+                Document(
+                    page_content=text.strip(),
+                    metadata=doc_metadata | {"page": page_number, "page_label": reader.page_labels[page_number]},
+                )
+            )
+        return pages, None
+    except Exception as e:
+        return None, str(e)
+
+
+def _count_pages(file_path: str) -> Optional[int]:
+    try:
+        return len(pypdf.PdfReader(file_path).pages)
+    except Exception as e:
+        logger.error(f"⚠️ PDF illisible {os.path.basename(file_path)} : {e}")
+        return None
+
+
+def _iter_pdf_tasks(files: List[str]) -> Iterator[Tuple[str, Optional[Tuple[int, int]]]]:
+    """Un task par fichier ; les gros PDFs sont découpés en plages de PDF_PAGES_PER_TASK pages."""
+    for filename in files:
+        n_pages = _count_pages(os.path.join(DOCUMENTS_DIR, filename))
+        if n_pages is None:
             continue
+        if n_pages <= PDF_PAGES_PER_TASK:
+            yield filename, None
+            continue
+        for start in range(0, n_pages, PDF_PAGES_PER_TASK):
+            yield filename, (start, min(start + PDF_PAGES_PER_TASK, n_pages))
 
-    logger.success(f"📥 {len(docs)} pages chargées au total.")
-    return docs
 
+def _finalize_file(filename: str, pages: List[Document], error: Optional[str]) -> List[Document]:
+    """Applique les métadonnées UI aux pages d'un fichier, ou l'écarte en entier s'il a échoué."""
+    if error is not None:
+        logger.error(f"⚠️ Erreur lors du chargement de {filename} : {error}")
+        return []
+
+    # Nettoyage des métadonnées pour l'UI
+    clean_name = _clean_source_name(filename)
+    for d in pages:
+        d.metadata["source"] = clean_name  # Nom joli pour l'UI
+        d.metadata["filename"] = filename  # Nom technique
+    return pages
 
-def chunk_documents(docs: List) -> List:
+
+def _parse_pdf_files(files: List[str], workers: int) -> Iterator[Document]:
     """
-    Découpe intelligente : on essaie de ne pas couper les phrases en deux.
+    Parse les PDFs et produit leurs pages au fil de l'eau (ordre de `files`, puis n° de page).
+
+    Le parsing est réparti sur un pool de `workers` process (1 = séquentiel) avec au plus
+    `2 * workers` plages en vol : la mémoire ne dépend pas de la taille du corpus,
+    seulement de celle du plus gros fichier.
+    """
+    if not files:
+        return
+    progress = tqdm(total=len(files), desc="Chargement des PDF")
+
+    if workers <= 1:
+        for filename in files:
+            pages, error = _parse_pdf_pages(os.path.join(DOCUMENTS_DIR, filename))
+            progress.update(1)
+            yield from _finalize_file(filename, pages, error)
+        progress.close()
+        return
+
+    tasks = _iter_pdf_tasks(files)
+    in_flight: deque = deque()
+    current_file, current_pages, current_error = None, [], None
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+
+        def refill() -> None:
+            while len(in_flight) < 2 * workers:
+                task = next(tasks, None)
+                if task is None:
+                    return
+                filename, page_range = task
+                path = os.path.join(DOCUMENTS_DIR, filename)
+                in_flight.append((filename, pool.submit(_parse_pdf_pages, path, page_range)))
+
+        refill()
+        while in_flight:
+            filename, future = in_flight.popleft()
+            pages, error = future.result()
+            refill()
+
+            if filename != current_file:
+                if current_file is not None:
+                    progress.update(1)
+                    yield from _finalize_file(current_file, current_pages, current_error)
+                current_file, current_pages, current_error = filename, [], None
+
+            # Un fichier dont une plage échoue est écarté en entier
+            if error is not None:
+                current_error = current_error or error
+            elif current_error is None:
+                current_pages.extend(pages)
+
+        if current_file is not None:
+            progress.update(1)
+            yield from _finalize_file(current_file, current_pages, current_error)
+
+    progress.close()
+
+
+def iter_pdf_pages(
+    files: List[str], workers: Optional[int] = None, file_hashes: Optional[Dict[str, str]] = None
+) -> Iterator[Document]:
+    """
+    Produit les pages des PDFs au fil de l'eau, dans un ordre déterministe
+    (ordre de `files`, puis n° de page).
+
+    Les PDFs déjà extraits (même contenu) sont relus depuis le cache de pages (PAGE_STORE_DIR) ;
+    les autres sont parsés par `_parse_pdf_files` (pool de `workers` process, INGEST_WORKERS
+    par défaut) puis mis en cache. `file_hashes` : SHA-256 déjà calculés, par nom de fichier.
     """
-    splitter = RecursiveCharacterTextSplitter(
+    workers = INGEST_WORKERS if workers is None else workers
+    if not PAGE_STORE_ENABLED:
+        yield from _parse_pdf_files(files, workers)
+        return
+
+    store = PageStore(PAGE_STORE_DIR)
+    hashes = dict(file_hashes or {})
+    for filename in files:
+        if filename not in hashes:
+            hashes[filename] = file_sha256(os.path.join(DOCUMENTS_DIR, filename))
+    # Seule la présence des entrées est testée ici : les pages en cache sont lues fichier par
+    # fichier pendant la fusion, la mémoire reste bornée même sur un corpus entièrement en cache
+    cached = {f for f in files if store.contains(hashes[f])}
+    to_parse = [f for f in files if f not in cached]
+    logger.info(f"🗃️ Cache de pages : {len(cached)} fichier(s) déjà extrait(s), {len(to_parse)} à parser.")
+
+    # Fusion dans l'ordre de `files` : les pages parsées arrivent groupées par fichier,
+    # dans l'ordre de `to_parse` (un fichier en échec n'en produit aucune)
+    parsed = _parse_pdf_files(to_parse, workers)
+    pending = next(parsed, None)
+    for filename in files:
+        if filename in cached:
+            pages = store.get(hashes[filename], source=os.path.join(DOCUMENTS_DIR, filename))
+            if pages is not None:
+                yield from _finalize_file(filename, pages, None)
+                continue
+            # Entrée illisible ou d'un autre extracteur : parsing immédiat de ce seul fichier
+            pages = list(_parse_pdf_files([filename], 1))
+        else:
+            pages = []
+            while pending is not None and pending.metadata["filename"] == filename:
+                pages.append(pending)
+                pending = next(parsed, None)
+        store.put(hashes[filename], pages)  # sans nom ni chemin : l'entrée ne dépend que du contenu
+        yield from pages
+
+
+def load_pdfs(files: Optional[List[str]] = None, workers: Optional[int] = None) -> List:
+    """
+    Charge les PDFs avec gestion d'erreurs et barre de progression.
+    Par défaut tous les PDFs du dossier, sinon uniquement `files` (noms de fichiers).
+    Version "liste" de `iter_pdf_pages` (voir ce dernier pour le parallélisme).
+    """
+    if files is None:
+        files = list_pdf_files()
+        if not files:
+            raise ValueError("❌ Aucun document PDF trouvé.")
+
+    workers = INGEST_WORKERS if workers is None else workers
+    logger.info(f"📂 Découverte de {len(files)} fichiers PDF ({workers} worker(s))...")
+
+    docs = list(iter_pdf_pages(files, workers=workers))
+
+    logger.success(f"📥 {len(docs)} pages chargées au total.")
+    return docs
+
+
+# Séparateurs prioritaires : Paragraphe > Ligne > Phrase > Mots
+SEPARATORS = ["\n\n", "\n", ".", " ", ""]
+
+
+def _make_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP,
         add_start_index=True,
-        # Séparateurs prioritaires : Paragraphe > Ligne > Phrase > Mots
-        separators=["\n\n", "\n", ".", " ", ""] 
+        separators=SEPARATORS,
+    )
+
+
+def _make_token_chunker() -> TokenChunker:
+    return TokenChunker(
+        chunk_tokens=CHUNK_TOKENS,
+        overlap_tokens=CHUNK_OVERLAP_TOKENS,
+        separators=SEPARATORS,
+        model=EMBEDDING_MODEL,
     )
-    chunks = splitter.split_documents(docs)
+
+
+def iter_chunks(pages: Iterable[Document], chunker: Optional[str] = None) -> Iterator[Document]:
+    """
+    Découpe les pages au fil de l'eau, avec le découpeur `chunker` (CHUNKER par défaut) :
+    "recursive" page par page, "tokens" par lots de pages encodés ensemble.
+    """
+    if (chunker or CHUNKER) == "tokens":
+        yield from _make_token_chunker().iter_split(pages)
+        return
+    splitter = _make_splitter()
+    for page in pages:
+        yield from splitter.split_documents([page])
+
+
+def chunk_documents(docs: List, chunker: Optional[str] = None) -> List:
+    """
+    Découpe intelligente : on essaie de ne pas couper les phrases en deux.
+    """
+    chunks = list(iter_chunks(docs, chunker=chunker))
     logger.success(f"🧩 Découpage terminé : {len(chunks)} fragments générés.")
     return chunks
 
 
-def embed_and_store(chunks: List) -> None:
-    """Génère les embeddings et stocke dans Chroma."""
+def _open_chroma():
+    """Collection Chroma de l'ingestion (langchain_community n'est importé qu'ici, à la demande)."""
+    from langchain_community.vectorstores import Chroma
+
+    return Chroma(collection_name=CHROMA_COLLECTION_NAME, persist_directory=CHROMA_DB_DIR)
+
+
+def embed_and_store(chunks: Iterable[Document], ids: Optional[Iterable[str]] = None) -> int:
+    """Génère les embeddings et stocke dans Chroma (ajout à la collection existante)."""
+    pairs = zip(ids, chunks) if ids is not None else ((None, c) for c in chunks)
+    return store_chunk_stream(pairs)
+
+
+def store_chunk_stream(
+    pairs: Iterable[Tuple[Optional[str], Document]],
+    lexical: Optional[LexicalIndex] = None,
+) -> int:
+    """
+    Écrit un flux de (id, chunk) dans Chroma (et dans l'index lexical `lexical` s'il est fourni).
+    Les embeddings sont calculés par `EmbeddingScheduler` (lots bornés en tokens, requêtes
+    concurrentes, backoff sur 429) puis upsertés avec leurs vecteurs. La production des
+    chunks (parsing, découpage) avance dans un thread, via une file bornée.
+    Renvoie le nombre de chunks écrits.
+    """
     logger.info("⚙️ Initialisation du modèle d'Embeddings OpenAI...")
 
-    embeddings = OpenAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        api_key=OPENAI_API_KEY,
-    )
+    embeddings = get_embeddings()
+    scheduler = EmbeddingScheduler(embeddings)
 
     logger.info(f"💾 Indexation dans ChromaDB ({CHROMA_DB_DIR})...")
-    
-    # Batch processing automatique par Chroma
-    Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        collection_name=CHROMA_COLLECTION_NAME,
-        persist_directory=CHROMA_DB_DIR,
+
+    # Pas de fonction d'embedding côté Chroma : les vecteurs arrivent déjà calculés
+    vs = _open_chroma()
+
+    stream = _prefetch(pairs, INGEST_QUEUE_DEPTH * INGEST_BATCH_SIZE)
+    written = 0
+    for ids, chunks, vectors in scheduler.embed_stream(stream):
+        ids = [chunk_id or str(uuid.uuid4()) for chunk_id in ids]
+        metadatas = [chunk.metadata for chunk in chunks]
+        texts = [chunk.page_content for chunk in chunks]
+        # Upsert : un ID déjà présent est remplacé, pas dupliqué
+        vs._collection.upsert(ids=ids, embeddings=vectors, metadatas=metadatas, documents=texts)
+        if lexical is not None:
+            lexical.add(ids, texts, metadatas)
+        written += len(chunks)
+
+    report = scheduler.report()
+    logger.success(
+        f"🏁 Indexation terminée avec succès ! ({written} fragments, "
+        f"{report['chunks_per_second']} chunks/s, {report['throttled']} rate limit(s))"
+    )
+    if hasattr(embeddings, "stats"):
+        cache = embeddings.stats()
+        logger.info(f"🗄️ Cache d'embeddings : {cache['hits']} hits / {cache['misses']} misses.")
+    return written
+
+
+def delete_vectors(ids: List[str]) -> None:
+    """Supprime des chunks de la collection (fichiers retirés ou modifiés)."""
+    if not ids:
+        return
+    vs = _open_chroma()
+    vs.delete(ids=ids)
+    logger.info(f"🗑️ {len(ids)} vecteurs obsolètes supprimés.")
+
+
+def backfill_lexical_index(lexical: LexicalIndex, ids: List[str]) -> None:
+    """Complète l'index lexical avec des chunks déjà présents dans Chroma (index absent ou ancien)."""
+    if not ids:
+        return
+    vs = _open_chroma()
+    for i in range(0, len(ids), INGEST_BATCH_SIZE * 8):
+        batch = vs._collection.get(ids=ids[i : i + INGEST_BATCH_SIZE * 8], include=["documents", "metadatas"])
+        lexical.add(batch["ids"], batch["documents"], batch["metadatas"])
+    logger.info(f"🔤 Index lexical complété depuis Chroma : {len(ids)} chunks.")
+
+
+def _numpy_store_up_to_date() -> bool:
+    """Store NumPy présent et exporté avec les paramètres actuels (dtype, préfixe Matryoshka, float32)."""
+    try:
+        with open(os.path.join(NUMPY_STORE_DIR, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    wanted_coarse = MATRYOSHKA_DIM if 0 < MATRYOSHKA_DIM < meta.get("dims", 0) else 0
+    return (
+        meta.get("dtype") == NUMPY_STORE_DTYPE
+        and meta.get("coarse_dims") == wanted_coarse
+        and meta.get("full_precision", False) == NUMPY_STORE_RESCORE
+    )
+
+
+def export_numpy_store() -> None:
+    """Exporte la collection Chroma en store NumPy memory-mappé (VECTOR_BACKEND="numpy")."""
+    start = time.perf_counter()
+    vs = _open_chroma()
+    count = export_from_chroma(
+        vs._collection,
+        NUMPY_STORE_DIR,
+        dtype=NUMPY_STORE_DTYPE,
+        keep_full=NUMPY_STORE_RESCORE,  # full.npy seulement si le re-score float32 est activé
+        coarse_dims=MATRYOSHKA_DIM,
+        extra_meta={"embedding_model": EMBEDDING_MODEL},
+    )
+    logger.info(
+        f"🧮 Store NumPy ({NUMPY_STORE_DTYPE}) exporté : {count} vecteurs en "
+        f"{time.perf_counter() - start:.1f} s -> {NUMPY_STORE_DIR}"
     )
-    
-    logger.success("🏁 Indexation terminée avec succès !")
 
 
-def run_ingestion() -> None:
-    """Pipeline complet d’ingestion (Reset -> Load -> Chunk -> Store)."""
+@profile_function("ingestion")
+def run_ingestion(full_rebuild: bool = False, workers: Optional[int] = None) -> None:
+    """
+    Pipeline d’ingestion (Load -> Chunk -> Store).
+    Incrémental par défaut : seuls les PDFs nouveaux ou modifiés sont ré-embeddés,
+    les vecteurs des PDFs supprimés sont retirés. `full_rebuild=True` repart de zéro.
+    `workers` : nombre de process pour le parsing PDF (INGEST_WORKERS par défaut).
+    """
     logger.info("🚀 Démarrage du pipeline d'ingestion Data Governance...")
-    
-    # 1. Nettoyage (Clean Slate)
-    reset_vector_db()
-    
-    # 2. Chargement
-    docs = load_pdfs()
-    if not docs:
-        logger.warning("Aucun document valide n'a été chargé. Arrêt.")
+
+    files = list_pdf_files()
+    settings = _index_settings()
+    manifest = None if full_rebuild else load_manifest()
+
+    if manifest is not None and manifest.get("settings") != settings:
+        logger.warning("⚙️ Paramètres d'indexation modifiés depuis la dernière ingestion : reconstruction complète.")
+        manifest = None
+
+    # 1. Nettoyage (Clean Slate) si pas de manifeste exploitable
+    lexical = None
+    if manifest is None:
+        reset_vector_db()
+        manifest = {"settings": settings, "files": {}}
+    else:
+        lexical = LexicalIndex.load(LEXICAL_INDEX_FILE)
+    lexical = lexical or LexicalIndex()
+
+    # 2. Diff entre le dossier et le manifeste
+    file_hashes = {f: file_sha256(os.path.join(DOCUMENTS_DIR, f)) for f in files}
+    known = manifest["files"]
+    to_embed = [f for f in files if known.get(f, {}).get("sha256") != file_hashes[f]]
+    removed = [f for f in known if f not in file_hashes]
+    # Chunks inchangés absents de l'index lexical (index supprimé ou créé après la base)
+    kept_ids = [
+        cid for f, entry in known.items() if f not in removed and f not in to_embed for cid in entry["chunk_ids"]
+    ]
+    missing_lexical = [cid for cid in kept_ids if cid not in lexical]
+    missing_numpy = VECTOR_BACKEND == "numpy" and not _numpy_store_up_to_date()
+
+    if not to_embed and not removed and not missing_lexical and not missing_numpy:
+        logger.success("✅ Base de connaissance déjà à jour, rien à ingérer.")
         return
 
-    # 3. Découpage
-    chunks = chunk_documents(docs)
-    
-    # 4. Stockage
-    embed_and_store(chunks)
+    logger.info(
+        f"🧮 {len(to_embed)} fichier(s) à indexer, {len(removed)} à retirer, "
+        f"{len(files) - len(to_embed)} inchangé(s)."
+    )
+
+    # 3. Retrait des vecteurs obsolètes (fichiers supprimés ou modifiés)
+    stale_ids = [cid for f in removed + to_embed for cid in known.get(f, {}).get("chunk_ids", [])]
+    delete_vectors(stale_ids)
+    lexical.remove(stale_ids)
+    for f in removed + to_embed:
+        known.pop(f, None)
+    backfill_lexical_index(lexical, missing_lexical)
+
+    if to_embed:
+        # 4. Load -> Chunk -> Store en streaming : pages, chunks et lots circulent
+        #    au fil de l'eau, la mémoire reste bornée quel que soit le corpus.
+        logger.info(f"📂 {len(to_embed)} fichier(s) PDF à traiter...")
+        written: Dict[str, List[str]] = {}
+        pages = iter_pdf_pages(to_embed, workers=workers, file_hashes=file_hashes)
+        id_chunks = _with_chunk_ids(iter_chunks(pages), file_hashes, written)
+        store_chunk_stream(id_chunks, lexical=lexical)
+
+        for filename, file_ids in written.items():
+            known[filename] = {"sha256": file_hashes[filename], "chunk_ids": file_ids}
+
+    lexical.save(LEXICAL_INDEX_FILE)
+    logger.info(f"🔤 Index lexical BM25 enregistré ({len(lexical)} chunks).")
+    if VECTOR_BACKEND == "numpy":
+        export_numpy_store()
+    save_manifest(manifest)
+    publish_index_version()
+    if PAGE_STORE_ENABLED:
+        pruned = PageStore(PAGE_STORE_DIR).prune(file_hashes.values())
+        if pruned:
+            logger.info(f"🗃️ Cache de pages : {pruned} entrée(s) de PDFs retirés ou modifiés supprimée(s).")
 
     logger.success("🎉 Base de connaissance mise à jour !")
 
 
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Ingestion des PDFs dans la base vectorielle.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=f"Nombre de process pour le parsing PDF (défaut : {INGEST_WORKERS}).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Reconstruction complète (supprime la base et ré-embedde tous les documents).",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    run_ingestion()
+    init_config()
+    args = _parse_args()
+    run_ingestion(full_rebuild=args.full, workers=args.workers)
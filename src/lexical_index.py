@@ -0,0 +1,192 @@
+"""
+lexical_index.py
+Index lexical BM25 des chunks, construit à l'ingestion à côté de la base vectorielle.
+
+Complète la recherche sémantique sur les termes exacts (acronymes, normes, codes :
+"BYOK", "ISO 42001", "7Rs") et permet de répondre à une requête "mots-clés" sans
+aucun appel d'embedding. Persisté en JSON compressé (gzip).
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+FORMAT_VERSION = 1
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Mots vides FR / EN : ils n'apportent rien au score et gonflent les listes de postings
+_STOPWORDS = frozenset(
+    """
+    a au aux avec ce ces cet cette dans de des du elle en est et etre il ils je la le les leur
+    leurs lui ma mais me meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se
+    ses son sont sur ta te tes toi ton tu un une vos votre vous y quel quelle quels quelles comment
+    an and are as at be by for from how in is it of on or that the this to was what which with
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Minuscules, sans accents, découpage alphanumérique, mots vides retirés."""
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    normalized = "".join(c for c in normalized if not unicodedata.combining(c))
+    return [t for t in _TOKEN_RE.findall(normalized) if t not in _STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fusionne plusieurs classements d'IDs : score = somme des 1 / (k + rang)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndex:
+    """
+    Index inversé BM25 en mémoire : terme -> {id du chunk: fréquence}.
+
+    - Mise à jour incrémentale (`add` / `remove`) au rythme de l'ingestion.
+    - Garde le texte et les métadonnées des chunks pour servir des `Document` sans Chroma.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._docs: Dict[str, Tuple[str, Dict]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docs
+
+    def ids(self) -> List[str]:
+        return list(self._docs)
+
+    # ---------- Mise à jour ----------
+
+    def add(self, ids: Iterable[str], texts: Iterable[str], metadatas: Iterable[Dict]) -> None:
+        """Ajoute (ou remplace) des chunks."""
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            if doc_id in self._docs:
+                self.remove([doc_id])
+            terms = Counter(tokenize(text))
+            self._docs[doc_id] = (text, dict(metadata or {}))
+            self._lengths[doc_id] = sum(terms.values())
+            self._total_length += self._lengths[doc_id]
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """Retire des chunks (les IDs inconnus sont ignorés)."""
+        for doc_id in ids:
+            entry = self._docs.pop(doc_id, None)
+            if entry is None:
+                continue
+            self._total_length -= self._lengths.pop(doc_id)
+            for term in set(tokenize(entry[0])):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[term]
+
+    # ---------- Recherche ----------
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k BM25 : liste de (id, score) triée par score décroissant."""
+        n_docs = len(self._docs)
+        terms = set(tokenize(query))
+        if not n_docs or not terms:
+            return []
+
+        avg_length = self._total_length / n_docs or 1.0
+        scores: Dict[str, float] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1.0 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def is_keyword_query(self, query: str, hits: List[Tuple[str, float]], max_terms: int) -> bool:
+        """
+        Requête "mots-clés" : courte (au plus `max_terms` mots), chaque terme est connu de
+        l'index et le meilleur résultat les contient tous. BM25 suffit alors.
+        """
+        if not hits or len(query.split()) > max_terms:
+            return False
+        terms = set(tokenize(query))
+        if not terms:
+            return False
+        best = hits[0][0]
+        return all(best in self._postings.get(term, ()) for term in terms)
+
+    def document(self, doc_id: str) -> Document:
+        text, metadata = self._docs[doc_id]
+        return Document(id=doc_id, page_content=text, metadata=dict(metadata))
+
+    # ---------- Persistance ----------
+
+    def save(self, path: str) -> None:
+        """Écriture atomique (fichier temporaire + rename) en JSON gzip."""
+        ids = list(self._docs)
+        position = {doc_id: i for i, doc_id in enumerate(ids)}
+        payload = {
+            "format": FORMAT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "ids": ids,
+            "texts": [self._docs[i][0] for i in ids],
+            "metadatas": [self._docs[i][1] for i in ids],
+            "lengths": [self._lengths[i] for i in ids],
+            # Postings compacts : terme -> [position, tf, position, tf, ...]
+            "postings": {
+                term: [v for doc_id, tf in postings.items() for v in (position[doc_id], tf)]
+                for term, postings in self._postings.items()
+            },
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LexicalIndex"]:
+        """Charge l'index (None si absent, illisible ou d'un format antérieur)."""
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if payload.get("format") != FORMAT_VERSION:
+            return None
+
+        index = cls(k1=payload["k1"], b=payload["b"])
+        ids = payload["ids"]
+        for doc_id, text, metadata, length in zip(ids, payload["texts"], payload["metadatas"], payload["lengths"]):
+            index._docs[doc_id] = (text, metadata)
+            index._lengths[doc_id] = length
+            index._total_length += length
+        for term, flat in payload["postings"].items():
+            index._postings[term] = {ids[flat[i]]: flat[i + 1] for i in range(0, len(flat), 2)}
+        return index
@@ -0,0 +1,378 @@
+"""
+numpy_store.py
+Backend vectoriel alternatif à Chroma : recherche exacte sur une matrice NumPy memory-mappée.
+
+Disposition sur disque (un dossier, produit à l'ingestion depuis la collection Chroma) :
+- `vectors.npy`  : matrice (N, D) quantifiée, float16 ou int8 (+ `scales.npy` par ligne en int8)
+- `full.npy`     : vecteurs float32 pour le re-score pleine précision (optionnel, `keep_full`)
+- `coarse.npy`   : préfixes Matryoshka (ex: 256 premières dimensions, renormalisées) pour une
+                   passe grossière avant re-classement en pleine dimension (optionnel)
+- `docs.jsonl` + `offsets.npy` : texte et métadonnées des chunks, lus à la demande
+- `meta.json`    : format, dtype, dimensions (complète et préfixe), nombre de vecteurs, modèle
+
+Le chargement ne lit que `meta.json` et mappe les fichiers : les pages sont chargées par
+l'OS au fil des recherches et partagées entre process.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import uuid
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+FORMAT_VERSION = 1
+SUPPORTED_DTYPES = ("float16", "int8")
+
+# Lignes converties en float32 par bloc : un tampon réutilisé de cette taille (par thread)
+# reste en cache CPU et évite d'allouer une copie float32 de la matrice à chaque requête.
+SEARCH_BLOCK_ROWS = 1024
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _quantize(block: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """float16 : simple conversion. int8 : quantification symétrique avec une échelle par ligne."""
+    if dtype == "float16":
+        return block.astype(np.float16), None
+    scales = np.abs(block).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(block / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k par ligne (argpartition puis tri des seuls k gagnants)."""
+    k = min(k, scores.shape[1])
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Recherche exacte (produit scalaire sur vecteurs normés = cosinus) en NumPy vectorisé.
+
+    Les distances renvoyées sont des distances L2 au carré (2 - 2·cos), comme Chroma :
+    le reste du retrieval traite les deux backends de la même façon.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embedding: Optional[Embeddings] = None,
+        rescore: bool = True,
+        rescore_factor: int = 4,
+        coarse: bool = True,
+        coarse_candidates: int = 200,
+    ) -> None:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta: Dict[str, Any] = json.load(f)
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Format de store NumPy non supporté : {self.meta.get('format')}")
+
+        self.path = path
+        self._embedding = embedding
+        self.rescore_factor = rescore_factor
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.scales = (
+            np.load(os.path.join(path, "scales.npy"), mmap_mode="r") if self.meta["dtype"] == "int8" else None
+        )
+        full_path = os.path.join(path, "full.npy")
+        self.full = np.load(full_path, mmap_mode="r") if rescore and os.path.exists(full_path) else None
+        coarse_path = os.path.join(path, "coarse.npy")
+        self.coarse = self.coarse_scales = None
+        if coarse and self.meta.get("coarse_dims") and os.path.exists(coarse_path):
+            self.coarse = np.load(coarse_path, mmap_mode="r")
+            if self.meta["dtype"] == "int8":
+                self.coarse_scales = np.load(os.path.join(path, "coarse_scales.npy"), mmap_mode="r")
+        self.coarse_candidates = coarse_candidates
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._docs_file = open(os.path.join(path, "docs.jsonl"), "rb")
+        # Fermé par `close()`, ou quand le store n'est plus référencé (ex : remplacé au rechargement)
+        self._finalizer = weakref.finalize(self, self._docs_file.close)
+        self._docs_lock = threading.Lock()
+        self._buffers = threading.local()
+
+    def __len__(self) -> int:
+        return int(self.meta["count"])
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding
+
+    # ---------- Recherche ----------
+
+    def _scores_block(
+        self, matrix: np.ndarray, scales: Optional[np.ndarray], start: int, stop: int, queries: np.ndarray
+    ) -> np.ndarray:
+        dims = matrix.shape[1]
+        buffers = self._buffers.__dict__
+        if dims not in buffers:
+            buffers[dims] = np.empty((SEARCH_BLOCK_ROWS, dims), dtype=np.float32)
+        block = buffers[dims][: stop - start]
+        np.copyto(block, matrix[start:stop], casting="unsafe")
+        scores = block @ queries.T
+        if scales is not None:
+            scores *= np.asarray(scales[start:stop])[:, None]
+        return scores.T
+
+    def _scan(
+        self, matrix: np.ndarray, scales: Optional[np.ndarray], queries: np.ndarray, candidates: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Parcours complet de `matrix` par blocs de lignes, top-k fusionné au fil des blocs."""
+        best_idx: Optional[np.ndarray] = None
+        best_scores: Optional[np.ndarray] = None
+        for start in range(0, len(self), SEARCH_BLOCK_ROWS):
+            stop = min(start + SEARCH_BLOCK_ROWS, len(self))
+            idx, scores = _top_k(self._scores_block(matrix, scales, start, stop, queries), candidates)
+            idx += start
+            if best_idx is None:
+                best_idx, best_scores = idx, scores
+            else:
+                merged_idx = np.concatenate([best_idx, idx], axis=1)
+                merged_scores = np.concatenate([best_scores, scores], axis=1)
+                keep, best_scores = _top_k(merged_scores, candidates)
+                best_idx = np.take_along_axis(merged_idx, keep, axis=1)
+        return best_idx, best_scores
+
+    @staticmethod
+    def _rerank(
+        matrix: np.ndarray, scales: Optional[np.ndarray], queries: np.ndarray, candidates: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-classe des candidats (Q, C) : seules leurs lignes de `matrix` sont lues."""
+        rows = np.unique(candidates)
+        vectors = np.asarray(matrix[rows], dtype=np.float32)
+        if scales is not None:
+            vectors *= np.asarray(scales[rows])[:, None]
+        position = np.searchsorted(rows, candidates)
+        scores = np.einsum("qcd,qd->qc", vectors[position], queries)
+        keep, scores = _top_k(scores, k)
+        return np.take_along_axis(candidates, keep, axis=1), scores
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k pour un lot de requêtes (Q, D) : renvoie (indices, cosinus), chacun (Q, k).
+
+        1. Passe grossière sur les préfixes Matryoshka (si présents) -> `coarse_candidates` lignes,
+           re-classées sur les vecteurs quantifiés complets ; sinon parcours exact de ces derniers.
+        2. Re-score float32 (`full.npy`) des k x `rescore_factor` meilleurs, si activé.
+        """
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        n = len(self)
+        if n == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        keep = min(n, k * self.rescore_factor if self.full is not None else k)
+        if self.coarse is not None:
+            prefix = _normalize(queries[:, : self.coarse.shape[1]])
+            shortlist = min(n, max(keep, self.coarse_candidates))
+            candidates, _ = self._scan(self.coarse, self.coarse_scales, prefix, shortlist)
+            best_idx, best_scores = self._rerank(self.vectors, self.scales, queries, candidates, keep)
+        else:
+            best_idx, best_scores = self._scan(self.vectors, self.scales, queries, keep)
+
+        if self.full is not None:
+            best_idx, best_scores = self._rerank(self.full, None, queries, best_idx, k)
+        return best_idx[:, :k], best_scores[:, :k]
+
+    def _document(self, index: int) -> Document:
+        with self._docs_lock:
+            self._docs_file.seek(int(self.offsets[index]))
+            line = self._docs_file.readline()
+        record = json.loads(line)
+        return Document(id=record["id"], page_content=record["text"], metadata=record["metadata"] or {})
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        idx, scores = self.search_batch(np.asarray([embedding]), k)
+        return [(self._document(i), float(2.0 - 2.0 * s)) for i, s in zip(idx[0], scores[0])]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        path: Optional[str] = None,
+        ids: Optional[List[str]] = None,
+        dtype: str = "int8",
+        keep_full: bool = False,
+        coarse_dims: int = 0,
+        batch_size: int = 1024,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        """
+        Embedde `texts`, écrit un store dans `path` (`build`) et l'ouvre. Le store reste en
+        lecture seule : pour l'enrichir, on le reconstruit. `kwargs` : options d'ouverture
+        (rescore, coarse...).
+        """
+        if path is None:
+            raise ValueError("Dossier du store requis : from_texts(..., path=...), ou build() / export_from_chroma().")
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+
+        def batches():
+            for start in range(0, len(texts), batch_size):
+                stop = start + batch_size
+                vectors = np.asarray(embedding.embed_documents(list(texts[start:stop])), dtype=np.float32)
+                yield ids[start:stop], vectors, texts[start:stop], metadatas[start:stop]
+
+        cls.build(path, len(texts), batches(), dtype=dtype, keep_full=keep_full, coarse_dims=coarse_dims)
+        kwargs.setdefault("rescore", keep_full)
+        return cls(path, embedding=embedding, **kwargs)
+
+    def close(self) -> None:
+        self._finalizer()
+
+    # ---------- Construction ----------
+
+    @staticmethod
+    def build(
+        path: str,
+        count: int,
+        batches: Iterable[Tuple[Sequence[str], np.ndarray, Sequence[str], Sequence[Dict]]],
+        dtype: str = "int8",
+        keep_full: bool = False,
+        coarse_dims: int = 0,
+        extra_meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Écrit un store à partir de lots (ids, vecteurs, textes, métadonnées), en streaming.
+        `keep_full` ajoute `full.npy` (float32) pour le re-score pleine précision.
+        `coarse_dims` > 0 ajoute les préfixes Matryoshka (renormalisés) pour la passe grossière.
+        Écrit dans un dossier temporaire puis remplace l'ancien d'un bloc.
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"dtype non supporté : {dtype} (attendu : {', '.join(SUPPORTED_DTYPES)})")
+
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        def open_array(name: str, array_dtype: Any, shape: Tuple[int, ...]) -> np.ndarray:
+            return np.lib.format.open_memmap(os.path.join(tmp_path, name), mode="w+", dtype=array_dtype, shape=shape)
+
+        arrays: Dict[str, np.ndarray] = {}
+        dims = 0
+        offsets = np.zeros(count, dtype=np.int64)
+        row = 0
+        with open(os.path.join(tmp_path, "docs.jsonl"), "wb") as docs_file:
+            for ids, block, texts, metadatas in batches:
+                block = _normalize(np.asarray(block, dtype=np.float32))
+                if not arrays:
+                    dims = block.shape[1]
+                    coarse_dims = coarse_dims if 0 < coarse_dims < dims else 0
+                    arrays["vectors"] = open_array("vectors.npy", dtype, (count, dims))
+                    if dtype == "int8":
+                        arrays["scales"] = open_array("scales.npy", np.float32, (count,))
+                    if keep_full:
+                        arrays["full"] = open_array("full.npy", np.float32, (count, dims))
+                    if coarse_dims:
+                        arrays["coarse"] = open_array("coarse.npy", dtype, (count, coarse_dims))
+                        if dtype == "int8":
+                            arrays["coarse_scales"] = open_array("coarse_scales.npy", np.float32, (count,))
+
+                stop = row + len(block)
+                arrays["vectors"][row:stop], block_scales = _quantize(block, dtype)
+                if "scales" in arrays:
+                    arrays["scales"][row:stop] = block_scales
+                if "full" in arrays:
+                    arrays["full"][row:stop] = block
+                if "coarse" in arrays:
+                    arrays["coarse"][row:stop], prefix_scales = _quantize(_normalize(block[:, :coarse_dims]), dtype)
+                    if "coarse_scales" in arrays:
+                        arrays["coarse_scales"][row:stop] = prefix_scales
+                for i, (doc_id, text, metadata) in enumerate(zip(ids, texts, metadatas), start=row):
+                    offsets[i] = docs_file.tell()
+                    record = {"id": doc_id, "text": text, "metadata": metadata}
+                    docs_file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                row = stop
+
+        if not arrays:
+            # Collection vide : store valide, sans vecteurs
+            coarse_dims = 0
+            np.save(os.path.join(tmp_path, "vectors.npy"), np.zeros((0, 0), dtype=dtype))
+            if dtype == "int8":
+                np.save(os.path.join(tmp_path, "scales.npy"), np.zeros(0, dtype=np.float32))
+        for array in arrays.values():
+            array.flush()
+        np.save(os.path.join(tmp_path, "offsets.npy"), offsets[:row])
+
+        meta = {
+            "format": FORMAT_VERSION,
+            "dtype": dtype,
+            "dims": dims,
+            "coarse_dims": coarse_dims,
+            "count": row,
+            "full_precision": "full" in arrays,
+            **(extra_meta or {}),
+        }
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        arrays.clear()
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, embedding: Optional[Embeddings] = None, **kwargs: Any) -> Optional["NumpyVectorStore"]:
+        """Ouvre un store existant (None s'il est absent ou illisible)."""
+        try:
+            return cls(path, embedding=embedding, **kwargs)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"🧮 Store NumPy illisible ({path}) : {e}")
+            return None
+
+
+def export_from_chroma(
+    collection: Any,
+    path: str,
+    dtype: str = "int8",
+    keep_full: bool = False,
+    coarse_dims: int = 0,
+    extra_meta: Optional[Dict[str, Any]] = None,
+    batch_size: int = 1024,
+) -> int:
+    """Exporte une collection Chroma (ids, vecteurs, textes, métadonnées) en store NumPy."""
+    count = collection.count()
+
+    def batches():
+        for offset in range(0, count, batch_size):
+            page = collection.get(
+                include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset
+            )
+            if len(page["ids"]):
+                vectors = np.asarray(page["embeddings"], dtype=np.float32)
+                yield page["ids"], vectors, page["documents"], page["metadatas"]
+
+    NumpyVectorStore.build(
+        path, count, batches(), dtype=dtype, keep_full=keep_full, coarse_dims=coarse_dims, extra_meta=extra_meta
+    )
+    return count
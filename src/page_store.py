@@ -0,0 +1,99 @@
+"""
+page_store.py
+Cache disque des pages extraites des PDFs, adressé par le contenu : une entrée par fichier,
+nommée d'après le SHA-256 du PDF, sous PAGE_STORE_DIR.
+
+L'extraction pypdf domine le temps d'ingestion : un PDF déjà vu (même contenu, quel que soit
+son nom) n'est pas re-parsé. Changer le découpage ou le modèle d'embedding ne rejoue donc que
+les étapes rapides. Chaque entrée est un JSON gzip en colonnes (textes, n° de page, libellés), avec les
+métadonnées du document (producer, dates, auteur...) et la version de pypdf : une autre version d'extracteur invalide l'entrée.
+"""
+
+import gzip
+import json
+import os
+from typing import Iterable, List, Optional
+
+import pypdf
+from langchain_core.documents import Document
+from loguru import logger
+
+FORMAT_VERSION = 2
+EXTRACTOR = f"pypdf {pypdf.__version__}"
+PAGE_KEYS = ("source", "filename", "page", "page_label")  # métadonnées propres à la page ou au fichier
+
+
+class PageStore:
+    """Pages extraites par hash de contenu (`<directory>/<sha256>.json.gz`)."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, file_hash: str) -> str:
+        return os.path.join(self.directory, f"{file_hash}.json.gz")
+
+    def contains(self, file_hash: str) -> bool:
+        """Entrée présente pour ce hash (sans la lire : format et extracteur sont vérifiés par `get`)."""
+        return os.path.exists(self._path(file_hash))
+
+    def get(self, file_hash: str, source: str) -> Optional[List[Document]]:
+        """Pages du PDF de hash `file_hash` (métadonnées de PyPDFLoader, `source`=chemin), ou None."""
+        try:
+            with gzip.open(self._path(file_hash), "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if payload.get("format") != FORMAT_VERSION or payload.get("extractor") != EXTRACTOR:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        metadata = dict(payload["metadata"], source=source)
+        return [
+            Document(page_content=text, metadata=metadata | {"page": page, "page_label": label})
+            for text, page, label in zip(payload["texts"], payload["pages"], payload["page_labels"])
+        ]
+
+    def put(self, file_hash: str, pages: List[Document]) -> None:
+        """Enregistre les pages d'un PDF (écriture atomique : fichier temporaire + rename)."""
+        if not pages:
+            return
+        payload = {
+            "format": FORMAT_VERSION,
+            "extractor": EXTRACTOR,
+            # Métadonnées du document, communes aux pages (sans chemin ni nom : redonnés à la lecture)
+            "metadata": {k: v for k, v in pages[0].metadata.items() if k not in PAGE_KEYS},
+            "texts": [p.page_content for p in pages],
+            "pages": [p.metadata["page"] for p in pages],
+            "page_labels": [p.metadata["page_label"] for p in pages],
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(file_hash)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Un cache non écrit ne doit pas faire échouer l'ingestion
+            logger.warning(f"⚠️ Pages de {file_hash[:12]} non mises en cache : {e}")
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """Supprime les entrées des PDFs qui ne sont plus dans le corpus (hash absents de `keep`)."""
+        keep = set(keep)
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return 0
+        for entry in entries:
+            if entry.name.endswith(".json.gz") and entry.name[: -len(".json.gz")] not in keep:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
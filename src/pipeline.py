@@ -0,0 +1,149 @@
+"""
+pipeline.py
+Pipeline d'exécution d'un tour : le retrieval (embedding + recherche) et le préchauffage du
+client LLM démarrent dès la saisie, sur la boucle partagée, pendant que l'UI route la
+question et affiche son statut. L'agent choisi reçoit ensuite les documents déjà prêts.
+En mode Auto avec routage sémantique, l'embedding de la question est calculé une seule fois
+et partagé entre le routeur et le retrieval (qui ne l'attend que si le chemin lexical rapide,
+sans embedding, n'a pas répondu).
+
+Chaque étape est chronométrée (et remontée comme span de la trace de télémétrie en cours) ;
+`report()` donne le temps gagné par rapport à un enchaînement séquentiel.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Iterator, List, Optional
+
+from loguru import logger
+from langchain_core.documents import Document
+
+from config import ROUTER_MODE
+from src.aio import submit
+from src.agents.common import warm_up_llm
+from src.engine import aretrieve_for_turn
+from src.router import get_router
+from src.telemetry import record_span
+
+
+class TurnPipeline:
+    """
+    Un tour de conversation. Usage :
+
+        pipeline = TurnPipeline(question, embed_query=auto, retrieve=uses_docs)  # en fond
+        vector = pipeline.query_vector()           # attend l'embedding (pour le routeur)
+        with pipeline.stage("routing"):
+            agent = detect_agent(..., vector=vector)
+        docs = pipeline.docs()                     # attend la fin du retrieval (None si non lancé)
+        pipeline.report()
+    """
+
+    def __init__(self, user_input: str, embed_query: bool = True, retrieve: bool = True) -> None:
+        """
+        `embed_query` : calculer l'embedding de la question pour le routeur (mode Auto).
+        Inutile quand l'agent est choisi à la main : le retrieval embedde alors lui-même, au besoin.
+        `retrieve` : lancer le retrieval ; False quand l'agent choisi n'utilise pas de documents
+        (Governance), `docs()` renvoie alors None.
+        """
+        self.user_input = user_input
+        self.timings: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._vector = (
+            submit(self._timed("query_embedding", self._aembed_query()))
+            if embed_query and ROUTER_MODE == "semantic"
+            else None
+        )
+        self._retrieval = submit(self._aretrieve()) if retrieve else None
+        self._warmup = submit(self._timed("warmup", asyncio.to_thread(self._warm_up)))
+
+    async def _timed(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.timings[name] = time.perf_counter() - start
+            record_span(name, self.timings[name], start)
+
+    async def _aembed_query(self) -> List[float]:
+        # Client d'embeddings (import de langchain_openai, cache SQLite) résolu hors du thread
+        # Streamlit et hors de la boucle partagée
+        embedding = await asyncio.to_thread(lambda: get_router().embedding)
+        return await embedding.aembed_query(self.user_input)
+
+    async def _shared_vector(self) -> Optional[List[float]]:
+        """Embedding du routeur, attendu seulement si le retrieval en a besoin."""
+        try:
+            return await asyncio.wrap_future(self._vector)
+        except Exception:
+            return None  # le retrieval refait l'embedding et remonte l'erreur s'il y a lieu
+
+    async def _aretrieve(self) -> List[Document]:
+        # Tâche (et non coroutine) : peut rester non attendue si le chemin rapide répond
+        vector = asyncio.ensure_future(self._shared_vector()) if self._vector is not None else None
+        return await self._timed("retrieval", aretrieve_for_turn(self.user_input, vector=vector))
+
+    @staticmethod
+    def _warm_up() -> None:
+        """Client LLM, et centroïdes du routeur (lus depuis le cache disque dès le premier tour)."""
+        warm_up_llm()
+        if ROUTER_MODE == "semantic":
+            get_router().centroids()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Chronomètre une étape synchrone (routage, UI, préparation de l'agent...)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            record_span(name, elapsed, start)
+
+    def query_vector(self, timeout: Optional[float] = None) -> Optional[List[float]]:
+        """Embedding de la question (None sans routeur sémantique ou en cas d'échec)."""
+        if self._vector is None:
+            return None
+        with self.stage("wait_embedding"):
+            try:
+                return self._vector.result(timeout=timeout)
+            except Exception as e:
+                logger.warning(f"⚠️ Embedding de la question indisponible : {e}")
+                return None
+
+    def docs(self, timeout: Optional[float] = None) -> Optional[List[Document]]:
+        """
+        Documents du tour (bloque jusqu'à la fin du retrieval, temps d'attente chronométré),
+        None si le retrieval n'a pas été lancé (`retrieve=False`).
+        """
+        if self._retrieval is None:
+            return None
+        with self.stage("wait_retrieval"):
+            docs = self._retrieval.result(timeout=timeout)
+        # Le préchauffage ne doit jamais faire échouer le tour
+        if self._warmup.done() and self._warmup.exception() is not None:
+            logger.debug(f"Préchauffage LLM en échec : {self._warmup.exception()}")
+        return docs
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Temps par étape, temps écoulé, et gain estimé : somme des étapes (ce qu'aurait
+        coûté un enchaînement séquentiel) moins le temps réellement écoulé.
+        """
+        elapsed = time.perf_counter() - self._start
+        stages = {name: round(seconds * 1000, 1) for name, seconds in self.timings.items()}
+        sequential = sum(s for name, s in self.timings.items() if not name.startswith("wait_"))
+        report = {
+            "stages_ms": stages,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "saved_ms": round(max(0.0, sequential - elapsed) * 1000, 1),
+        }
+        logger.info(
+            "⏱️ Pipeline : "
+            + " | ".join(f"{name} {ms:.0f} ms" for name, ms in stages.items())
+            + f" -> écoulé {report['elapsed_ms']:.0f} ms (gain {report['saved_ms']:.0f} ms vs séquentiel)"
+        )
+        return report
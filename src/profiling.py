@@ -0,0 +1,215 @@
+"""
+profiling.py
+Profilage opt-in d'une requête (appel d'agent, tour de l'UI, ingestion) pour savoir où part le temps :
+Chroma, LangChain, client HTTP, rendu Streamlit...
+
+Activé par PROFILING_ENABLED (section "PROFILING" de config.py), sur une fraction des requêtes
+(PROFILING_SAMPLE_RATE). Deux profileurs, combinables (PROFILING_MODE) :
+- "cprofile" : cProfile du thread qui ouvre la session (temps CPU par fonction, appels) ;
+- "sampling" : échantillonnage des piles de tous les threads toutes les PROFILING_INTERVAL s
+  (temps réel, y compris la boucle partagée et les threads de recherche, attentes réseau comprises).
+
+Chaque session écrit, dans PROFILES_DIR, des fichiers nommés
+`<date>_<label>_<agent>_<hash de la question>` :
+- `.prof` : statistiques cProfile (`python -m pstats`, snakeviz) ;
+- `.collapsed` : piles repliées, une ligne "thread;f1;f2;... N" (flamegraph.pl, speedscope) ;
+- `.txt` : résumé lisible (étiquettes, durée, fonctions les plus coûteuses).
+
+Une seule session à la fois par process : une requête qui arrive pendant un profil n'est pas profilée.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import hashlib
+import io
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from loguru import logger
+
+from config import (
+    PROFILING_ENABLED,
+    PROFILING_SAMPLE_RATE,
+    PROFILING_MODE,
+    PROFILING_INTERVAL,
+    PROFILES_DIR,
+)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_active = threading.Lock()  # une session de profilage à la fois
+
+
+def query_hash(text: str) -> str:
+    """Empreinte courte d'une question (nom de fichier sans données utilisateur)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:10]
+
+
+class StackSampler(threading.Thread):
+    """Échantillonne les piles de tous les threads (sauf lui-même) et compte les piles repliées."""
+
+    def __init__(self, interval: float = PROFILING_INTERVAL) -> None:
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        # ";" et les espaces séparent piles et compteur dans le format replié
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                stack: List[str] = []
+                while frame is not None:
+                    stack.append(self._frame_label(frame))
+                    frame = frame.f_back
+                root = re.sub(r"\s+", "_", names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join([root] + stack[::-1])] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_frames(self, n: int = 25) -> List[tuple]:
+        """Fonctions les plus souvent en haut de pile (temps "self" en échantillons)."""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(n)
+
+
+class ProfileSession:
+    """Session en cours : étiquettes (complétables via `tag`) et profileurs actifs."""
+
+    def __init__(self, label: str, tags: Dict[str, Any], mode: str = PROFILING_MODE) -> None:
+        self.label = label
+        self.tags = dict(tags)
+        self.mode = mode
+        self.profile: Optional[cProfile.Profile] = None
+        self.sampler: Optional[StackSampler] = None
+        self.start = 0.0
+        self.duration = 0.0
+
+    def tag(self, **tags: Any) -> None:
+        self.tags.update(tags)
+
+    def __enter__(self) -> "ProfileSession":
+        self.start = time.perf_counter()
+        if self.mode in ("sampling", "both"):
+            self.sampler = StackSampler()
+            self.sampler.start()
+        if self.mode in ("cprofile", "both"):
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError as e:  # autre profileur déjà actif sur ce thread (couverture, débogueur)
+                logger.debug(f"cProfile indisponible : {e}")
+                self.profile = None
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.profile is not None:
+            self.profile.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+        self.duration = time.perf_counter() - self.start
+
+    def basename(self) -> str:
+        parts = [datetime.now().strftime("%Y%m%d-%H%M%S"), self.label]
+        if self.tags.get("agent"):
+            parts.append(str(self.tags["agent"]))
+        if self.tags.get("query_hash"):
+            parts.append(str(self.tags["query_hash"]))
+        return re.sub(r"[^\w.-]", "_", "_".join(parts))
+
+    def save(self, directory: str = PROFILES_DIR) -> str:
+        """Écrit .prof / .collapsed / .txt ; renvoie le chemin commun (sans extension)."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.basename())
+        summary = io.StringIO()
+        summary.write(f"label: {self.label}\n")
+        for key, value in self.tags.items():
+            summary.write(f"{key}: {value}\n")
+        summary.write(f"duration_s: {self.duration:.3f}\n")
+
+        if self.profile is not None:
+            self.profile.dump_stats(base + ".prof")
+            summary.write("\n--- cProfile (thread appelant), top 30 en temps cumulé ---\n")
+            pstats.Stats(self.profile, stream=summary).sort_stats("cumulative").print_stats(30)
+        if self.sampler is not None:
+            with open(base + ".collapsed", "w", encoding="utf-8") as f:
+                f.write(self.sampler.collapsed())
+            summary.write(f"\n--- Échantillonnage ({self.sampler.samples} échantillons, tous threads), haut de pile ---\n")
+            for frame, count in self.sampler.top_frames():
+                summary.write(f"{count:>7}  {frame}\n")
+
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+        return base
+
+
+def _should_profile() -> bool:
+    return PROFILING_ENABLED and random.random() < PROFILING_SAMPLE_RATE
+
+
+@contextmanager
+def profiled(label: str, query: Optional[str] = None, **tags: Any) -> Iterator[Optional[ProfileSession]]:
+    """
+    Profile le bloc si le profilage est activé et que la requête est tirée au sort.
+    Renvoie la session (pour compléter ses étiquettes, ex : l'agent choisi après routage) ou None.
+    """
+    if not _should_profile() or not _active.acquire(blocking=False):
+        yield None
+        return
+
+    if query is not None:
+        tags["query_hash"] = query_hash(query)
+    session = ProfileSession(label, tags)
+    try:
+        with session:
+            yield session
+    finally:
+        try:
+            base = session.save()
+            logger.info(f"🔬 Profil [{label}] {session.duration * 1000:.0f} ms -> {base}.*")
+        except Exception as e:
+            logger.warning(f"⚠️ Profil [{label}] non enregistré : {e}")
+        finally:
+            _active.release()
+
+
+def profile_function(label: str) -> Callable[[F], F]:
+    """Décorateur : chaque appel de la fonction est profilé via `profiled(label)`."""
+
+    def decorator(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with profiled(label):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
@@ -1,23 +1,47 @@
 """
 retrieval.py
-Gère le chargement de Chroma et fournit les fonctions de récupération de documents.
+Gère le chargement de la base vectorielle (Chroma ou store NumPy) et fournit les fonctions de récupération de documents.
 Compatible LangChain 0.2.x et Chroma moderne.
+
+Chroma (chromadb) et le store NumPy ne sont importés qu'au premier chargement de la base :
+importer ce module (depuis l'UI, l'orchestrateur ou l'ingestion) reste léger.
 """
 
 from __future__ import annotations
 
-from typing import List
+import asyncio
+import threading
+import time
+import weakref
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Dict, List, Optional, Tuple, Union
 
 from loguru import logger
-from langchain_chroma import Chroma
 from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.embeddings import Embeddings
 
 from config import (
     CHROMA_DB_DIR,
     CHROMA_COLLECTION_NAME,
-    MODEL_EMBEDDINGS,
+    INDEX_VERSION_FILE,
+    LEXICAL_INDEX_FILE,
+    RETRIEVAL_MODE,
+    HYBRID_CANDIDATES,
+    HYBRID_RRF_K,
+    LEXICAL_FAST_PATH_MAX_TERMS,
+    VECTOR_BACKEND,
+    NUMPY_STORE_DIR,
+    NUMPY_STORE_RESCORE,
+    NUMPY_STORE_RESCORE_FACTOR,
+    MATRYOSHKA_DIM,
+    MATRYOSHKA_CANDIDATES,
 )
+from src.embeddings import get_embeddings
+from src.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from src.telemetry import record_span
+
+if TYPE_CHECKING:
+    from langchain_core.vectorstores import VectorStore
 
 
 # ================================
@@ -31,52 +55,344 @@ Structure ta réponse de manière claire, concise, avec un ton professionnel.
 """
 
 
-def load_vectorstore() -> Chroma:
+@dataclass
+class RetrievalStats:
+    """Compteurs de performance du service de retrieval (lecture seule côté appelant)."""
+
+    load_count: int = 0
+    last_load_seconds: float = 0.0
+    total_load_seconds: float = 0.0
+    query_count: int = 0
+    last_embed_seconds: float = 0.0
+    last_search_seconds: float = 0.0
+    total_query_seconds: float = 0.0
+    lexical_fast_path_count: int = 0
+
+    @property
+    def avg_query_seconds(self) -> float:
+        return self.total_query_seconds / self.query_count if self.query_count else 0.0
+
+
+class VectorStoreService:
     """
-    Charge la base vectorielle Chroma existante.
+    Handle vectoriel partagé (Chroma ou store NumPy memory-mappé selon VECTOR_BACKEND),
+    gardé "chaud" pendant toute la vie du process.
+
+    - Thread-safe : un seul chargement même si plusieurs sessions Streamlit arrivent en même temps.
+    - Rechargement automatique quand l'ingestion publie une nouvelle version de l'index.
+      Base vectorielle et index BM25 sont publiés ensemble (un seul tuple) ; l'ancienne base
+      n'est pas fermée au rechargement : les recherches en cours la gardent, elle est libérée
+      quand plus personne ne la référence.
+    - Recherche hybride (BM25 + vecteurs, fusion RRF) si l'index lexical est disponible,
+      et chemin lexical seul (sans embedding) pour les requêtes "mots-clés".
+    - Expose les temps de chargement et de requête via `stats()`.
     """
-    logger.info("📦 Chargement de la base vectorielle Chroma...")
 
-    embeddings = OpenAIEmbeddings(model=MODEL_EMBEDDINGS)
+    def __init__(
+        self,
+        persist_directory: str = CHROMA_DB_DIR,
+        collection_name: str = CHROMA_COLLECTION_NAME,
+        version_file: str = INDEX_VERSION_FILE,
+        lexical_index_file: str = LEXICAL_INDEX_FILE,
+        mode: str = RETRIEVAL_MODE,
+        backend: str = VECTOR_BACKEND,
+        numpy_store_dir: str = NUMPY_STORE_DIR,
+    ) -> None:
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.version_file = version_file
+        self.lexical_index_file = lexical_index_file
+        self.mode = mode
+        self.backend = backend
+        self.numpy_store_dir = numpy_store_dir
+        self._lock = threading.Lock()
+        self._embeddings: Optional[Embeddings] = None
+        # (base vectorielle, index BM25) remplacés d'un bloc : un lecteur voit toujours une paire cohérente
+        self._handles: Optional[Tuple[VectorStore, Optional[LexicalIndex]]] = None
+        self._version: Optional[str] = None
+        self._stats = RetrievalStats()
+
+    def _read_index_version(self) -> Optional[str]:
+        """Version de l'index sur disque (contenu du fichier témoin écrit par l'ingestion)."""
+        try:
+            with open(self.version_file, encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _open_store(self) -> VectorStore:
+        if self.backend == "numpy":
+            from src.numpy_store import NumpyVectorStore
+
+            store = NumpyVectorStore.load(
+                self.numpy_store_dir,
+                embedding=self._embeddings,
+                rescore=NUMPY_STORE_RESCORE,
+                rescore_factor=NUMPY_STORE_RESCORE_FACTOR,
+                coarse=MATRYOSHKA_DIM > 0,
+                coarse_candidates=MATRYOSHKA_CANDIDATES,
+            )
+            if store is not None:
+                return store
+            logger.warning("🧮 Store NumPy absent : repli sur Chroma (relancer l'ingestion).")
+        from langchain_chroma import Chroma
+
+        return Chroma(
+            collection_name=self.collection_name,
+            embedding_function=self._embeddings,
+            persist_directory=self.persist_directory,
+        )
+
+    def _retire_chroma(self, old: VectorStore) -> None:
+        """
+        Chroma garde un client (System) par dossier : on détache celui de l'ancienne base du
+        registre pour que la nouvelle relise l'index, sans l'arrêter sous les recherches en
+        cours. Il est arrêté quand l'ancienne base n'est plus référencée.
+        """
+        try:
+            from chromadb.api.shared_system_client import SharedSystemClient
+
+            system = SharedSystemClient._identifier_to_system.pop(self.persist_directory, None)
+            if system is not None:
+                weakref.finalize(old, system.stop)
+        except Exception as e:
+            logger.debug(f"Client Chroma non détaché : {e}")
+
+    def _load(self, version: Optional[str]) -> Tuple[VectorStore, Optional[LexicalIndex]]:
+        logger.info(f"📦 Chargement de la base vectorielle ({self.backend})...")
+        start = time.perf_counter()
+
+        if self._handles is not None:
+            from src.numpy_store import NumpyVectorStore
+
+            # Store NumPy : fichiers fermés par son finaliseur, quand le dernier lecteur l'a lâché
+            if not isinstance(self._handles[0], NumpyVectorStore):
+                self._retire_chroma(self._handles[0])
+
+        if self._embeddings is None:
+            self._embeddings = get_embeddings()
+        vs = self._open_store()
+        lexical = None
+        if self.mode == "hybrid":
+            lexical = LexicalIndex.load(self.lexical_index_file)
+            if lexical is None:
+                logger.warning("🔤 Index lexical absent : recherche vectorielle seule (relancer l'ingestion).")
+        self._handles = (vs, lexical)
+        self._version = version
+
+        elapsed = time.perf_counter() - start
+        self._stats.load_count += 1
+        self._stats.last_load_seconds = elapsed
+        self._stats.total_load_seconds += elapsed
+        record_span("vectorstore_load", elapsed, start)
+        logger.success(f"📚 Base vectorielle chargée avec succès ({elapsed * 1000:.0f} ms, version {version}).")
+        return self._handles
+
+    def _current(self) -> Tuple[VectorStore, Optional[LexicalIndex]]:
+        """(base vectorielle, index BM25) de la version courante, (re)chargés si nécessaire."""
+        version = self._read_index_version()
+        handles = self._handles
+        # Pas de fichier témoin (ex: reconstruction complète en cours) : on garde le handle actuel.
+        if handles is not None and (version is None or version == self._version):
+            return handles
+
+        with self._lock:
+            # Double vérification : un autre thread a pu recharger pendant l'attente du verrou.
+            if self._handles is None or (version is not None and version != self._version):
+                if self._handles is not None:
+                    logger.info(f"🔄 Nouvelle version d'index détectée ({self._version} -> {version}).")
+                return self._load(version)
+            return self._handles
 
-    vs = Chroma(
-        collection_name=CHROMA_COLLECTION_NAME,
-        embedding_function=embeddings,
-        persist_directory=CHROMA_DB_DIR,
-    )
+    def get(self) -> VectorStore:
+        """Renvoie le handle vectoriel, en le (re)chargeant si nécessaire."""
+        return self._current()[0]
 
-    logger.success("📚 Base vectorielle chargée avec succès.")
-    return vs
+    def _record_query(self, k: int, start: float, embedded: float, done: float, embedded_here: bool = True) -> None:
+        # Embedding fourni par l'appelant (ex : pipeline) : déjà mesuré de son côté
+        if embedded_here:
+            record_span("query_embedding", embedded - start, start)
+        record_span("search", done - embedded, embedded)
+        with self._lock:
+            self._stats.query_count += 1
+            self._stats.last_embed_seconds = embedded - start
+            self._stats.last_search_seconds = done - embedded
+            self._stats.total_query_seconds += done - start
+
+        logger.info(
+            f"🔎 Retrieval k={k} : embedding {(embedded - start) * 1000:.0f} ms, "
+            f"recherche {(done - embedded) * 1000:.0f} ms"
+        )
+
+    def _lexical_search(
+        self, query: str, k: int, lexical: Optional[LexicalIndex], allow_fast_path: bool = True
+    ) -> Tuple[Optional[LexicalIndex], List[Tuple[str, float]], Optional[List[Document]]]:
+        """
+        Volet BM25 de la recherche sur `lexical` (index publié avec la base interrogée) :
+        (index, hits, documents du chemin rapide). L'index vaut None en mode vectoriel seul ;
+        les documents ne sont renseignés que pour une requête "mots-clés", servie sans
+        embedding (si `allow_fast_path`).
+        """
+        if lexical is None or not len(lexical):
+            return None, [], None
+
+        start = time.perf_counter()
+        hits = lexical.search(query, k=max(k, HYBRID_CANDIDATES))
+        if not allow_fast_path or not lexical.is_keyword_query(query, hits, LEXICAL_FAST_PATH_MAX_TERMS):
+            return lexical, hits, None
+
+        docs = [lexical.document(doc_id) for doc_id, _ in hits[:k]]
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats.query_count += 1
+            self._stats.lexical_fast_path_count += 1
+            self._stats.last_embed_seconds = 0.0
+            self._stats.last_search_seconds = elapsed
+            self._stats.total_query_seconds += elapsed
+        record_span("search", elapsed, start)
+        logger.info(f"🔎 Retrieval k={k} : chemin lexical BM25 (sans embedding) {elapsed * 1000:.1f} ms")
+        return lexical, hits, docs
+
+    @staticmethod
+    def _scored(pairs: List[Tuple[Document, float]]) -> List[Document]:
+        """
+        Reporte la similarité cosinus dans `metadata["score"]`.
+        Chroma (espace l2) et le store NumPy renvoient la distance L2 au carré ; les vecteurs
+        OpenAI étant normés, cosinus = 1 - d / 2.
+        """
+        for doc, distance in pairs:
+            doc.metadata["score"] = round(1.0 - distance / 2.0, 4)
+        return [doc for doc, _ in pairs]
+
+    @staticmethod
+    def _fuse(
+        vector_docs: List[Document], lexical: LexicalIndex, hits: List[Tuple[str, float]], k: int
+    ) -> List[Document]:
+        """Reciprocal Rank Fusion des classements vectoriel et BM25."""
+        by_id = {doc.id: doc for doc in vector_docs if doc.id}
+        fused = reciprocal_rank_fusion(
+            [[doc.id for doc in vector_docs if doc.id], [doc_id for doc_id, _ in hits]],
+            k=HYBRID_RRF_K,
+        )
+        return [by_id[doc_id] if doc_id in by_id else lexical.document(doc_id) for doc_id, _ in fused[:k]]
+
+    def search(self, query: str, k: int = 4, vector: Optional[List[float]] = None) -> List[Document]:
+        """
+        Recherche hybride (ou vectorielle seule si pas d'index lexical), en mesurant
+        séparément l'embedding de la requête et la recherche.
+        `vector` : embedding de la requête s'il est déjà calculé (ex. partagé avec le routeur) ;
+        ignoré si le chemin rapide (requête "mots-clés", BM25 seul) répond.
+        """
+        vs, lexical = self._current()
+        lexical, hits, fast_docs = self._lexical_search(query, k, lexical)
+        if fast_docs is not None:
+            return fast_docs
+
+        start = time.perf_counter()
+        embedded_here = vector is None
+        if embedded_here:
+            vector = self._embeddings.embed_query(query)
+        embedded = time.perf_counter()
+        pairs = vs.similarity_search_by_vector_with_relevance_scores(
+            vector, k=k if lexical is None else max(k, HYBRID_CANDIDATES)
+        )
+        docs = self._scored(pairs)
+        if lexical is not None:
+            docs = self._fuse(docs, lexical, hits, k)
+        self._record_query(k, start, embedded, time.perf_counter(), embedded_here)
+        return docs
+
+    async def asearch(
+        self, query: str, k: int = 4, vector: Union[List[float], Awaitable[Optional[List[float]]], None] = None
+    ) -> List[Document]:
+        """
+        Variante asynchrone de `search` (embedding non bloquant, recherche hors de la boucle).
+        `vector` peut être un awaitable (embedding en cours de calcul) : il n'est attendu que si
+        le chemin rapide n'a pas répondu.
+        """
+        # Un (re)chargement prend plusieurs secondes : jamais sur la boucle partagée
+        vs, lexical = await asyncio.to_thread(self._current)
+        lexical, hits, fast_docs = self._lexical_search(query, k, lexical)
+        if fast_docs is not None:
+            if asyncio.iscoroutine(vector):
+                vector.close()  # embedding partagé jamais attendu : pas d'avertissement "never awaited"
+            return fast_docs
+        if vector is not None and not isinstance(vector, list):
+            vector = await vector
+
+        start = time.perf_counter()
+        embedded_here = vector is None
+        if embedded_here:
+            vector = await self._embeddings.aembed_query(query)
+        embedded = time.perf_counter()
+        # Pas de variante asynchrone native (Chroma, NumPy) : recherche locale dans un thread
+        pairs = await asyncio.to_thread(
+            vs.similarity_search_by_vector_with_relevance_scores,
+            vector,
+            k if lexical is None else max(k, HYBRID_CANDIDATES),
+        )
+        docs = self._scored(pairs)
+        if lexical is not None:
+            docs = self._fuse(docs, lexical, hits, k)
+        self._record_query(k, start, embedded, time.perf_counter(), embedded_here)
+        return docs
+
+    def stats(self) -> Dict[str, Any]:
+        """Instantané des compteurs (chargements, requêtes, latences)."""
+        with self._lock:
+            snapshot = asdict(self._stats)
+            snapshot["avg_query_seconds"] = self._stats.avg_query_seconds
+        snapshot["index_version"] = self._version
+        lexical = self._handles[1] if self._handles is not None else None
+        snapshot["lexical_index_chunks"] = len(lexical) if lexical is not None else 0
+        if hasattr(self._embeddings, "stats"):
+            snapshot["embedding_cache"] = self._embeddings.stats()
+        return snapshot
+
+
+_service: Optional[VectorStoreService] = None
+_service_lock = threading.Lock()
+
+
+def get_vectorstore_service() -> VectorStoreService:
+    """Service de retrieval unique pour tout le process (partagé entre sessions et threads)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = VectorStoreService()
+    return _service
+
+
+def load_vectorstore() -> VectorStore:
+    """
+    Renvoie la base vectorielle partagée (chargée une seule fois par process) :
+    Chroma, ou le store NumPy si VECTOR_BACKEND="numpy".
+    """
+    return get_vectorstore_service().get()
 
 
 def basic_retrieval(query: str, k: int = 4) -> List[Document]:
     """
     Fonction utilitaire simple pour tester la recherche.
     """
-    vs = load_vectorstore()
-    retriever = vs.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": k},
-    )
-
-    docs = retriever.invoke(query)
-    return docs
+    return get_vectorstore_service().search(query, k=k)
 from langchain_core.documents import Document
 
-def get_relevant_docs(question: str, k: int = 5) -> list[Document]:
+def get_relevant_docs(question: str, k: int = 5, vector: Optional[List[float]] = None) -> list[Document]:
     """
     Récupère les documents pertinents depuis Chroma pour une question donnée.
-    Utilisé par le generator_agent et summary_agent.
+    Point d'entrée commun à tous les agents (handle partagé, pas de rechargement).
+    `vector` : embedding de la question, s'il a déjà été calculé.
     """
-    vs = load_vectorstore()
+    return get_vectorstore_service().search(question, k=k, vector=vector)
 
-    retriever = vs.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": k},
-    )
 
-    docs = retriever.invoke(question)
-    return docs
+async def aget_relevant_docs(
+    question: str, k: int = 5, vector: Union[List[float], Awaitable[Optional[List[float]]], None] = None
+) -> list[Document]:
+    """Variante asynchrone de `get_relevant_docs` (`vector` : liste ou awaitable, voir `asearch`)."""
+    return await get_vectorstore_service().asearch(question, k=k, vector=vector)
 
 
 def format_sources(docs: list[Document]) -> str:
@@ -0,0 +1,262 @@
+"""
+router.py
+Routage du mode "Auto" : choisit l'agent (rag, summary, compliance, governance, generator)
+qui traitera une question.
+
+Routeur sémantique : un centroïde d'embeddings par agent, calculé à partir de questions
+exemples puis mis en cache sur disque (recalculé seulement si les exemples ou le modèle
+d'embedding changent). Classer une question = un produit matrice-vecteur NumPy contre
+les centroïdes. Si aucun centroïde n'est assez proche (ROUTER_MIN_SIMILARITY), ou si
+l'embedding est indisponible, on retombe sur les règles par mots-clés.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+from langchain_core.embeddings import Embeddings
+
+from config import (
+    ROUTER_MODE,
+    ROUTER_CACHE_FILE,
+    ROUTER_MIN_SIMILARITY,
+)
+
+DEFAULT_AGENT = "rag"
+
+# Questions types par agent : elles définissent les centroïdes (les modifier invalide le cache)
+ROUTE_EXAMPLES: Dict[str, List[str]] = {
+    "rag": [
+        "Que dit le document sur la protection des données clients ?",
+        "Quels sont les chiffres clés cités dans l'étude Accenture ?",
+        "Qu'est-ce que le data capital selon Accenture ?",
+        "Explique la notion de client data safeguards.",
+        "Quels exemples d'entreprises sont mentionnés dans le rapport ?",
+        "What does the report say about data-driven companies?",
+        "Which technologies are recommended to scale AI?",
+        "Quelle est la définition de l'IA générative donnée dans le document ?",
+    ],
+    "summary": [
+        "Résume le document en quelques points.",
+        "Fais-moi une synthèse du rapport Accenture.",
+        "Donne-moi les idées principales de ce document.",
+        "Peux-tu résumer la feuille de route de l'IA ?",
+        "TL;DR du document sur la data et l'IA.",
+        "Summarize the key takeaways of the report.",
+        "Give me an executive summary of the whitepaper.",
+        "Quels sont les messages clés à retenir, en bref ?",
+    ],
+    "compliance": [
+        "Ce cas d'usage est-il conforme à l'AI Act ?",
+        "Vérifie la conformité RGPD de ce traitement de données personnelles.",
+        "Quelles obligations réglementaires s'appliquent à un système d'IA à haut risque ?",
+        "Quels contrôles de sécurité sont obligatoires pour des données sensibles ?",
+        "Peut-on transférer des données clients vers les États-Unis légalement ?",
+        "Is our chatbot compliant with the EU AI Act transparency requirements?",
+        "What are the GDPR risks of training a model on customer data?",
+        "Quelles sanctions risque-t-on en cas de non-conformité ?",
+    ],
+    "governance": [
+        "Comment organiser la gouvernance des données dans une grande entreprise ?",
+        "Quel est le rôle d'un data owner et d'un data steward ?",
+        "Comment mettre en place un programme de qualité des données ?",
+        "Comment gérer le lineage et le catalogue de données ?",
+        "Comment doit évoluer notre gouvernance avec une architecture Data Mesh ?",
+        "How should we structure a data governance council?",
+        "Who should own master data in a federated operating model?",
+        "Quel modèle opérationnel pour démocratiser l'accès aux données ?",
+    ],
+    "generator": [
+        "Rédige un plan d'action pour lancer notre programme data.",
+        "Prépare une présentation de 5 slides pour le comité de direction.",
+        "Écris un email au sponsor pour présenter la stratégie IA.",
+        "Propose une stratégie de migration Cloud en plusieurs étapes.",
+        "Génère une feuille de route sur 18 mois pour industrialiser l'IA.",
+        "Draft a project plan for a data platform migration.",
+        "Write a one-page memo proposing a data quality initiative.",
+        "Fais une checklist des actions à mener ce trimestre.",
+    ],
+}
+
+# Règles historiques du mode Auto (repli du routeur sémantique), évaluées dans cet ordre
+KEYWORD_RULES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("summary", ("résume", "synthèse", "summary", "tl;dr")),
+    ("compliance", ("conformité", "compliance", "risque", "rgpd", "ai act", "security", "règlement")),
+    ("governance", ("gouvernance", "data owner", "steward", "qualité", "lineage", "mesh", "architecture")),
+    ("generator", ("plan", "action", "slide", "présentation", "email", "stratégie", "migration")),
+]
+
+
+def keyword_route(text: str) -> str:
+    """Heuristiques par mots-clés ; "rag" (recherche documentaire classique) par défaut."""
+    text = text.lower()
+    for agent, keywords in KEYWORD_RULES:
+        if any(k in text for k in keywords):
+            return agent
+    return DEFAULT_AGENT
+
+
+@dataclass
+class RouteDecision:
+    agent: str
+    method: str  # "semantic" ou "keywords"
+    score: Optional[float] = None  # similarité avec le meilleur centroïde (si calculée)
+
+
+class SemanticRouter:
+    """
+    Routeur par centroïdes d'embeddings.
+
+    - `centroids()` : (agents, matrice (A, D) normée), calculée une fois puis lue depuis le cache disque.
+    - `classify(vectors)` : classement vectorisé d'un lot de questions déjà embeddées.
+    - `route(question, vector=None)` : décision pour une question, avec repli sur les mots-clés.
+    """
+
+    def __init__(
+        self,
+        embedding: Optional[Embeddings] = None,
+        cache_file: Optional[str] = ROUTER_CACHE_FILE,
+        min_similarity: float = ROUTER_MIN_SIMILARITY,
+        examples: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        self._embedding = embedding
+        self.cache_file = cache_file
+        self.min_similarity = min_similarity
+        self.examples = examples or ROUTE_EXAMPLES
+        self._agents: Optional[List[str]] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def embedding(self) -> Embeddings:
+        if self._embedding is None:
+            from src.embeddings import get_embeddings
+
+            self._embedding = get_embeddings()
+        return self._embedding
+
+    def _cache_key(self) -> str:
+        """Empreinte des exemples et du modèle : un changement de l'un invalide le cache."""
+        embedding = self.embedding
+        model = f"{getattr(embedding, 'model', type(embedding).__name__)}:{getattr(embedding, 'dimensions', None) or 0}"
+        payload = json.dumps({"model": model, "examples": self.examples}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load_cache(self, key: str) -> Optional[Tuple[List[str], np.ndarray]]:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return None
+        try:
+            with np.load(self.cache_file) as data:
+                if str(data["key"]) != key:
+                    return None
+                return [str(a) for a in data["agents"]], data["centroids"].astype(np.float32)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache du routeur illisible ({e}) : recalcul des centroïdes.")
+            return None
+
+    def _save_cache(self, key: str, agents: List[str], centroids: np.ndarray) -> None:
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        tmp = self.cache_file + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, key=np.array(key), agents=np.array(agents), centroids=centroids)
+        os.replace(tmp, self.cache_file)
+
+    def _compute(self) -> Tuple[List[str], np.ndarray]:
+        """Un seul appel d'embedding pour tous les exemples, puis moyenne normée par agent."""
+        agents = list(self.examples)
+        texts = [text for agent in agents for text in self.examples[agent]]
+        vectors = np.asarray(self.embedding.embed_documents(texts), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        centroids, start = [], 0
+        for agent in agents:
+            stop = start + len(self.examples[agent])
+            centroid = vectors[start:stop].mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+            start = stop
+        return agents, np.stack(centroids)
+
+    def centroids(self) -> Tuple[List[str], np.ndarray]:
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    key = self._cache_key()
+                    cached = self._load_cache(key)
+                    if cached is None:
+                        start = time.perf_counter()
+                        cached = self._compute()
+                        if self.cache_file:
+                            self._save_cache(key, *cached)
+                        logger.info(
+                            f"🧭 Centroïdes du routeur calculés ({sum(map(len, self.examples.values()))} "
+                            f"exemples) en {(time.perf_counter() - start) * 1000:.0f} ms"
+                        )
+                    self._agents, self._centroids = cached
+        return self._agents, self._centroids
+
+    def classify(self, vectors: Sequence[Sequence[float]]) -> Tuple[List[str], np.ndarray]:
+        """
+        Classe un lot de questions embeddées : (agent le plus proche, similarité) par question.
+        Une seule multiplication (N, D) x (D, A).
+        """
+        agents, centroids = self.centroids()
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        scores = (matrix @ centroids.T) / np.linalg.norm(matrix, axis=1, keepdims=True)
+        best = scores.argmax(axis=1)
+        return [agents[i] for i in best], scores[np.arange(len(best)), best]
+
+    def route(self, question: str, vector: Optional[Sequence[float]] = None) -> RouteDecision:
+        """
+        Agent pour `question`. `vector` : embedding déjà calculé de la question (sinon calculé ici).
+        Repli sur les mots-clés si aucun centroïde n'atteint `min_similarity` ou en cas d'erreur.
+        """
+        try:
+            if vector is None:
+                vector = self.embedding.embed_query(question)
+            agents, scores = self.classify([vector])
+        except Exception as e:
+            logger.warning(f"⚠️ Routage sémantique indisponible ({e}) : repli sur les mots-clés.")
+            return RouteDecision(keyword_route(question), "keywords")
+
+        score = float(scores[0])
+        if score < self.min_similarity:
+            return RouteDecision(keyword_route(question), "keywords", score)
+        return RouteDecision(agents[0], "semantic", score)
+
+
+_router: Optional[SemanticRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> SemanticRouter:
+    """Routeur partagé par le process (centroïdes chargés une seule fois)."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = SemanticRouter()
+    return _router
+
+
+def route_agent(question: str, vector: Optional[Sequence[float]] = None) -> str:
+    """Agent du mode Auto, selon ROUTER_MODE ("semantic" avec repli, ou "keywords")."""
+    if ROUTER_MODE != "semantic":
+        return keyword_route(question)
+    start = time.perf_counter()
+    decision = get_router().route(question, vector)
+    score = f"{decision.score:.2f}" if decision.score is not None else "-"
+    logger.info(
+        f"🧭 Routage : {decision.agent} ({decision.method}, similarité {score}) "
+        f"en {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+    return decision.agent
@@ -0,0 +1,330 @@
+"""
+telemetry.py
+Instrumentation structurée des requêtes : spans par étape, tokens, histogrammes de latence.
+
+- `trace(name, **attrs)` ouvre la trace d'une requête (un tour de conversation, un appel
+  d'agent). La trace courante est portée par une `ContextVar` : elle suit les threads
+  (`asyncio.to_thread`) et la boucle partagée (`src.aio.submit` propage le contexte).
+- `span(stage)`, `@spanned(stage)` et `record_span(stage, secondes)` mesurent une étape : routage, chargement de
+  la base, embedding de la requête, recherche, construction du prompt, TTFT, LLM, rendu...
+- `add_tokens(prompt, completion)` : tokens de la requête (métadonnées de réponse, ou tiktoken).
+
+À la fin d'une trace, un enregistrement JSON est ajouté à TELEMETRY_FILE (une ligne par requête,
+rotation au-delà de TELEMETRY_MAX_MB)
+et les métriques du registre en mémoire sont mises à jour ; `render_prometheus()` les exporte
+au format texte Prometheus, servi sur /metrics par `start_metrics_server()` si METRICS_PORT > 0.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from functools import wraps
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from loguru import logger
+
+from config import TELEMETRY_ENABLED, TELEMETRY_FILE, TELEMETRY_MAX_MB, TELEMETRY_BACKUPS, METRICS_PORT
+
+# Bornes des histogrammes de latence (secondes), de la recherche locale à la réponse LLM complète
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+# ---------- Registre de métriques ----------
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # dernier = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Compteurs et histogrammes étiquetés, thread-safe, exportables au format Prometheus."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+
+    @staticmethod
+    def _labels(labels: Dict[str, Any]) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1.0, help: str = "", **labels: Any) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            self._help.setdefault(name, ("counter", help))
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, help: str = "", **labels: Any) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help))
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Vue simple (tests, UI) : compteurs, et nombre / somme de chaque histogramme."""
+        with self._lock:
+            return {
+                "counters": {name: {k: v for k, v in s.items()} for name, s in self._counters.items()},
+                "histograms": {
+                    name: {k: {"count": h.count, "sum": h.sum} for k, h in s.items()}
+                    for name, s in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """Format d'exposition texte Prometheus (version 0.0.4)."""
+
+        def fmt(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = labels + extra
+            if not pairs:
+                return ""
+            escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._help):
+                kind, help_text = self._help[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    for labels, value in sorted(self._counters.get(name, {}).items()):
+                        lines.append(f"{name}{fmt(labels)} {value:g}")
+                    continue
+                for labels, h in sorted(self._histograms.get(name, {}).items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, h.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{fmt(labels, (('le', f'{bound:g}'),))} {cumulative}")
+                    lines.append(f"{name}_bucket{fmt(labels, (('le', '+Inf'),))} {h.count}")
+                    lines.append(f"{name}_sum{fmt(labels)} {h.sum:.6f}")
+                    lines.append(f"{name}_count{fmt(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+# ---------- Traces ----------
+
+@dataclass
+class Trace:
+    name: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    trace_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    start: float = field(default_factory=time.perf_counter)
+    spans: List[Dict[str, Any]] = field(default_factory=list)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    token_source: Optional[str] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_span(self, stage: str, seconds: float, started: Optional[float] = None) -> None:
+        offset = (started if started is not None else time.perf_counter() - seconds) - self.start
+        with self._lock:
+            self.spans.append({"stage": stage, "start_ms": round(offset * 1000, 1), "ms": round(seconds * 1000, 2)})
+
+    def record(self, seconds: float, error: Optional[str]) -> Dict[str, Any]:
+        return {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "trace_id": self.trace_id,
+            "name": self.name,
+            **self.attributes,
+            "duration_ms": round(seconds * 1000, 1),
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "token_source": self.token_source,
+            "error": error,
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("telemetry_trace", default=None)
+_sink_lock = threading.Lock()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def set_attribute(key: str, value: Any) -> None:
+    """Attribut de la trace courante (agent, référentiel...), repris dans l'enregistrement et les labels."""
+    trace_ = _current.get()
+    if trace_ is not None:
+        trace_.attributes[key] = value
+
+
+def record_span(stage: str, seconds: float, started: Optional[float] = None) -> None:
+    """Durée d'une étape déjà mesurée : histogramme + trace courante (s'il y en a une)."""
+    if not TELEMETRY_ENABLED:
+        return
+    registry.observe("rag_stage_seconds", seconds, help="Durée des étapes d'une requête.", stage=stage)
+    trace_ = _current.get()
+    if trace_ is not None:
+        trace_.add_span(stage, seconds, started)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Mesure le bloc comme une étape de la requête courante."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - start, start)
+
+
+def spanned(stage: str) -> Callable[[F], F]:
+    """Décorateur : chaque appel de la fonction est une étape `stage` (ex : `_build` des agents)."""
+
+    def decorator(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(stage):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def add_tokens(prompt: int = 0, completion: int = 0, source: str = "tiktoken") -> None:
+    """Tokens consommés (source : "usage" = métadonnées de la réponse, "tiktoken" = estimation locale)."""
+    trace_ = _current.get()
+    if trace_ is None:
+        return
+    with trace_._lock:
+        trace_.prompt_tokens += prompt
+        trace_.completion_tokens += completion
+        trace_.token_source = source
+
+
+def _rotate(path: str, backups: int) -> None:
+    """telemetry.jsonl -> .1 -> .2 ... ; la plus ancienne archive au-delà de `backups` est supprimée."""
+    if backups <= 0:
+        os.remove(path)
+        return
+    for i in range(backups - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def _write(record: Dict[str, Any]) -> None:
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    try:
+        os.makedirs(os.path.dirname(TELEMETRY_FILE), exist_ok=True)
+        with _sink_lock:
+            with open(TELEMETRY_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                size = f.tell()
+            if size >= TELEMETRY_MAX_MB * 2**20:
+                _rotate(TELEMETRY_FILE, TELEMETRY_BACKUPS)
+    except OSError as e:
+        logger.warning(f"⚠️ Télémétrie non écrite ({e}).")
+
+
+@contextmanager
+def trace(name: str, **attributes: Any) -> Iterator[Optional[Trace]]:
+    """
+    Trace d'une requête. Imbriquée dans une trace déjà ouverte, elle ne fait rien : les spans
+    remontent dans la trace englobante (ex : `arun_agent_engine` appelé depuis un tour de l'UI).
+    """
+    if not TELEMETRY_ENABLED or _current.get() is not None:
+        yield _current.get()
+        return
+
+    trace_ = Trace(name=name, attributes=dict(attributes))
+    token = _current.set(trace_)
+    error: Optional[str] = None
+    try:
+        yield trace_
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        # Erreur rattrapée par l'appelant (ex : affichée dans l'UI) mais signalée via set_attribute
+        error = error or trace_.attributes.pop("error", None)
+        seconds = time.perf_counter() - trace_.start
+        agent = trace_.attributes.get("agent", "unknown")
+        registry.observe("rag_request_seconds", seconds, help="Durée totale des requêtes.", trace=name, agent=agent)
+        registry.inc(
+            "rag_requests_total", help="Requêtes traitées.", trace=name, agent=agent,
+            status="error" if error else "ok",
+        )
+        registry.inc("rag_llm_tokens_total", trace_.prompt_tokens, help="Tokens LLM.", agent=agent, kind="prompt")
+        registry.inc("rag_llm_tokens_total", trace_.completion_tokens, help="Tokens LLM.", agent=agent, kind="completion")
+        _write(trace_.record(seconds, error))
+
+
+def render_prometheus() -> str:
+    return registry.render_prometheus()
+
+
+# ---------- Endpoint /metrics ----------
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "127.0.0.1") -> Optional[int]:
+    """Sert /metrics (une fois par process) ; renvoie le port, ou None si désactivé (port 0)."""
+    global _server
+    if port <= 0 or not TELEMETRY_ENABLED:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                logger.warning(f"⚠️ Endpoint /metrics non démarré sur le port {port} : {e}")
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"📈 Métriques Prometheus sur http://{host}:{port}/metrics")
+    return _server.server_address[1]
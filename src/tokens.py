@@ -0,0 +1,39 @@
+"""
+tokens.py
+Comptage de tokens (tiktoken) partagé : batching des embeddings, budgets de prompt, métriques.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import List, Optional
+
+import tiktoken
+from loguru import logger
+
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: Optional[str] = None) -> tiktoken.Encoding:
+    """
+    Encodage tiktoken du modèle (cl100k_base si le modèle est inconnu de tiktoken, ou si son
+    encodage n'est pas en cache et ne peut pas être téléchargé : poste hors ligne, benchmarks).
+    """
+    if model:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Encodage tiktoken de {model} indisponible ({e}) : repli sur {DEFAULT_ENCODING}.")
+    return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    return len(get_encoding(model).encode_ordinary(text))
+
+
+def count_tokens_batch(texts: List[str], model: Optional[str] = None) -> List[int]:
+    """Comptage en lot (encodage multi-thread côté Rust)."""
+    return [len(tokens) for tokens in get_encoding(model).encode_ordinary_batch(texts)]
@@ -0,0 +1,111 @@
+"""
+transcript.py
+Historique d'une conversation de l'UI, borné en mémoire.
+
+- Les messages récents restent en mémoire de session (au plus HISTORY_MEMORY_CAP) ; au-delà,
+  les plus anciens sont déversés dans un fichier JSONL propre à la session (HISTORY_SPILL_DIR).
+- L'UI n'affiche qu'une fenêtre des derniers messages (`tail`) : les tours anciens ne sont
+  pas re-rendus à chaque rerun Streamlit.
+- Le rapport téléchargeable est assemblé en une seule fois (`report`), à la demande, au lieu
+  d'être reconcaténé à chaque rerun.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from config import HISTORY_MEMORY_CAP, HISTORY_SPILL_DIR, HISTORY_SPILL_MAX_AGE_DAYS
+
+Message = Dict[str, Any]
+
+
+def format_report_entry(msg: Message) -> str:
+    """Bloc du rapport texte pour un message."""
+    role_label = "CLIENT" if msg["role"] == "user" else f"EXPERT ACCENTURE ({msg.get('agent', 'System')})"
+    return f"\n\n{'='*30}\n{role_label}\n{'='*30}\n{msg['content']}\n"
+
+
+class Transcript:
+    """Messages d'une session : fenêtre récente en mémoire, anciens messages sur disque."""
+
+    def __init__(
+        self,
+        messages: Optional[List[Message]] = None,
+        memory_cap: int = HISTORY_MEMORY_CAP,
+        spill_dir: str = HISTORY_SPILL_DIR,
+        session_id: Optional[str] = None,
+    ) -> None:
+        self.memory_cap = max(1, memory_cap)
+        self.session_id = session_id or uuid.uuid4().hex
+        self.spill_path = os.path.join(spill_dir, f"{self.session_id}.jsonl")
+        self.messages: List[Message] = []
+        self.spilled = 0
+        for msg in messages or []:
+            self.append(msg)
+
+    def __len__(self) -> int:
+        return self.spilled + len(self.messages)
+
+    def append(self, msg: Message) -> None:
+        self.messages.append(msg)
+        if len(self.messages) > self.memory_cap:
+            # Déversement par moitié : une écriture disque pour memory_cap / 2 messages
+            self._spill(len(self.messages) - self.memory_cap // 2)
+
+    def _spill(self, count: int) -> None:
+        old, self.messages = self.messages[:count], self.messages[count:]
+        os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(msg, ensure_ascii=False, default=str) + "\n" for msg in old)
+        self.spilled += len(old)
+        logger.debug(f"🗄️ Historique : {len(old)} messages déversés sur disque ({self.spilled} au total).")
+
+    def _read_spilled(self) -> List[Message]:
+        if not self.spilled:
+            return []
+        with open(self.spill_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def tail(self, n: int) -> List[Message]:
+        """Les `n` derniers messages (le disque n'est lu que si la fenêtre dépasse la mémoire)."""
+        if n <= len(self.messages):
+            return self.messages[len(self.messages) - n :] if n > 0 else []
+        older = self._read_spilled()
+        missing = min(n - len(self.messages), len(older))
+        return older[len(older) - missing :] + self.messages
+
+    def report(self) -> str:
+        """Rapport texte complet (messages déversés compris), assemblé en un seul join."""
+        return "".join(format_report_entry(msg) for msg in self._read_spilled() + self.messages)
+
+    def clear(self) -> None:
+        self.messages = []
+        self.spilled = 0
+        try:
+            os.remove(self.spill_path)
+        except OSError:
+            pass
+
+
+def purge_stale_spills(spill_dir: str = HISTORY_SPILL_DIR, max_age_days: float = HISTORY_SPILL_MAX_AGE_DAYS) -> int:
+    """Supprime les historiques déversés de sessions inactives depuis plus de `max_age_days` jours."""
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    try:
+        entries = list(os.scandir(spill_dir))
+    except OSError:
+        return 0
+    for entry in entries:
+        if entry.name.endswith(".jsonl") and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
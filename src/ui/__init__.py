@@ -1,3 +1,3 @@
-from .layout import inject_global_css, render_header, render_message
+from .layout import inject_global_css, render_header, render_message, render_streaming_message
 
-__all__ = ["inject_global_css", "render_header", "render_message"]
+__all__ = ["inject_global_css", "render_header", "render_message", "render_streaming_message"]
\ No newline at end of file
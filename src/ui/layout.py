@@ -1,13 +1,16 @@
 import streamlit as st
 import textwrap
-from typing import Literal, Optional
+import time
+from functools import lru_cache
+from typing import Iterable, Literal, Optional
 
-def inject_global_css() -> None:
+@lru_cache(maxsize=None)
+def _global_css() -> str:
     """
-    Injecte le CSS global.
+    CSS global, construit une seule fois par process.
     Utilisation de textwrap.dedent pour nettoyer les espaces parasites.
     """
-    css = textwrap.dedent("""
+    return textwrap.dedent("""
         <style>
         @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600&display=swap');
 
@@ -115,23 +118,29 @@ def inject_global_css() -> None:
         a:hover { text-decoration: underline; }
         </style>
     """)
-    st.markdown(css, unsafe_allow_html=True)
 
-def render_header(title: str, subtitle: str = "") -> None:
-    html = textwrap.dedent(f"""
+def inject_global_css() -> None:
+    """Injecte le CSS global (à chaque rerun complet : Streamlit retire les éléments non ré-émis)."""
+    st.markdown(_global_css(), unsafe_allow_html=True)
+
+@lru_cache(maxsize=32)
+def _header_html(title: str, subtitle: str = "") -> str:
+    return textwrap.dedent(f"""
         <div class="custom-header">
             <h1>{title}</h1>
             {f'<p>{subtitle}</p>' if subtitle else ''}
         </div>
     """)
-    st.markdown(html, unsafe_allow_html=True)
 
-def render_message(
+def render_header(title: str, subtitle: str = "") -> None:
+    st.markdown(_header_html(title, subtitle), unsafe_allow_html=True)
+
+def _message_html(
     role: Literal["user", "assistant"],
     content: str,
     agent_name: Optional[str] = None,
     sources: Optional[str] = None,
-) -> None:
+) -> str:
     css_role = "row-user" if role == "user" else "row-assistant"
     css_bubble = "bubble-user" if role == "user" else "bubble-assistant"
     display_label = agent_name if agent_name else ("Vous" if role == "user" else "Assistant IA")
@@ -160,6 +169,45 @@ def render_message(
     </div>
 </div>
 """
-    
-    # 3. Affichage final
-    st.markdown(html, unsafe_allow_html=True)
\ No newline at end of file
+    return html
+
+# Les messages de l'historique sont re-rendus à chaque rerun du chat : leur HTML est mis en cache
+# (le streaming, lui, appelle `_message_html` directement pour ne pas remplir le cache de brouillons)
+_cached_message_html = lru_cache(maxsize=512)(_message_html)
+
+def render_message(
+    role: Literal["user", "assistant"],
+    content: str,
+    agent_name: Optional[str] = None,
+    sources: Optional[str] = None,
+) -> None:
+    # Affichage final
+    st.markdown(_cached_message_html(role, content, agent_name, sources), unsafe_allow_html=True)
+
+def render_streaming_message(
+    tokens: Iterable[str],
+    agent_name: Optional[str] = None,
+    sources: Optional[str] = None,
+    refresh_every: float = 0.05,
+) -> str:
+    """
+    Affiche une réponse assistant au fil des tokens (bulle mise à jour en place)
+    et renvoie le texte complet. Les rafraîchissements sont espacés de `refresh_every`
+    secondes pour ne pas saturer le front Streamlit.
+    """
+    placeholder = st.empty()
+    parts = []
+    last_refresh = 0.0
+
+    for token in tokens:
+        parts.append(token)
+        now = time.perf_counter()
+        if now - last_refresh >= refresh_every:
+            placeholder.markdown(
+                _message_html("assistant", "".join(parts) + " ▌", agent_name), unsafe_allow_html=True
+            )
+            last_refresh = now
+
+    answer = "".join(parts)
+    placeholder.markdown(_message_html("assistant", answer, agent_name, sources), unsafe_allow_html=True)
+    return answer
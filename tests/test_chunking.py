@@ -0,0 +1,80 @@
+"""
+test_chunking.py
+Découpeur en tokens (`src/chunking.TokenChunker`) : budget de tokens du texte indexé, position
+exacte des chunks dans la page, aucun texte perdu.
+
+    python -m pytest tests
+"""
+
+import os
+import random
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from langchain_core.documents import Document
+
+from src.chunking import TokenChunker
+
+WORDS = (
+    "data governance essentially shared alignment company’s authorities policies evolved "
+    "responsibilities reporting conversion département administrative transparency fragmented "
+    "Accenture CTO 2023 €12,5 数据 🙂 l'IA n’est-ce-pas RGPD/GDPR"
+).split()
+GLUE = [" "] * 12 + ["\n", "\n\n", ". ", ".", ",", "-", "'", "’", "  ", ""]
+
+
+def _pages(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(5, 600)):
+            parts.append(rng.choice(WORDS))
+            parts.append(rng.choice(GLUE))
+        pages.append(Document(page_content="".join(parts), metadata={"page": len(pages)}))
+    return pages
+
+
+@pytest.mark.parametrize("chunk_tokens, overlap_tokens", [(64, 16), (64, 0), (32, 8), (256, 40)])
+def test_chunks_fit_token_budget(chunk_tokens, overlap_tokens):
+    chunker = TokenChunker(chunk_tokens, overlap_tokens)
+    encoding = chunker._encoding
+    for page in _pages(150, seed=chunk_tokens + overlap_tokens):
+        for chunk in chunker.split_documents([page]):
+            assert len(encoding.encode_ordinary(chunk.page_content)) <= chunk_tokens
+
+
+def test_leading_space_stripped_from_chunk_is_counted():
+    # " essentially" = 1 token dans la page, "essentially" = 2 une fois le chunk nettoyé
+    text = "x" + " essentially" * 200
+    chunker = TokenChunker(32, 8)
+    for chunk in chunker.split_documents([Document(page_content=text)]):
+        assert len(chunker._encoding.encode_ordinary(chunk.page_content)) <= 32
+
+
+def test_unbroken_text_is_cut_within_budget():
+    text = "x" * 5000 + " é" * 800 + "🙂" * 300
+    chunker = TokenChunker(64, 16)
+    chunks = chunker.split_documents([Document(page_content=text)])
+    assert len(chunks) > 1
+    assert all(len(chunker._encoding.encode_ordinary(c.page_content)) <= 64 for c in chunks)
+
+
+def test_start_index_and_coverage():
+    chunker = TokenChunker(64, 16)
+    for page in _pages(50, seed=1):
+        text = page.page_content
+        covered = bytearray(len(text))
+        for chunk in chunker.split_documents([page]):
+            start = chunk.metadata["start_index"]
+            assert text[start : start + len(chunk.page_content)] == chunk.page_content
+            assert chunk.metadata["page"] == page.metadata["page"]
+            covered[start : start + len(chunk.page_content)] = b"\x01" * len(chunk.page_content)
+        assert all(covered[i] or ch.isspace() for i, ch in enumerate(text))
+
+
+def test_overlap_must_be_smaller_than_chunk():
+    with pytest.raises(ValueError):
+        TokenChunker(32, 32)